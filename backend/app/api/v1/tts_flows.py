@@ -2,7 +2,7 @@ from typing import List, Optional
 from fastapi import APIRouter, Depends, status, Request, Query, HTTPException
 from app.api.deps import get_current_active_user
 from app.models.tts_flow import TTSFlow
-from app.schemas.tts_flow import TTSFlow as TTSFlowSchema, TTSFlowCreate, TTSFlowUpdate
+from app.schemas.tts_flow import TTSFlow as TTSFlowSchema, TTSFlowCreate, TTSFlowUpdate, BatchSynthesisCreate
 from app.services.tts_flow_service import TTSFlowService
 from app.utils.response import success
 from beanie import PydanticObjectId
@@ -95,17 +95,8 @@ async def search_tts_flow_by_name(
     return success(tts_flow.dict())
 
 
-@router.get("/{flow_id}/synthesize-all")
-async def synthesize_workflow_audio(flow_id: str):
-    """工作流音频打包接口"""
-    from app.services.workflow_synthesizer import WorkflowSynthesizer
-    
-    # 获取工作流
-    flow = await TTSFlow.get(flow_id)
-    if not flow:
-        raise HTTPException(status_code=404, detail="工作流不存在")
-    
-    """加载音色和平台信息"""
+async def _load_voice_and_platform(flow: TTSFlow):
+    """加载工作流的音色和平台信息"""
     if not flow.voiceId:
         raise HTTPException(status_code=404, detail="工作流未配置音色")
         
@@ -116,14 +107,235 @@ async def synthesize_workflow_audio(flow_id: str):
     platform = await TTSPlatform.get(voice.platform_id)
     if not platform:
         raise HTTPException(status_code=404, detail="平台不存在")
+    return voice, platform
+
+
+@router.get("/{flow_id}/plan")
+async def preview_workflow_plan(flow_id: str, request: Request):
+    """预览工作流执行计划（节点顺序、进度总数及需要重新合成的节点）"""
+    from app.services.workflow_plan import get_workflow_plan
+    from app.services.synthesis_cache import synthesis_cache
+    
+    current_user = await get_current_active_user(request)
+    flow = await TTSFlowService.get_tts_flow_by_id(flow_id)
+    voice, platform = await _load_voice_and_platform(flow)
+    plan = get_workflow_plan(flow, voice, platform)
+    return success(plan.summary(flow.node_fingerprints, synthesis_cache.contains))
+
+
+def _normalize_job_options(output_profile: Optional[str], progress_mode: Optional[str]):
+    """校验输出格式与进度事件模式"""
+    from app.services.workflow_synthesizer import ProgressMode
+    from app.utils.audio_encoder import available_profiles, normalize_profile
+    
+    # 校验输出格式，压缩格式需要服务器安装ffmpeg
+    try:
+        output_profile = normalize_profile(output_profile)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if output_profile not in available_profiles():
+        raise HTTPException(status_code=400, detail=f"服务器未安装ffmpeg，无法输出{output_profile}格式")
+    try:
+        progress_mode = ProgressMode.normalize(progress_mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return output_profile, progress_mode
+
+
+async def _create_synthesis_job(flow_id: str, include_silence_files: bool, output_profile: Optional[str] = None,
+                                progress_mode: Optional[str] = None, scheduler=None):
+    """加载工作流、音色和平台，创建后台合成任务；批量合成时节点由共享工作池 scheduler 调度"""
+    from app.services.workflow_synthesizer import WorkflowSynthesizer
+    from app.services.synthesis_jobs import synthesis_job_manager
+    
+    output_profile, progress_mode = _normalize_job_options(output_profile, progress_mode)
+    
+    # 获取工作流
+    flow = await TTSFlow.get(flow_id)
+    if not flow:
+        raise HTTPException(status_code=404, detail="工作流不存在")
+    
+    """加载音色和平台信息"""
+    voice, platform = await _load_voice_and_platform(flow)
+    
+    # 创建合成器并在后台任务中处理
+    synthesizer = WorkflowSynthesizer(
+        flow, voice, platform, include_silence_files=include_silence_files, output_profile=output_profile,
+        progress_mode=progress_mode
+    )
+    # 已有任务在运行时加入该任务，输出选项不同则拒绝，避免两个任务同时写同一批文件
+    running = synthesis_job_manager.running_for_flow(flow_id)
+    if running and (running.synthesizer.include_silence_files, running.synthesizer.output_profile) != (
+            include_silence_files, output_profile):
+        raise HTTPException(status_code=409, detail="该工作流正在以其他输出选项合成，请等待完成或取消后重试")
+    if scheduler is not None and not running:
+        synthesizer.node_slots = scheduler.share(flow_id, platform, synthesizer.provider)
+    return synthesis_job_manager.create_or_attach(flow_id, synthesizer)
+
 
+def _get_synthesis_job(flow_id: str, job_id: str):
+    """获取合成任务"""
+    from app.services.synthesis_jobs import synthesis_job_manager
     
-    # 创建合成器并开始处理
-    synthesizer = WorkflowSynthesizer(flow, voice, platform)
+    job = synthesis_job_manager.get(job_id)
+    if not job or job.flow_id != flow_id:
+        raise HTTPException(status_code=404, detail="合成任务不存在")
+    return job
 
 
+def _job_event_response(job, last_event_id: Optional[int]) -> StreamingResponse:
+    """以SSE推送任务事件，客户端断开不影响后台任务"""
     return StreamingResponse(
-            synthesizer.synthesize_all(),
+            job.stream(last_event_id),
             media_type="text/event-stream; charset=utf-8",
-            headers={"Cache-Control": "no-cache", "Connection": "keep-alive"}
-        ) 
\ No newline at end of file
+            headers={"Cache-Control": "no-cache", "Connection": "keep-alive", "X-Job-Id": job.id}
+        )
+
+
+@router.get("/{flow_id}/synthesize-all")
+async def synthesize_workflow_audio(
+    flow_id: str,
+    request: Request,
+    include_silence_files: bool = Query(False, alias="includeSilenceFiles", description="是否将留白节点音频文件放入ZIP"),
+    output_profile: Optional[str] = Query(None, alias="outputProfile", description="输出格式：wav（默认）、flac、opus、mp3"),
+    progress_mode: Optional[str] = Query(None, alias="progressEvents", description="进度事件：all、coalesced、transitions")
+):
+    """工作流音频打包接口"""
+    from app.services.synthesis_jobs import synthesis_job_manager, parse_last_event_id
+    
+    # EventSource 断线重连时会带上 Last-Event-ID，此时继续推送最近一次任务的事件
+    last_event_id = parse_last_event_id(request.headers.get("last-event-id"))
+    job = synthesis_job_manager.latest_for_flow(flow_id) if last_event_id is not None else None
+    if not job:
+        # 新请求：工作流已在合成时加入正在运行的任务，从头推送同一事件流
+        last_event_id = None
+        job = await _create_synthesis_job(flow_id, include_silence_files, output_profile, progress_mode)
+    return _job_event_response(job, last_event_id)
+
+
+@router.post("/{flow_id}/synthesis-jobs")
+async def create_synthesis_job(
+    flow_id: str,
+    request: Request,
+    include_silence_files: bool = Query(False, alias="includeSilenceFiles", description="是否将留白节点音频文件放入ZIP"),
+    output_profile: Optional[str] = Query(None, alias="outputProfile", description="输出格式：wav（默认）、flac、opus、mp3"),
+    progress_mode: Optional[str] = Query(None, alias="progressEvents", description="进度事件：all、coalesced、transitions")
+):
+    """创建后台合成任务"""
+    current_user = await get_current_active_user(request)
+    job = await _create_synthesis_job(flow_id, include_silence_files, output_profile, progress_mode)
+    return success(job.status_data())
+
+
+@router.get("/{flow_id}/synthesis-jobs/{job_id}")
+async def read_synthesis_job(flow_id: str, job_id: str, request: Request):
+    """查询合成任务状态"""
+    current_user = await get_current_active_user(request)
+    return success(_get_synthesis_job(flow_id, job_id).status_data())
+
+
+@router.get("/{flow_id}/synthesis-jobs/{job_id}/events")
+async def stream_synthesis_job_events(
+    flow_id: str,
+    job_id: str,
+    request: Request,
+    last_event_id: Optional[str] = Query(None, alias="lastEventId", description="从该事件ID之后开始推送")
+):
+    """订阅合成任务事件（支持 Last-Event-ID 断点续传）"""
+    from app.services.synthesis_jobs import parse_last_event_id
+    
+    job = _get_synthesis_job(flow_id, job_id)
+    return _job_event_response(job, parse_last_event_id(request.headers.get("last-event-id") or last_event_id))
+
+
+@router.get("/{flow_id}/synthesis-jobs/{job_id}/audio")
+async def stream_synthesis_job_audio(flow_id: str, job_id: str):
+    """边合成边播放：按流程顺序推送已完成节点的音频（流式wav，可直接用于audio标签）"""
+    job = _get_synthesis_job(flow_id, job_id)
+    return StreamingResponse(
+            job.audio_stream(),
+            media_type="audio/wav",
+            headers={"Cache-Control": "no-cache", "X-Job-Id": job.id}
+        )
+
+
+@router.delete("/{flow_id}/synthesis-jobs/{job_id}")
+async def cancel_synthesis_job(flow_id: str, job_id: str, request: Request):
+    """取消合成任务"""
+    current_user = await get_current_active_user(request)
+    job = _get_synthesis_job(flow_id, job_id)
+    job.cancel()
+    return success(job.status_data())
+
+
+async def _create_batch_synthesis_job(batch: BatchSynthesisCreate):
+    """为每个工作流创建合成任务（节点共享批量工作池），单个工作流创建失败不影响其他工作流"""
+    from app.services.batch_synthesis import MAX_BATCH_FLOWS, BatchFlow, batch_job_manager, batch_scheduler
+    from app.services.synthesis_jobs import synthesis_job_manager
+    
+    flow_ids = list(dict.fromkeys(batch.flowIds))
+    if not flow_ids:
+        raise HTTPException(status_code=400, detail="请至少选择一个工作流")
+    if len(flow_ids) > MAX_BATCH_FLOWS:
+        raise HTTPException(status_code=400, detail=f"单次最多批量合成{MAX_BATCH_FLOWS}个工作流")
+    output_profile, progress_mode = _normalize_job_options(batch.outputProfile, batch.progressEvents)
+    
+    flows = []
+    for flow_id in flow_ids:
+        attached = synthesis_job_manager.running_for_flow(flow_id) is not None
+        try:
+            job = await _create_synthesis_job(
+                flow_id, batch.includeSilenceFiles, output_profile, progress_mode, scheduler=batch_scheduler
+            )
+        except Exception as e:
+            flows.append(BatchFlow(flow_id, error=e.detail if isinstance(e, HTTPException) else str(e)))
+            continue
+        flows.append(BatchFlow(flow_id, job=job, attached=attached))
+    return batch_job_manager.create(flows)
+
+
+def _get_batch_synthesis_job(batch_id: str):
+    """获取批量合成任务"""
+    from app.services.batch_synthesis import batch_job_manager
+    
+    job = batch_job_manager.get(batch_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="批量合成任务不存在")
+    return job
+
+
+@router.post("/batch-synthesis-jobs")
+async def create_batch_synthesis_job(batch: BatchSynthesisCreate, request: Request):
+    """批量合成多个工作流：全部节点在共享工作池中按工作流轮转调度，并遵守各平台并发上限"""
+    current_user = await get_current_active_user(request)
+    job = await _create_batch_synthesis_job(batch)
+    return success(job.status_data())
+
+
+@router.get("/batch-synthesis-jobs/{batch_id}")
+async def read_batch_synthesis_job(batch_id: str, request: Request):
+    """查询批量合成任务状态（汇总进度及各工作流状态）"""
+    current_user = await get_current_active_user(request)
+    return success(_get_batch_synthesis_job(batch_id).status_data())
+
+
+@router.get("/batch-synthesis-jobs/{batch_id}/events")
+async def stream_batch_synthesis_job_events(
+    batch_id: str,
+    request: Request,
+    last_event_id: Optional[str] = Query(None, alias="lastEventId", description="从该事件ID之后开始推送")
+):
+    """订阅批量合成事件：汇总进度、单个工作流完成、全部结束（支持 Last-Event-ID 断点续传）"""
+    from app.services.synthesis_jobs import parse_last_event_id
+    
+    job = _get_batch_synthesis_job(batch_id)
+    return _job_event_response(job, parse_last_event_id(request.headers.get("last-event-id") or last_event_id))
+
+
+@router.delete("/batch-synthesis-jobs/{batch_id}")
+async def cancel_batch_synthesis_job(batch_id: str, request: Request):
+    """取消批量合成任务（同时取消由该批量任务创建的工作流任务）"""
+    current_user = await get_current_active_user(request)
+    job = _get_batch_synthesis_job(batch_id)
+    job.cancel()
+    return success(job.status_data())
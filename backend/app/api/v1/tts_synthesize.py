@@ -1,11 +1,24 @@
-from fastapi import APIRouter, Request
+import asyncio
+import base64
+from typing import AsyncIterator, Dict, Optional, Tuple
+from fastapi import APIRouter, Request, WebSocket, WebSocketDisconnect
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from app.models.tts_flow import TTSFlow
 from app.models.tts_voice import TTSVoice
 from app.models.tts_platform import TTSPlatform
-from app.services.tts_volcano import tts_volcano_stream
+from app.services.tts_provider import get_provider, list_providers
+from app.services.synthesis_cache import synthesis_cache, synthesis_flights, cached_tts_stream
+from app.services.tts_flow_service import TTSFlowService
+from app.services.provider_pool import provider_pool
+from app.services.provider_governor import provider_governor
+from app.services.provider_policy import latency_registry
+from app.services.storage_maintenance import storage_maintainer
+from app.services.batch_synthesis import batch_scheduler
+from app.services.presynthesis import presynthesizer
 from app.core.constants import AppConstants
+from app.utils.audio_utils import DEFAULT_CHANNELS, DEFAULT_SAMPLE_RATE, DEFAULT_SAMPLE_WIDTH
+from app.utils.response import success
 import os
 import json
 
@@ -22,43 +35,156 @@ def _event_data(data):
 
 
 
-@router.post("/synthesize")
-async def tts_synthesize(req: TTSRequest):
-    flow = await TTSFlow.get(req.flow_id)
+async def _load_synthesis_context(flow_id: str) -> Tuple[Optional[tuple], Optional[str]]:
+    """加载单节点合成所需的工作流、音色、平台与平台实现，失败时返回错误信息"""
+    flow = await TTSFlow.get(flow_id)
     if not flow:
-        def err():
-            yield _event_data({'data': 'flow not found', 'type': 'error', 'end': True})
-        return StreamingResponse(err())
+        return None, 'flow not found'
     voice_id = flow.voiceId
     if not voice_id:
-        def err():
-            yield _event_data({'data': 'voiceId not set', 'type': 'error', 'end': True})
-        return StreamingResponse(err())
+        return None, 'voiceId not set'
     voice = await TTSVoice.get(voice_id)
     if not voice:
-        def err():
-            yield _event_data({'data': 'voice not found', 'type': 'error', 'end': True})
-        return StreamingResponse(err())
+        return None, 'voice not found'
     platform = await TTSPlatform.get(voice.platform_id)
     if not platform:
-        def err():
-            yield _event_data({'data': 'platform not found', 'type': 'error', 'end': True})
-        return StreamingResponse(err())
-    if platform.type == "volcano":
-        wav_dir = os.path.join(AppConstants.STATIC_DIR, "tts_wav", req.flow_id)
-        os.makedirs(wav_dir, exist_ok=True)
-        wav_path = os.path.join(wav_dir, f"{req.node_id}_{req.node_name}.wav")
-        def event_generator():
-            for chunk in tts_volcano_stream(
+        return None, 'platform not found'
+    provider = get_provider(platform.type)
+    if not provider:
+        return None, 'not implemented'
+    return (flow, voice, platform, provider), None
+
+
+def _node_stream(context: tuple, req: TTSRequest) -> AsyncIterator[Dict]:
+    """单节点合成的chunk流（优先使用合成缓存，完成后记录节点指纹）"""
+    flow, voice, platform, provider = context
+    wav_dir = os.path.join(AppConstants.STATIC_DIR, "tts_wav", req.flow_id)
+    os.makedirs(wav_dir, exist_ok=True)
+    wav_path = os.path.join(wav_dir, f"{req.node_id}.wav")
+    relative_path = f"tts_wav/{req.flow_id}/{req.node_id}.wav"
+    key = provider.cache_key(platform, voice, req.text)
+
+    async def generator():
+        async for chunk in cached_tts_stream(
+            key,
+            lambda: provider.stream(
                 text=req.text,
                 voice=voice,
                 platform=platform,
                 wav_path=wav_path,
-                relative_path=f"tts_wav/{req.flow_id}/{req.node_id}_{req.node_name}.wav"
-            ):
-                yield _event_data(chunk)
-        return StreamingResponse(event_generator())
-    else:
+                relative_path=relative_path
+            ),
+            wav_path,
+            relative_path,
+            replay_pcm=True
+        ):
+            if chunk.get('type') == 'wav_path':
+                # 记录节点指纹，工作流合成时据此判断节点音频是否可复用
+                await TTSFlowService.set_node_fingerprint(flow, req.node_id, key, chunk['data'])
+            yield chunk
+    return generator()
+
+
+@router.post("/synthesize")
+async def tts_synthesize(req: TTSRequest):
+    context, error = await _load_synthesis_context(req.flow_id)
+    if error:
         def err():
-            yield _event_data({'data': 'not implemented', 'type': 'error', 'end': True})
-        return StreamingResponse(err()) 
\ No newline at end of file
+            yield _event_data({'data': error, 'type': 'error', 'end': True})
+        return StreamingResponse(err())
+
+    async def event_generator():
+        async for chunk in _node_stream(context, req):
+            yield _event_data(chunk)
+    return StreamingResponse(event_generator())
+
+
+@router.websocket("/ws")
+async def tts_synthesize_ws(websocket: WebSocket):
+    """单节点合成预览（WebSocket）：PCM以二进制消息推送，省去base64与SSE的开销
+
+    客户端每发送一个JSON请求（字段同 /synthesize），服务端依次返回：
+    {"type": "start", ...音频参数} 文本帧、若干PCM二进制帧、{"type": "end", "wavPath": ...} 或 {"type": "error", ...} 文本帧。
+    同一连接可以连续发送多个请求，按顺序处理。
+    """
+    await websocket.accept()
+    try:
+        while True:
+            try:
+                req = TTSRequest(**await websocket.receive_json())
+            except (ValueError, TypeError) as e:
+                await websocket.send_json({'type': 'error', 'data': f'invalid request: {e}'})
+                continue
+            context, error = await _load_synthesis_context(req.flow_id)
+            if error:
+                await websocket.send_json({'type': 'error', 'data': error, 'nodeId': req.node_id})
+                continue
+            provider = context[3]
+            await websocket.send_json({
+                'type': 'start',
+                'nodeId': req.node_id,
+                'format': 'pcm',
+                'sampleRate': provider.audio_params.get('sample_rate', DEFAULT_SAMPLE_RATE),
+                'channels': DEFAULT_CHANNELS,
+                'sampleWidth': DEFAULT_SAMPLE_WIDTH
+            })
+            async for chunk in _node_stream(context, req):
+                if chunk.get('type') == 'pcm':
+                    if chunk.get('data'):
+                        await websocket.send_bytes(base64.b64decode(chunk['data']))
+                elif chunk.get('type') == 'wav_path':
+                    await websocket.send_json({'type': 'end', 'nodeId': req.node_id, 'wavPath': chunk['data']})
+                elif chunk.get('type') == 'error':
+                    await websocket.send_json({
+                        'type': 'error', 'nodeId': req.node_id, 'data': chunk.get('data'), 'code': chunk.get('code')
+                    })
+    except WebSocketDisconnect:
+        pass
+
+
+@router.get("/providers")
+async def tts_providers():
+    """已注册的TTS平台类型及其能力"""
+    return success(list_providers())
+
+
+@router.get("/cache/stats")
+async def tts_cache_stats():
+    """合成缓存统计（命中/未命中/淘汰次数与占用空间，以及合并的并发请求数）"""
+    return success({**synthesis_cache.stats(), "singleFlight": synthesis_flights.stats()})
+
+
+@router.get("/pool/stats")
+async def tts_pool_stats():
+    """TTS平台连接池统计（新建/复用连接数）"""
+    return success(provider_pool.stats())
+
+
+@router.get("/governor/stats")
+async def tts_governor_stats():
+    """TTS平台调度统计（自适应并发上限、QPS、限流次数）"""
+    return success(provider_governor.stats())
+
+
+@router.get("/batch/stats")
+async def tts_batch_stats():
+    """批量合成共享工作池统计（运行中/等待中的节点数）"""
+    return success(batch_scheduler.stats())
+
+
+@router.get("/presynthesis/stats")
+async def tts_presynthesis_stats():
+    """保存工作流后的后台预合成统计（待合成、已合成、跳过、失败的节点数）"""
+    return success(presynthesizer.stats())
+
+
+@router.get("/storage/stats")
+async def tts_storage_stats():
+    """合成音频磁盘占用、配额与淘汰/回收统计"""
+    return success(await asyncio.to_thread(storage_maintainer.stats))
+
+
+@router.get("/latency/stats")
+async def tts_latency_stats():
+    """TTS平台首包耗时分位数与对冲请求统计"""
+    return success(latency_registry.stats())
@@ -1,6 +1,8 @@
 from typing import Optional, Dict, Any
 from fastapi import Request, HTTPException, status
 from fastapi.responses import JSONResponse
+from starlette.requests import HTTPConnection
+from starlette.websockets import WebSocketClose
 from fastapi.security import HTTPBearer
 from app.core.security import verify_token
 from app.core.permission_config import permission_config, PermissionLevel
@@ -25,13 +27,15 @@ class AuthMiddleware:
         self.app = app
     
     async def __call__(self, scope, receive, send):
-        if scope["type"] != "http":
+        if scope["type"] not in ("http", "websocket"):
             await self.app(scope, receive, send)
             return
         
-        request = Request(scope, receive)
+        # WebSocket握手按GET请求鉴权（浏览器无法设置请求头，通常使用cookie中的access_token）
+        websocket = scope["type"] == "websocket"
+        request = HTTPConnection(scope) if websocket else Request(scope, receive)
         path = request.url.path
-        method = request.method
+        method = "GET" if websocket else request.method
         
         # 检查是否为公开路径
         if permission_config.is_public_path(path):
@@ -48,6 +52,9 @@ class AuthMiddleware:
         
         # 验证认证
         user = await self._authenticate_user(request)
+        if websocket and (not user or not self._check_user_permission(user, required_permission)):
+            await WebSocketClose(code=1008)(scope, receive, send)
+            return
         if not user:
             response = JSONResponse(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -70,7 +77,7 @@ class AuthMiddleware:
         
         await self.app(scope, receive, send)
     
-    async def _authenticate_user(self, request: Request) -> Optional[User]:
+    async def _authenticate_user(self, request: HTTPConnection) -> Optional[User]:
         """认证用户"""
         try:
             # 优先获取Authorization头
@@ -27,6 +27,47 @@ class Settings(BaseSettings):
     host: str = Field(default="0.0.0.0", env="HOST")
     port: int = Field(default=8000, env="PORT")
     
+    # TTS合成缓存配置
+    synthesis_cache_max_bytes: int = Field(default=2 * 1024 ** 3, env="SYNTHESIS_CACHE_MAX_BYTES")
+    
+    # 单个工作流合成任务的时间预算（秒），0表示不限制
+    synthesis_job_timeout: float = Field(default=3600, env="SYNTHESIS_JOB_TIMEOUT")
+    
+    # 批量合成共享工作池的节点数（所有批量任务的节点按工作流轮转获取名额）
+    batch_synthesis_workers: int = Field(default=8, env="BATCH_SYNTHESIS_WORKERS")
+    
+    # 保存工作流时在后台预合成新增或修改的文本节点（写入合成缓存），前台有合成任务或平台繁忙时让出
+    presynthesis_enabled: bool = Field(default=False, env="PRESYNTHESIS_ENABLED")
+    presynthesis_workers: int = Field(default=1, env="PRESYNTHESIS_WORKERS")
+    
+    # 合成进度事件：all（每个chunk一个事件）、coalesced（合并并限速）、transitions（只推送状态变化）
+    progress_event_mode: str = Field(default="all", env="PROGRESS_EVENT_MODE")
+    # coalesced 模式下每个任务每秒最多推送的生成中事件数，0表示不限制
+    progress_event_max_rate: float = Field(default=5, env="PROGRESS_EVENT_MAX_RATE")
+    
+    # 压缩输出格式（flac/opus/mp3）的编码线程数，每个线程同时运行一个ffmpeg进程
+    audio_encode_workers: int = Field(default=2, env="AUDIO_ENCODE_WORKERS")
+    
+    # 合成音频制品存储：local（本地分片目录）或 s3（S3兼容对象存储，多个后端实例共享）
+    artifact_store: str = Field(default="local", env="ARTIFACT_STORE")
+    artifact_local_dir: str = Field(default="", env="ARTIFACT_LOCAL_DIR")  # 默认 static/artifacts
+    s3_endpoint: str = Field(default="", env="S3_ENDPOINT")
+    s3_bucket: str = Field(default="", env="S3_BUCKET")
+    s3_access_key: str = Field(default="", env="S3_ACCESS_KEY")
+    s3_secret_key: str = Field(default="", env="S3_SECRET_KEY")
+    s3_region: str = Field(default="us-east-1", env="S3_REGION")
+    s3_prefix: str = Field(default="", env="S3_PREFIX")
+    
+    # 合成音频磁盘配额（字节，0表示不限制），超出后按最近最少使用淘汰工作文件与本地制品
+    storage_quota_bytes: int = Field(default=0, env="STORAGE_QUOTA_BYTES")
+    # 存储维护（配额淘汰与垃圾回收）的执行间隔（秒），0表示不执行
+    storage_maintenance_interval: float = Field(default=600, env="STORAGE_MAINTENANCE_INTERVAL")
+    # 未被引用的文件超过该时长（秒）未使用才会被回收，避免删除正在合成的结果
+    storage_gc_grace_seconds: float = Field(default=24 * 3600, env="STORAGE_GC_GRACE_SECONDS")
+    
+    # ZIP打包压缩方式：stored（不压缩，适合PCM）或 deflated
+    zip_compression: str = Field(default="stored", env="ZIP_COMPRESSION")
+    
     class Config:
         # 使用绝对路径指定.env文件位置
         env_file = str(Path(__file__).parent.parent.parent / ".env")
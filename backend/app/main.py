@@ -6,6 +6,10 @@ from app.core.config import settings
 from app.core.database import init_db, close_db
 from app.core.auth_middleware import AuthMiddleware
 from app.api.v1 import api_router
+from app.services.provider_pool import provider_pool
+from app.services.artifact_store import get_artifact_store
+from app.services.storage_maintenance import storage_maintainer
+from app.services.presynthesis import presynthesizer
 from app.utils.response import fail, success
 from app.core.exceptions import (
     BaseException,
@@ -24,8 +28,14 @@ async def lifespan(app: FastAPI):
     """应用生命周期管理"""
     # 启动时初始化数据库
     await init_db()
+    storage_maintainer.start()
+    presynthesizer.start()
     yield
+    await presynthesizer.stop()
+    await storage_maintainer.stop()
     # 关闭时清理资源
+    await provider_pool.close()
+    await get_artifact_store().close()
     await close_db()
 
 
@@ -105,6 +115,8 @@ app.add_middleware(
 
 # 挂载静态文件
 from app.core.constants import AppConstants
+# 合成音频制品（按内容寻址，可能位于对象存储），需在 /static 之前挂载
+app.mount("/static/artifacts", get_artifact_store().asgi_app(), name="artifacts")
 app.mount("/static", StaticFiles(directory=AppConstants.STATIC_DIR), name="static")
 
 # 包含API路由
@@ -11,6 +11,7 @@ class TTSFlow(Document):
     voiceId: Optional[str] = Field(None, description="音色ID")
     voiceName: Optional[str] = Field(None, description="音色名称")
     flow_config: Dict[str, Any] = Field(default_factory=dict)  # flow配置（JSON）
+    node_fingerprints: Dict[str, Dict[str, Any]] = Field(default_factory=dict)  # 节点指纹：node_id -> {fingerprint, audioUrl}
     created_at: datetime = Field(default_factory=utc_now)  # 创建时间
     updated_at: datetime = Field(default_factory=utc_now)  # 更新时间
     
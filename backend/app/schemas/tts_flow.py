@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from pydantic import BaseModel, Field
 
 
@@ -24,6 +24,14 @@ class TTSFlowUpdate(BaseModel):
     flow_config: Optional[Dict[str, Any]] = Field(None, description="flow配置（JSON）")
 
 
+class BatchSynthesisCreate(BaseModel):
+    """批量合成模式"""
+    flowIds: List[str] = Field(..., description="工作流ID列表")
+    includeSilenceFiles: bool = Field(False, description="是否将留白节点音频文件放入ZIP")
+    outputProfile: Optional[str] = Field(None, description="输出格式：wav（默认）、flac、opus、mp3")
+    progressEvents: Optional[str] = Field(None, description="各工作流任务的进度事件：all、coalesced、transitions")
+
+
 class TTSFlowInDB(TTSFlowBase):
     """数据库中的TTS工作流模式"""
     id: str
@@ -0,0 +1,320 @@
+import asyncio
+import datetime
+import hashlib
+import hmac
+import os
+import re
+import shutil
+import uuid
+from contextlib import contextmanager
+from typing import AsyncIterator, Dict, Iterator, Optional
+from urllib.parse import quote
+import httpx
+from starlette.applications import Starlette
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+from starlette.staticfiles import StaticFiles
+from app.core.config import settings
+from app.core.constants import AppConstants
+
+ARTIFACT_URL_PREFIX = "artifacts"   # 制品的URL路径前缀，通过 /static/artifacts/{key} 访问
+READ_BLOCK_SIZE = 1024 * 1024
+EMPTY_PAYLOAD_HASH = hashlib.sha256(b"").hexdigest()
+
+# 制品键：sha256前两级分片 + 完整哈希 + 扩展名，如 ab/cd/abcd....wav
+_KEY_RE = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.[0-9a-z]+$")
+
+
+@contextmanager
+def atomic_output(path: str) -> Iterator[str]:
+    """原子写入：先写同目录下的临时文件，成功后替换目标文件，失败时删除临时文件"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def file_digest(path: str) -> str:
+    """文件内容的sha256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(READ_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def artifact_key(digest: str, ext: str) -> str:
+    return f"{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+
+def artifact_digest(key: str) -> str:
+    """制品键中的内容哈希"""
+    return os.path.splitext(os.path.basename(key))[0]
+
+
+def artifact_url(key: str) -> str:
+    """制品的相对URL（与节点 audioUrl 格式一致，不带 /static 前缀）"""
+    return f"{ARTIFACT_URL_PREFIX}/{key}"
+
+
+def parse_artifact_url(url: Optional[str]) -> Optional[str]:
+    """从 audioUrl 中解析制品键，不是制品地址时返回None"""
+    path = (url or "").lstrip("/")
+    if path.startswith("static/"):
+        path = path[len("static/"):]
+    if not path.startswith(ARTIFACT_URL_PREFIX + "/"):
+        return None
+    key = path[len(ARTIFACT_URL_PREFIX) + 1:]
+    return key if _KEY_RE.match(key) else None
+
+
+class ArtifactStore:
+    """合成音频制品存储：按内容哈希寻址，写入后不可变，多个后端实例可共享"""
+    type: str = ""
+
+    async def put_file(self, src_path: str) -> str:
+        """保存文件并返回制品键，相同内容只保存一份"""
+        raise NotImplementedError
+
+    async def get_file(self, key: str, dest_path: str) -> bool:
+        """将制品复制到本地路径，不存在时返回False"""
+        raise NotImplementedError
+
+    async def size(self, key: str) -> Optional[int]:
+        """制品大小，不存在时返回None"""
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+    def asgi_app(self):
+        """挂载到 /static/artifacts 的静态访问应用"""
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+    def stats(self) -> Dict:
+        return {"type": self.type, "puts": self.puts, "deduplicated": self.deduplicated}
+
+
+class LocalArtifactStore(ArtifactStore):
+    """本地文件系统：root/ab/cd/<sha256>.wav，写入先落临时文件再原子替换"""
+    type = "local"
+
+    def __init__(self, root: str):
+        self.root = root
+        self.puts = 0
+        self.deduplicated = 0
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def _put(self, src_path: str) -> str:
+        key = artifact_key(file_digest(src_path), os.path.splitext(src_path)[1])
+        dest_path = self.path(key)
+        if os.path.exists(dest_path):
+            self.deduplicated += 1
+            return key
+        with atomic_output(dest_path) as tmp_path:
+            shutil.copyfile(src_path, tmp_path)
+        self.puts += 1
+        return key
+
+    def _get(self, key: str, dest_path: str) -> bool:
+        src_path = self.path(key)
+        if not os.path.exists(src_path):
+            return False
+        # 复制而不是硬链接：节点文件之后会被原地覆盖（重新合成、缓存恢复），不能与制品共享同一文件
+        with atomic_output(dest_path) as tmp_path:
+            shutil.copyfile(src_path, tmp_path)
+        return True
+
+    async def put_file(self, src_path: str) -> str:
+        return await asyncio.to_thread(self._put, src_path)
+
+    async def get_file(self, key: str, dest_path: str) -> bool:
+        return await asyncio.to_thread(self._get, key, dest_path)
+
+    async def size(self, key: str) -> Optional[int]:
+        path = self.path(key)
+        return os.path.getsize(path) if os.path.exists(path) else None
+
+    async def delete(self, key: str):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def asgi_app(self):
+        os.makedirs(self.root, exist_ok=True)
+        return StaticFiles(directory=self.root)
+
+
+def _hmac(key: bytes, message: str) -> bytes:
+    return hmac.new(key, message.encode("utf-8"), hashlib.sha256).digest()
+
+
+class S3ArtifactStore(ArtifactStore):
+    """S3兼容对象存储（AWS S3、MinIO等），路径风格访问，请求使用SigV4签名"""
+    type = "s3"
+
+    def __init__(self, endpoint: str, bucket: str, access_key: str, secret_key: str,
+                 region: str = "us-east-1", prefix: str = ""):
+        self.endpoint = endpoint.rstrip("/")
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.prefix = prefix.strip("/")
+        self.puts = 0
+        self.deduplicated = 0
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=httpx.Timeout(60.0, connect=10.0))
+        return self._client
+
+    def _object_path(self, key: str) -> str:
+        object_key = f"{self.prefix}/{key}" if self.prefix else key
+        return f"/{self.bucket}/{quote(object_key)}"
+
+    def sign(self, method: str, path: str, payload_hash: str, now: Optional[datetime.datetime] = None) -> Dict[str, str]:
+        """生成SigV4签名请求头（不带查询参数）"""
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        date = amz_date[:8]
+        headers = {
+            "host": httpx.URL(self.endpoint).netloc.decode("ascii"),
+            "x-amz-content-sha256": payload_hash,
+            "x-amz-date": amz_date,
+        }
+        signed_headers = ";".join(sorted(headers))
+        canonical_request = "\n".join([
+            method, path, "",
+            "".join(f"{name}:{headers[name]}\n" for name in sorted(headers)),
+            signed_headers, payload_hash
+        ])
+        scope = f"{date}/{self.region}/s3/aws4_request"
+        string_to_sign = "\n".join([
+            "AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical_request.encode("utf-8")).hexdigest()
+        ])
+        signing_key = _hmac(("AWS4" + self.secret_key).encode("utf-8"), date)
+        for part in (self.region, "s3", "aws4_request"):
+            signing_key = _hmac(signing_key, part)
+        signature = hmac.new(signing_key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+        headers["authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, "
+            f"SignedHeaders={signed_headers}, Signature={signature}"
+        )
+        return headers
+
+    async def _request(self, method: str, key: str, payload_hash: str = EMPTY_PAYLOAD_HASH, **kwargs) -> httpx.Response:
+        path = self._object_path(key)
+        headers = {**self.sign(method, path, payload_hash), **kwargs.pop("headers", {})}
+        return await self._get_client().request(method, self.endpoint + path, headers=headers, **kwargs)
+
+    async def _file_blocks(self, path: str) -> AsyncIterator[bytes]:
+        with open(path, "rb") as f:
+            while True:
+                block = await asyncio.to_thread(f.read, READ_BLOCK_SIZE)
+                if not block:
+                    return
+                yield block
+
+    async def put_file(self, src_path: str) -> str:
+        # 内容哈希同时作为SigV4的负载哈希
+        digest = await asyncio.to_thread(file_digest, src_path)
+        key = artifact_key(digest, os.path.splitext(src_path)[1])
+        if await self.size(key) is not None:
+            self.deduplicated += 1
+            return key
+        response = await self._request(
+            "PUT", key, digest, content=self._file_blocks(src_path),
+            headers={"content-length": str(os.path.getsize(src_path)), "content-type": "audio/wav"}
+        )
+        response.raise_for_status()
+        self.puts += 1
+        return key
+
+    async def get_file(self, key: str, dest_path: str) -> bool:
+        path = self._object_path(key)
+        request = self._get_client().build_request("GET", self.endpoint + path, headers=self.sign("GET", path, EMPTY_PAYLOAD_HASH))
+        response = await self._get_client().send(request, stream=True)
+        try:
+            if response.status_code == 404:
+                return False
+            response.raise_for_status()
+            with atomic_output(dest_path) as tmp_path:
+                with open(tmp_path, "wb") as f:
+                    async for block in response.aiter_bytes(READ_BLOCK_SIZE):
+                        await asyncio.to_thread(f.write, block)
+            return True
+        finally:
+            await response.aclose()
+
+    async def size(self, key: str) -> Optional[int]:
+        response = await self._request("HEAD", key)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return int(response.headers.get("content-length", 0))
+
+    async def delete(self, key: str):
+        response = await self._request("DELETE", key)
+        if response.status_code not in (200, 204, 404):
+            response.raise_for_status()
+
+    async def _serve(self, request):
+        key = request.path_params["key"]
+        if not _KEY_RE.match(key):
+            return Response(status_code=404)
+        path = self._object_path(key)
+        upstream = await self._get_client().send(
+            self._get_client().build_request("GET", self.endpoint + path, headers=self.sign("GET", path, EMPTY_PAYLOAD_HASH)),
+            stream=True
+        )
+        if upstream.status_code != 200:
+            await upstream.aclose()
+            return Response(status_code=404 if upstream.status_code == 404 else 502)
+
+        async def body():
+            try:
+                async for block in upstream.aiter_bytes():
+                    yield block
+            finally:
+                await upstream.aclose()
+        headers = {"content-length": upstream.headers.get("content-length", ""), "cache-control": "public, max-age=31536000, immutable"}
+        return StreamingResponse(body(), media_type=upstream.headers.get("content-type", "audio/wav"),
+                                 headers={k: v for k, v in headers.items() if v})
+
+    def asgi_app(self):
+        return Starlette(routes=[Route("/{key:path}", self._serve, methods=["GET"])])
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def create_artifact_store() -> ArtifactStore:
+    """按配置创建制品存储：local（默认）或 s3"""
+    if settings.artifact_store == "s3":
+        return S3ArtifactStore(
+            settings.s3_endpoint, settings.s3_bucket, settings.s3_access_key, settings.s3_secret_key,
+            settings.s3_region, settings.s3_prefix
+        )
+    return LocalArtifactStore(settings.artifact_local_dir or os.path.join(AppConstants.STATIC_DIR, ARTIFACT_URL_PREFIX))
+
+
+artifact_store = create_artifact_store()
+
+
+def get_artifact_store() -> ArtifactStore:
+    return artifact_store
@@ -0,0 +1,280 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional
+from app.core.config import settings
+from app.services.provider_governor import PlatformGovernor, provider_governor
+from app.services.synthesis_jobs import JOB_RETENTION_SECONDS, EventLogJob, JobStatus, SynthesisJob
+from app.services.workflow_synthesizer import ChunkEvent
+
+# 单次批量合成最多包含的工作流数量
+MAX_BATCH_FLOWS = 200
+
+
+class _Waiter:
+    """等待名额的节点"""
+    __slots__ = ("future", "governor")
+
+    def __init__(self, future: asyncio.Future, governor: Optional[PlatformGovernor]):
+        self.future = future
+        self.governor = governor
+
+
+class FairShareScheduler:
+    """批量合成的共享工作池：最多 workers 个节点同时合成
+
+    名额按工作流轮转分配（每个有等待节点的工作流轮流获得一个名额，节点多的工作流不会占满工作池）；
+    同一平台同时运行的节点数不超过该平台调度器的当前并发上限，平台已满时跳过使用该平台的工作流。
+    """
+
+    def __init__(self, workers: int):
+        self.workers = max(1, int(workers))
+        self.running = 0
+        self.granted = 0
+        self._queues: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()  # 按轮转顺序排列的各工作流等待队列
+        self._platform_running: Dict[PlatformGovernor, int] = {}
+
+    def _platform_full(self, governor: Optional[PlatformGovernor]) -> bool:
+        return governor is not None and self._platform_running.get(governor, 0) >= governor.current_limit
+
+    def _dispatch(self):
+        """按轮转顺序把空闲名额分配给平台未满的工作流，获得名额的工作流移到队尾"""
+        while self.running < self.workers:
+            flow_id = next(
+                (flow_id for flow_id, queue in self._queues.items() if not self._platform_full(queue[0].governor)),
+                None
+            )
+            if flow_id is None:
+                return
+            queue = self._queues[flow_id]
+            waiter = queue.popleft()
+            if queue:
+                self._queues.move_to_end(flow_id)
+            else:
+                del self._queues[flow_id]
+            self.running += 1
+            self.granted += 1
+            if waiter.governor is not None:
+                self._platform_running[waiter.governor] = self._platform_running.get(waiter.governor, 0) + 1
+            waiter.future.set_result(None)
+
+    def _discard(self, flow_id: str, waiter: _Waiter):
+        queue = self._queues.get(flow_id)
+        if queue and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del self._queues[flow_id]
+
+    async def acquire(self, flow_id: str, governor: Optional[PlatformGovernor] = None):
+        """为工作流的一个节点获取名额"""
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), governor)
+        self._queues.setdefault(flow_id, deque()).append(waiter)
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            # 已分配名额却取消时归还名额，否则从等待队列移除
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release(governor)
+            else:
+                self._discard(flow_id, waiter)
+            raise
+
+    def release(self, governor: Optional[PlatformGovernor] = None):
+        self.running -= 1
+        if governor is not None:
+            self._platform_running[governor] -= 1
+        self._dispatch()
+
+    def share(self, flow_id: str, platform, provider) -> "FlowShare":
+        """工作流在工作池中的名额（用法同信号量），按平台调度器限制同平台并发"""
+        governor = provider_governor.get(platform, provider.capabilities.max_concurrency) if provider else None
+        return FlowShare(self, flow_id, governor)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "waiting": sum(len(queue) for queue in self._queues.values()),
+            "waitingFlows": len(self._queues),
+            "granted": self.granted,
+        }
+
+
+class FlowShare:
+    """单个工作流在共享工作池中的名额，async with 获取与归还"""
+
+    def __init__(self, scheduler: FairShareScheduler, flow_id: str, governor: Optional[PlatformGovernor]):
+        self.scheduler = scheduler
+        self.flow_id = flow_id
+        self.governor = governor
+
+    async def __aenter__(self):
+        await self.scheduler.acquire(self.flow_id, self.governor)
+
+    async def __aexit__(self, *exc_info):
+        self.scheduler.release(self.governor)
+
+
+class BatchEventType:
+    """批量合成事件类型"""
+    START = "start"            # 开始
+    PROGRESS = "progress"      # 汇总进度
+    FLOW_END = "flow_end"      # 单个工作流结束
+    END = "end"                # 全部结束
+
+
+@dataclass
+class BatchFlow:
+    """批量合成中的一个工作流：合成任务，或创建任务失败的原因"""
+    flow_id: str
+    job: Optional[SynthesisJob] = None
+    error: Optional[str] = None
+    attached: bool = False     # 加入了已在运行的任务（不随批量任务取消）
+
+    @property
+    def status(self) -> str:
+        return self.job.status if self.job else JobStatus.FAILED
+
+    @property
+    def done(self) -> bool:
+        return self.job is None or self.job.done
+
+    def progress_fraction(self) -> float:
+        if self.done:
+            return 1.0
+        synthesizer = self.job.synthesizer
+        return synthesizer.processed_count / synthesizer.total_nodes if synthesizer.total_nodes else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        if self.job is None:
+            return {'flowId': self.flow_id, 'jobId': None, 'status': self.status, 'error': self.error}
+        synthesizer = self.job.synthesizer
+        completed = self.job.status == JobStatus.COMPLETED and synthesizer.audio_files
+        return {
+            'flowId': self.flow_id,
+            'jobId': self.job.id,
+            'status': self.status,
+            'error': self.job.error,
+            'attached': self.attached,
+            'progress': synthesizer._get_progress_data(),
+            'zipDownloadPath': synthesizer.zip_download_path if completed else None
+        }
+
+
+class BatchSynthesisJob(EventLogJob):
+    """多工作流批量合成：每个工作流作为普通合成任务运行（节点共享工作池），汇总进度与各工作流完成情况"""
+
+    def __init__(self, flows: List[BatchFlow]):
+        super().__init__()
+        self.flows = flows
+        self.progress_max_rate = settings.progress_event_max_rate  # 汇总进度事件每秒最多推送次数，0表示不限制
+        self._last_progress_at = 0.0
+
+    def _event(self, data: Dict, type: str, code: int = 0) -> str:
+        return f"data: {json.dumps({'data': data, 'code': code, 'type': type}, ensure_ascii=False)}\n\n"
+
+    def progress_data(self) -> Dict[str, Any]:
+        """汇总进度：各工作流完成比例的平均值（每个工作流权重相同），以及已知的节点总数"""
+        jobs = [flow.job for flow in self.flows if flow.job]
+        fractions = [flow.progress_fraction() for flow in self.flows]
+        return {
+            'flows': len(self.flows),
+            'completedFlows': sum(1 for flow in self.flows if flow.status == JobStatus.COMPLETED),
+            'failedFlows': sum(1 for flow in self.flows if flow.done and flow.status != JobStatus.COMPLETED),
+            'processed': sum(job.synthesizer.processed_count for job in jobs),
+            'total': sum(job.synthesizer.total_nodes for job in jobs),
+            'percentage': round(sum(fractions) / len(fractions) * 100 if fractions else 0, 1)
+        }
+
+    async def _watch(self, flow: BatchFlow):
+        """跟随工作流任务的事件推送汇总进度（按速率限制），任务结束后推送该工作流的结果"""
+        async for _ in flow.job.stream():
+            now = time.monotonic()
+            if self.progress_max_rate and now - self._last_progress_at < 1 / self.progress_max_rate:
+                continue
+            self._last_progress_at = now
+            await self._append(ChunkEvent(self._event(self.progress_data(), BatchEventType.PROGRESS)))
+        code = 0 if flow.status == JobStatus.COMPLETED else 1
+        await self._append(self._event({**flow.to_dict(), 'progress': self.progress_data()}, BatchEventType.FLOW_END, code))
+
+    async def _run(self):
+        status = JobStatus.COMPLETED
+        watchers = []
+        try:
+            await self._append(self._event({
+                'flowIds': [flow.flow_id for flow in self.flows],
+                'progress': self.progress_data()
+            }, BatchEventType.START))
+            for flow in self.flows:
+                if flow.job is None:
+                    await self._append(self._event({**flow.to_dict(), 'progress': self.progress_data()}, BatchEventType.FLOW_END, 1))
+            watchers = [asyncio.create_task(self._watch(flow)) for flow in self.flows if flow.job]
+            await asyncio.gather(*watchers)
+            failed = [flow.flow_id for flow in self.flows if flow.status != JobStatus.COMPLETED]
+            if failed:
+                status = JobStatus.FAILED
+                self.error = f"{len(failed)}个工作流合成失败"
+            await self._append(self._event({
+                'status': '批量合成完成' if not failed else self.error,
+                'failedFlowIds': failed,
+                'flows': [flow.to_dict() for flow in self.flows],
+                'progress': self.progress_data()
+            }, BatchEventType.END, 1 if failed else 0))
+        except asyncio.CancelledError:
+            status = JobStatus.CANCELLED
+            for flow in self.flows:
+                if flow.job and not flow.attached:
+                    flow.job.cancel()
+        finally:
+            for watcher in watchers:
+                watcher.cancel()
+            await self._finish(status)
+
+    def status_data(self) -> Dict[str, Any]:
+        """批量任务状态"""
+        return {
+            'batchId': self.id,
+            'status': self.status,
+            'error': self.error,
+            'eventCount': len(self.events),
+            'progress': self.progress_data(),
+            'flows': [flow.to_dict() for flow in self.flows],
+            'createdAt': self.created_at,
+            'finishedAt': self.finished_at
+        }
+
+
+class BatchJobManager:
+    """进程内批量合成任务管理"""
+
+    def __init__(self, retention_seconds: int = JOB_RETENTION_SECONDS):
+        self.retention_seconds = retention_seconds
+        self._jobs: Dict[str, BatchSynthesisJob] = {}
+
+    def _purge(self):
+        """清理超过保留时间的已结束任务"""
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.done and job.finished_at and now - job.finished_at > self.retention_seconds
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def create(self, flows: List[BatchFlow]) -> BatchSynthesisJob:
+        """创建并启动批量任务"""
+        self._purge()
+        job = BatchSynthesisJob(flows)
+        self._jobs[job.id] = job
+        job.start()
+        return job
+
+    def get(self, job_id: str) -> Optional[BatchSynthesisJob]:
+        return self._jobs.get(job_id)
+
+
+batch_scheduler = FairShareScheduler(settings.batch_synthesis_workers)
+batch_job_manager = BatchJobManager()
@@ -0,0 +1,161 @@
+import asyncio
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set
+from app.core.config import settings
+from app.core.constants import AppConstants
+from app.services import synthesis_cache as cache_module
+from app.services.provider_governor import PlatformGovernor, provider_governor
+from app.services.synthesis_cache import normalize_text
+
+# 让出前台时的检查间隔（秒）
+IDLE_POLL_SECONDS = 1.0
+
+
+def _config_tts_nodes(flow_config: Optional[Dict]) -> List[Dict]:
+    config = flow_config or {}
+    return [
+        node for logic in config.get('logicList', []) for node in logic.get('nodes', [])
+        if (node.get('properties') or {}).get('type') == 'ttsTextChunk'
+    ]
+
+
+def _node_text(node: Dict) -> str:
+    return ((node.get('properties') or {}).get('nodeContentData') or {}).get('text') or ''
+
+
+def changed_tts_nodes(previous_config: Optional[Dict], flow_config: Optional[Dict]) -> List[str]:
+    """新增或文本（规范化后）变化的 ttsTextChunk 节点ID，previous_config 为None时返回全部文本节点"""
+    previous = {node.get('id'): normalize_text(_node_text(node)) for node in _config_tts_nodes(previous_config)}
+    return [
+        node.get('id') for node in _config_tts_nodes(flow_config)
+        if _node_text(node).strip() and previous.get(node.get('id')) != normalize_text(_node_text(node))
+    ]
+
+
+class Presynthesizer:
+    """保存工作流后在后台预合成新增或修改的文本节点，结果写入合成缓存
+
+    低优先级：前台有合成任务运行或平台调度器没有空闲名额时等待；同一工作流多次保存会合并为一次预合成。
+    预合成不修改节点指纹与工作流目录，也不保存到制品存储，合成全部时节点从缓存恢复。
+    """
+
+    def __init__(self, enabled: bool = False, workers: int = 1):
+        self.enabled = enabled
+        self.workers = max(1, int(workers))
+        self.synthesized = 0
+        self.skipped = 0
+        self.failed = 0
+        self._pending: "OrderedDict[str, Set[str]]" = OrderedDict()  # flow_id -> 待预合成的节点ID
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def flow_saved(self, flow, previous_config: Optional[Dict] = None):
+        """工作流创建或修改后调用，previous_config 为修改前的配置（新建或更换音色时为None）"""
+        if not self.enabled:
+            return
+        node_ids = changed_tts_nodes(previous_config, flow.flow_config)
+        if not node_ids:
+            return
+        self._pending.setdefault(str(flow.id), set()).update(node_ids)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def discard(self, flow_id: str):
+        """工作流删除后取消其待预合成的节点"""
+        self._pending.pop(str(flow_id), None)
+
+    async def _wait_idle(self, governor: PlatformGovernor):
+        """有前台合成任务或平台没有空闲名额时等待"""
+        from app.services.synthesis_jobs import synthesis_job_manager
+
+        while synthesis_job_manager.running_flow_ids() or governor.inflight >= governor.current_limit:
+            await asyncio.sleep(IDLE_POLL_SECONDS)
+
+    async def presynthesize_nodes(self, synthesizer, node_ids: Iterable[str]):
+        """用工作流合成器逐个合成节点到临时文件（与合成全部相同的切分与缓存键），只保留缓存结果"""
+        from app.services.workflow_plan import get_workflow_plan
+
+        if synthesizer.provider is None:
+            return
+        node_ids = set(node_ids)
+        governor = provider_governor.get(synthesizer.platform, synthesizer.provider.capabilities.max_concurrency)
+        plan = get_workflow_plan(synthesizer.flow, synthesizer.voice, synthesizer.platform)
+        scratch_dir = os.path.join(AppConstants.STATIC_DIR, "tts_parts", str(synthesizer.flow.id))
+        for node in plan.tts_nodes:
+            if node.id not in node_ids:
+                continue
+            info = synthesizer._resolve_tts_node(node)
+            if (not info['text'] or info['existing_path'] or info['artifact_key']
+                    or await asyncio.to_thread(cache_module.synthesis_cache.contains, info['fingerprint'])):
+                self.skipped += 1
+                continue
+            await self._wait_idle(governor)
+            info['wav_path'] = os.path.join(scratch_dir, f"presynthesis_{node.id}.wav")
+            try:
+                async for chunk in synthesizer._tts_stream(info, publish=False, keep_pcm=False):
+                    if chunk.get('type') == 'error':
+                        raise Exception(chunk.get('data'))
+                self.synthesized += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"警告: 预合成节点 {node.id} 失败: {e}")
+            finally:
+                if os.path.exists(info['wav_path']):
+                    os.remove(info['wav_path'])
+
+    async def _presynthesize_flow(self, flow_id: str, node_ids: Set[str]):
+        from app.models.tts_flow import TTSFlow
+        from app.models.tts_voice import TTSVoice
+        from app.models.tts_platform import TTSPlatform
+        from app.services.workflow_synthesizer import WorkflowSynthesizer
+
+        flow = await TTSFlow.get(flow_id)
+        if not flow or not flow.voiceId:
+            return
+        voice = await TTSVoice.get(flow.voiceId)
+        platform = await TTSPlatform.get(voice.platform_id) if voice else None
+        if not platform:
+            return
+        await self.presynthesize_nodes(WorkflowSynthesizer(flow, voice, platform), node_ids)
+
+    async def _worker(self):
+        while True:
+            await self._wakeup.wait()
+            if not self._pending:
+                self._wakeup.clear()
+                continue
+            flow_id, node_ids = self._pending.popitem(last=False)
+            try:
+                await self._presynthesize_flow(flow_id, node_ids)
+            except Exception as e:
+                self.failed += len(node_ids)
+                print(f"警告: 工作流 {flow_id} 预合成失败: {e}")
+
+    def start(self):
+        """启动后台预合成任务（未开启时不启动）"""
+        if self.enabled and not self._tasks:
+            self._wakeup = asyncio.Event()
+            if self._pending:
+                self._wakeup.set()
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._wakeup = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "pendingFlows": len(self._pending),
+            "pendingNodes": sum(len(node_ids) for node_ids in self._pending.values()),
+            "synthesized": self.synthesized,
+            "skipped": self.skipped,
+            "failed": self.failed,
+        }
+
+
+presynthesizer = Presynthesizer(settings.presynthesis_enabled, settings.presynthesis_workers)
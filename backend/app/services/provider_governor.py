@@ -0,0 +1,194 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+# 默认参数，可在平台配置 (TTSPlatform.config) 中覆盖
+DEFAULT_QPS = 0                 # 每秒请求数上限，0表示不限制
+DEFAULT_MIN_CONCURRENCY = 1     # 自适应并发下限
+DECREASE_FACTOR = 0.5           # 被限流时并发上限/QPS的缩减比例
+DECREASE_COOLDOWN = 1.0         # 两次缩减的最小间隔（秒），避免同一波限流把上限连续减半
+
+
+def _number_config(config: Dict[str, Any], key: str, default: float, minimum: float = 0) -> float:
+    try:
+        return max(minimum, float(config.get(key, default)))
+    except (TypeError, ValueError):
+        return default
+
+
+class TokenBucket:
+    """令牌桶：按 rate 每秒补充令牌，最多积攒 burst 个；rate为0表示不限制"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self._updated = time.monotonic()
+
+    def reserve(self) -> float:
+        """预约一个令牌，返回需要等待的秒数（令牌可以透支，后来者顺延等待）"""
+        if not self.rate:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class PlatformGovernor:
+    """单个平台的请求调度：QPS令牌桶 + 自适应并发上限（AIMD）
+
+    请求成功时并发上限缓慢回升（每 limit 次成功约 +1），被平台限流时减半；
+    配置了QPS时，速率同样按限流减半、成功回升，但不超过配置值。
+    """
+
+    def __init__(self, max_concurrency: int, qps: float = DEFAULT_QPS, qps_burst: Optional[float] = None,
+                 min_concurrency: int = DEFAULT_MIN_CONCURRENCY):
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+        self.inflight = 0
+        self.peak_inflight = 0
+        self.wait_seconds = 0.0
+        self._waiters: Deque[asyncio.Future] = deque()  # 等待并发名额的请求（future 绑定创建它的事件循环）
+        self._last_decrease = 0.0
+        self.configure(max_concurrency, qps, qps_burst, min_concurrency)
+
+    def configure(self, max_concurrency: int, qps: float = DEFAULT_QPS, qps_burst: Optional[float] = None,
+                  min_concurrency: int = DEFAULT_MIN_CONCURRENCY):
+        """更新配置（平台配置修改后调用），当前自适应值收敛到新的范围内"""
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.min_concurrency = max(1, min(int(min_concurrency), self.max_concurrency))
+        self.limit = float(self.max_concurrency)
+        self.max_qps = qps
+        self.bucket = TokenBucket(qps, qps_burst if qps_burst is not None else qps)
+        self._wake()
+
+    @property
+    def current_limit(self) -> int:
+        return max(self.min_concurrency, int(self.limit))
+
+    async def acquire(self):
+        """获取一个并发名额和一个QPS令牌"""
+        start = time.monotonic()
+        if self._waiters or self.inflight >= self.current_limit:
+            # 名额在唤醒时直接转交给等待者（_wake 已计入 inflight），按先来后到分配
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # 已被唤醒却取消：归还转交来的名额
+                    self._release_slot()
+                else:
+                    self._waiters.remove(waiter)
+                raise
+        else:
+            self.inflight += 1
+        self.requests += 1
+        self.peak_inflight = max(self.peak_inflight, self.inflight)
+        delay = self.bucket.reserve()
+        if delay:
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self._release_slot()
+                raise
+        self.wait_seconds += time.monotonic() - start
+
+    def _release_slot(self):
+        self.inflight -= 1
+        self._wake()
+
+    def release(self, throttled: bool = False, failed: bool = False):
+        """归还名额并按结果调整并发上限与QPS"""
+        if throttled:
+            self.throttled += 1
+            self._decrease()
+        elif failed:
+            self.errors += 1
+        else:
+            self._increase()
+        self._release_slot()
+
+    def _wake(self):
+        """把空出的名额依次转交给等待者"""
+        while self._waiters and self.inflight < self.current_limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.inflight += 1
+                waiter.set_result(None)
+
+    def _decrease(self):
+        now = time.monotonic()
+        if now - self._last_decrease < DECREASE_COOLDOWN:
+            return
+        self._last_decrease = now
+        self.limit = max(float(self.min_concurrency), self.limit * DECREASE_FACTOR)
+        if self.max_qps:
+            self.bucket.rate = max(self.max_qps * 0.1, self.bucket.rate * DECREASE_FACTOR)
+
+    def _increase(self):
+        self.limit = min(float(self.max_concurrency), self.limit + 1 / max(self.limit, 1.0))
+        if self.max_qps:
+            self.bucket.rate = min(self.max_qps, self.bucket.rate + self.max_qps / 20)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "errors": self.errors,
+            "inflight": self.inflight,
+            "peakInflight": self.peak_inflight,
+            "concurrencyLimit": self.current_limit,
+            "maxConcurrency": self.max_concurrency,
+            "qps": round(self.bucket.rate, 2),
+            "maxQps": self.max_qps,
+            "waitSeconds": round(self.wait_seconds, 3),
+        }
+
+
+class ProviderGovernorRegistry:
+    """进程内按平台共享的调度器，工作流合成与单节点合成的全部平台请求都经过它"""
+
+    def __init__(self):
+        self._governors: Dict[str, Tuple[Tuple, PlatformGovernor]] = {}
+
+    @staticmethod
+    def _platform_key(platform) -> str:
+        return str(getattr(platform, "id", None) or getattr(platform, "type", None))
+
+    @staticmethod
+    def _options(platform, default_concurrency: int) -> Tuple:
+        """平台配置：platform_concurrency 平台总并发，qps / qps_burst 请求速率，min_concurrency 自适应下限"""
+        config = getattr(platform, "config", None) or {}
+        return (
+            int(_number_config(config, "platform_concurrency", default_concurrency, 1)),
+            _number_config(config, "qps", DEFAULT_QPS),
+            _number_config(config, "qps_burst", _number_config(config, "qps", DEFAULT_QPS), 1),
+            int(_number_config(config, "min_concurrency", DEFAULT_MIN_CONCURRENCY, 1)),
+        )
+
+    def get(self, platform, default_concurrency: int) -> PlatformGovernor:
+        """获取平台调度器，配置变化时按新配置调整"""
+        key = self._platform_key(platform)
+        options = self._options(platform, default_concurrency)
+        current = self._governors.get(key)
+        if current and current[0] == options:
+            return current[1]
+        if current:
+            current[1].configure(*options)
+            governor = current[1]
+        else:
+            governor = PlatformGovernor(*options)
+        self._governors[key] = (options, governor)
+        return governor
+
+    def stats(self) -> Dict[str, Any]:
+        return {key: governor.stats() for key, (_, governor) in self._governors.items()}
+
+
+provider_governor = ProviderGovernorRegistry()
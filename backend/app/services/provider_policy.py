@@ -0,0 +1,135 @@
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Optional
+
+# 默认参数，可在平台配置 (TTSPlatform.config) 中覆盖
+DEFAULT_CONNECT_TIMEOUT = 10.0       # 建立连接超时（秒）
+DEFAULT_FIRST_CHUNK_TIMEOUT = 30.0   # 首包超时（秒）
+DEFAULT_CHUNK_TIMEOUT = 30.0         # 相邻两个chunk的最大间隔（秒）
+DEFAULT_RETRIES = 2                  # 超时、网络错误、服务端错误的重试次数
+DEFAULT_RETRY_BACKOFF = 0.5          # 首次重试的最大退避时间（秒），之后每次翻倍
+DEFAULT_THROTTLE_RETRIES = 3         # 被限流后的重试次数
+DEFAULT_THROTTLE_BACKOFF = 0.5       # 限流重试的首次退避时间（秒）
+MAX_BACKOFF = 10.0
+
+DEFAULT_HEDGE_QUANTILE = 0.95        # 首包耗时超过该分位数时发出对冲请求
+HEDGE_MIN_SAMPLES = 20               # 样本不足时不对冲
+LATENCY_WINDOW = 200                 # 保留的最近首包耗时样本数
+
+
+class ProviderTimeout(Exception):
+    """平台请求超时（连接、首包或chunk间隔）"""
+
+
+class ProviderEmptyResponse(Exception):
+    """平台请求没有返回任何数据就结束"""
+
+
+def _float(config: Dict[str, Any], key: str, default: float) -> float:
+    try:
+        return max(0.0, float(config.get(key, default)))
+    except (TypeError, ValueError):
+        return default
+
+
+def _int(config: Dict[str, Any], key: str, default: int) -> int:
+    try:
+        return max(0, int(config.get(key, default)))
+    except (TypeError, ValueError):
+        return default
+
+
+@dataclass(frozen=True)
+class RequestPolicy:
+    """单次节点合成请求的超时、重试与对冲策略"""
+    connect_timeout: float = DEFAULT_CONNECT_TIMEOUT
+    first_chunk_timeout: float = DEFAULT_FIRST_CHUNK_TIMEOUT
+    chunk_timeout: float = DEFAULT_CHUNK_TIMEOUT
+    retries: int = DEFAULT_RETRIES
+    retry_backoff: float = DEFAULT_RETRY_BACKOFF
+    throttle_retries: int = DEFAULT_THROTTLE_RETRIES
+    throttle_backoff: float = DEFAULT_THROTTLE_BACKOFF
+    hedge: bool = False
+    hedge_quantile: float = DEFAULT_HEDGE_QUANTILE
+
+    @classmethod
+    def from_platform(cls, platform) -> "RequestPolicy":
+        config = getattr(platform, "config", None) or {}
+        return cls(
+            connect_timeout=_float(config, "connect_timeout", DEFAULT_CONNECT_TIMEOUT),
+            first_chunk_timeout=_float(config, "first_chunk_timeout", DEFAULT_FIRST_CHUNK_TIMEOUT),
+            chunk_timeout=_float(config, "chunk_timeout", DEFAULT_CHUNK_TIMEOUT),
+            retries=_int(config, "retries", DEFAULT_RETRIES),
+            retry_backoff=_float(config, "retry_backoff", DEFAULT_RETRY_BACKOFF),
+            throttle_retries=_int(config, "throttle_retries", DEFAULT_THROTTLE_RETRIES),
+            throttle_backoff=_float(config, "throttle_backoff", DEFAULT_THROTTLE_BACKOFF),
+            hedge=bool(config.get("hedge", False)),
+            hedge_quantile=min(0.999, _float(config, "hedge_quantile", DEFAULT_HEDGE_QUANTILE)),
+        )
+
+    def retry_delay(self, attempt: int, throttled: bool = False) -> float:
+        """第 attempt 次重试前的等待时间：限流按固定指数退避，其他错误加全抖动"""
+        if throttled:
+            return min(MAX_BACKOFF, self.throttle_backoff * (2 ** attempt))
+        return random.uniform(0, min(MAX_BACKOFF, self.retry_backoff * (2 ** attempt)))
+
+
+def remaining(deadline: Optional[float]) -> Optional[float]:
+    """距离截止时间（time.monotonic）的剩余秒数，None表示不限制"""
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def clamp_timeout(timeout: float, deadline: Optional[float]) -> Optional[float]:
+    """超时时间不超过剩余预算，0表示不限制"""
+    left = remaining(deadline)
+    if not timeout:
+        return left
+    return timeout if left is None else min(timeout, left)
+
+
+class LatencyTracker:
+    """按平台记录最近的首包耗时，用于计算对冲阈值"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """样本不足 HEDGE_MIN_SAMPLES 时返回None"""
+        if len(self._samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def stats(self) -> Dict[str, Any]:
+        p50, p95 = self.quantile(0.5), self.quantile(0.95)
+        return {
+            "samples": len(self._samples),
+            "p50": round(p50, 3) if p50 is not None else None,
+            "p95": round(p95, 3) if p95 is not None else None,
+            "hedged": self.hedged,
+            "hedgeWins": self.hedge_wins,
+        }
+
+
+class LatencyRegistry:
+    def __init__(self):
+        self._trackers: Dict[str, LatencyTracker] = {}
+
+    def get(self, platform) -> LatencyTracker:
+        key = str(getattr(platform, "id", None) or getattr(platform, "type", None))
+        return self._trackers.setdefault(key, LatencyTracker())
+
+    def stats(self) -> Dict[str, Any]:
+        return {key: tracker.stats() for key, tracker in self._trackers.items()}
+
+
+latency_registry = LatencyRegistry()
@@ -0,0 +1,144 @@
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Set, Tuple
+import httpx
+from app.services.provider_policy import RequestPolicy
+
+# 默认连接池参数，可在平台配置 (TTSPlatform.config) 中通过 pool_size / pool_idle_timeout 覆盖
+DEFAULT_POOL_SIZE = 10
+DEFAULT_IDLE_TIMEOUT = 60.0
+
+
+class _PoolStats:
+    """单个平台连接池的统计"""
+    def __init__(self):
+        self.requests = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+        self._streams = weakref.WeakSet()  # 已见过的底层连接
+
+    async def on_response(self, response: httpx.Response):
+        self.requests += 1
+        stream = response.extensions.get("network_stream")
+        if stream is None:
+            return
+        if stream in self._streams:
+            self.reused_connections += 1
+        else:
+            self.new_connections += 1
+            self._streams.add(stream)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "newConnections": self.new_connections,
+            "reusedConnections": self.reused_connections,
+            "reuseRate": round(self.reused_connections / self.requests * 100, 1) if self.requests else 0,
+        }
+
+
+class ProviderConnectionPool:
+    """进程内按平台共享的 keep-alive HTTP 连接池
+
+    工作流合成与单节点合成共用同一个 httpx.AsyncClient，避免每个节点重新建立 TCP+TLS 连接。
+    连接池配置变化时旧客户端被替换，等通过 client() 发起的请求全部结束后再关闭。
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, Tuple[Tuple[int, float, float], httpx.AsyncClient]] = {}
+        self._stats: Dict[str, _PoolStats] = {}
+        self._inflight: Dict[httpx.AsyncClient, int] = {}  # 各客户端进行中的请求数
+        self._retired: Set[httpx.AsyncClient] = set()       # 已被替换、等待请求结束后关闭的客户端
+        self._closing: Set[asyncio.Task] = set()            # 进行中的关闭任务
+
+    def _close_later(self, client: httpx.AsyncClient):
+        task = asyncio.ensure_future(client.aclose())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    def _retire(self, client: httpx.AsyncClient):
+        """旧客户端没有进行中的请求时立即关闭，否则等最后一个请求结束"""
+        if self._inflight.get(client):
+            self._retired.add(client)
+        else:
+            self._close_later(client)
+
+    @staticmethod
+    def _platform_key(platform) -> str:
+        return str(getattr(platform, "id", None) or getattr(platform, "type", None))
+
+    @staticmethod
+    def _pool_options(platform) -> Tuple[int, float, float]:
+        config = getattr(platform, "config", None) or {}
+        try:
+            pool_size = max(1, int(config.get("pool_size", DEFAULT_POOL_SIZE)))
+        except (TypeError, ValueError):
+            pool_size = DEFAULT_POOL_SIZE
+        try:
+            idle_timeout = float(config.get("pool_idle_timeout", DEFAULT_IDLE_TIMEOUT))
+        except (TypeError, ValueError):
+            idle_timeout = DEFAULT_IDLE_TIMEOUT
+        return pool_size, idle_timeout, RequestPolicy.from_platform(platform).connect_timeout
+
+    def get_client(self, platform) -> httpx.AsyncClient:
+        """获取平台对应的共享客户端，连接池配置变化时重建"""
+        key = self._platform_key(platform)
+        options = self._pool_options(platform)
+        current = self._clients.get(key)
+        if current and current[0] == options and not current[1].is_closed:
+            return current[1]
+        if current:
+            self._retire(current[1])
+
+        pool_size, idle_timeout, connect_timeout = options
+        stats = self._stats.setdefault(key, _PoolStats())
+        client = httpx.AsyncClient(
+            # 首包与chunk间隔超时由调用方（TTSProvider.stream）控制，这里只限制建立连接
+            timeout=httpx.Timeout(None, connect=connect_timeout or None),
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+                keepalive_expiry=idle_timeout
+            ),
+            event_hooks={"response": [stats.on_response]}
+        )
+        self._clients[key] = (options, client)
+        return client
+
+    @asynccontextmanager
+    async def client(self, platform) -> AsyncIterator[httpx.AsyncClient]:
+        """在请求期间持有平台共享客户端，期间客户端被替换也不会关闭"""
+        client = self.get_client(platform)
+        self._inflight[client] = self._inflight.get(client, 0) + 1
+        try:
+            yield client
+        finally:
+            self._inflight[client] -= 1
+            if not self._inflight[client]:
+                del self._inflight[client]
+                if client in self._retired:
+                    self._retired.discard(client)
+                    self._close_later(client)
+
+    def stats(self) -> Dict[str, Any]:
+        """各平台连接复用统计"""
+        result = {}
+        for key, stats in self._stats.items():
+            data = stats.to_dict()
+            options = self._clients.get(key, ((None, None, None), None))[0]
+            data.update({"poolSize": options[0], "idleTimeout": options[1]})
+            result[key] = data
+        return result
+
+    async def close(self):
+        """关闭全部连接（应用退出时调用）"""
+        clients = [client for _, client in self._clients.values()] + list(self._retired)
+        self._clients.clear()
+        self._retired.clear()
+        for client in clients:
+            await client.aclose()
+        await asyncio.gather(*self._closing, return_exceptions=True)
+
+
+provider_pool = ProviderConnectionPool()
@@ -0,0 +1,102 @@
+import asyncio
+from typing import AsyncIterator, Callable, Dict, List
+
+# 已被全部需要PCM的订阅者读过的PCM chunk在日志中替换为占位chunk（只保留进度计数）
+PCM_PLACEHOLDER = {"data": "", "type": "pcm", "end": False}
+
+
+class _Flight:
+    """一次进行中的合成：chunk日志与订阅者计数"""
+
+    def __init__(self):
+        self.chunks: List[Dict] = []
+        self.done = False
+        self.subscribers = 0
+        self.pcm_readers: Dict[object, int] = {}  # 需要PCM的订阅者 -> 已读取的chunk数
+        self.trimmed = 0                       # 此前的PCM chunk已替换为占位chunk
+        self.condition = asyncio.Condition()
+        self.task: asyncio.Task = None
+
+    def trim(self):
+        """丢弃已被全部需要PCM的订阅者读过的PCM数据"""
+        limit = min(self.pcm_readers.values(), default=len(self.chunks))
+        for index in range(self.trimmed, limit):
+            if self.chunks[index].get("type") == "pcm":
+                self.chunks[index] = PCM_PLACEHOLDER
+        self.trimmed = max(self.trimmed, limit)
+
+
+class SingleFlight:
+    """相同键的并发流式请求只执行一次，后来者从头回放同一份chunk流
+
+    实际请求在独立任务中运行，不受某个订阅者断开影响；全部订阅者都离开时取消请求。
+    日志只为仍在读取的 keep_pcm 订阅者保留PCM数据，后来者回放到的PCM为占位chunk（音频从最终wav读取）。
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def _run(self, key: str, flight: _Flight, stream_factory: Callable[[], AsyncIterator[Dict]]):
+        try:
+            async for chunk in stream_factory():
+                async with flight.condition:
+                    flight.chunks.append(chunk)
+                    flight.trim()
+                    flight.condition.notify_all()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            flight.chunks.append({"data": str(e), "type": "error", "end": True})
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            flight.done = True
+            async with flight.condition:
+                flight.condition.notify_all()
+
+    async def stream(self, key: str, stream_factory: Callable[[], AsyncIterator[Dict]],
+                     keep_pcm: bool = True) -> AsyncIterator[Dict]:
+        """订阅键为 key 的请求，不存在时用 stream_factory 发起；keep_pcm=False 的订阅者只需要PCM占位chunk"""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _Flight()
+            flight.task = asyncio.create_task(self._run(key, flight, stream_factory))
+            self.started += 1
+        else:
+            self.coalesced += 1
+        flight.subscribers += 1
+        reader = object()
+        if keep_pcm:
+            flight.pcm_readers[reader] = 0
+        index = 0
+        try:
+            while True:
+                async with flight.condition:
+                    await flight.condition.wait_for(lambda: len(flight.chunks) > index or flight.done)
+                    chunks = flight.chunks[index:]
+                    done = flight.done
+                for chunk in chunks:
+                    yield chunk
+                    index += 1
+                if keep_pcm:
+                    flight.pcm_readers[reader] = index
+                    flight.trim()
+                if done and index >= len(flight.chunks):
+                    return
+        finally:
+            flight.subscribers -= 1
+            flight.pcm_readers.pop(reader, None)
+            flight.trim()
+            if flight.subscribers == 0 and not flight.done:
+                # 立即移除，取消生效前加入的订阅者会发起新的请求，而不是读到没有结束chunk的流
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+
+    def inflight(self) -> int:
+        return len(self._flights)
+
+    def stats(self) -> Dict[str, int]:
+        return {"started": self.started, "coalesced": self.coalesced, "inflight": self.inflight()}
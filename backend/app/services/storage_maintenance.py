@@ -0,0 +1,320 @@
+import asyncio
+import os
+import shutil
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from app.core.config import settings
+from app.core.constants import AppConstants
+from app.services import synthesis_cache as cache_module
+from app.services.artifact_store import LocalArtifactStore, get_artifact_store, parse_artifact_url
+
+WORK_DIRS = ("tts_wav", "tts_parts")  # 按工作流划分的工作目录
+COMBINED_PREFIX = "tts_all."          # 拼接结果，不属于任何节点
+
+
+@dataclass
+class StorageUnit:
+    """可整体淘汰的存储单元：一个工作流的工作文件（目录与压缩包）、一个制品文件或一个合成缓存条目"""
+    name: str
+    paths: List[str] = field(default_factory=list)
+    bytes: int = 0
+    last_used: float = 0.0
+    cache_key: Optional[str] = None  # 合成缓存条目的键，淘汰时同步更新缓存索引
+
+
+def _file_usage(path: str) -> Tuple[int, float]:
+    stat = os.stat(path)
+    return stat.st_size, max(stat.st_mtime, stat.st_atime)
+
+
+def _tree_usage(path: str) -> Tuple[int, float]:
+    """文件或目录的总大小与最近使用时间"""
+    if not os.path.isdir(path):
+        return _file_usage(path)
+    total, last_used = 0, os.stat(path).st_mtime
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                size, used = _file_usage(os.path.join(root, name))
+            except FileNotFoundError:
+                continue
+            total += size
+            last_used = max(last_used, used)
+    return total, last_used
+
+
+def _remove(path: str):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _flow_id_of(name: str) -> str:
+    """工作目录中的条目名对应的工作流ID：{flow_id}/、{flow_id}.zip、{flow_id}_{profile}.zip 及其打包临时文件"""
+    return name.split(".", 1)[0].split("_", 1)[0]
+
+
+def _flow_nodes(flow) -> List[Dict]:
+    config = getattr(flow, "flow_config", None) or {}
+    return [node for logic in config.get("logicList", []) for node in logic.get("nodes", [])]
+
+
+def _audio_urls(flow) -> List[Optional[str]]:
+    """工作流节点音频与节点指纹中记录的 audioUrl"""
+    urls = [entry.get("audioUrl") for entry in (getattr(flow, "node_fingerprints", None) or {}).values()]
+    urls += [
+        ((node.get("properties") or {}).get("nodeContentData") or {}).get("audioUrl")
+        for node in _flow_nodes(flow)
+    ]
+    return urls
+
+
+def _referenced_artifacts(flows: Iterable) -> Set[str]:
+    """工作流节点音频与节点指纹中引用的制品键"""
+    keys = set()
+    for flow in flows:
+        keys.update(key for key in map(parse_artifact_url, _audio_urls(flow)) if key)
+    return keys
+
+
+def remove_flow_files(flow_id: str) -> int:
+    """删除工作流的工作文件（节点音频、拼接结果、压缩包、切分片段），返回释放的字节数；制品由GC按引用回收"""
+    freed = 0
+    for work_dir in WORK_DIRS:
+        root = os.path.join(AppConstants.STATIC_DIR, work_dir)
+        if not os.path.isdir(root):
+            continue
+        for name in os.listdir(root):
+            if _flow_id_of(name) != str(flow_id):
+                continue
+            path = os.path.join(root, name)
+            freed += _tree_usage(path)[0]
+            _remove(path)
+    return freed
+
+
+class StorageMaintainer:
+    """合成音频的磁盘配额与垃圾回收
+
+    每轮依次执行：删除已删除工作流的工作文件、删除工作流中已不存在的节点文件、
+    删除未被任何工作流引用的本地制品（超过宽限期的），总占用（含合成缓存）仍超过配额时
+    先淘汰未被引用的合成缓存条目，再淘汰工作流的工作文件，各自按最近最少使用排序。
+    被引用的制品、正在合成的工作流以及宽限期内写入的文件不会被淘汰。被淘汰的音频在下次合成时会从制品恢复或重新合成。
+    """
+
+    def __init__(self, quota_bytes: int = 0, interval: float = 0, grace_seconds: float = 0):
+        self.quota_bytes = quota_bytes
+        self.interval = interval
+        self.grace_seconds = grace_seconds
+        self.runs = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+        self.orphans_removed = 0
+        self.orphan_bytes = 0
+        self.last_run: Optional[float] = None
+        self.last_duration: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _flow_units(self) -> Dict[str, StorageUnit]:
+        units: Dict[str, StorageUnit] = {}
+        for work_dir in WORK_DIRS:
+            root = os.path.join(AppConstants.STATIC_DIR, work_dir)
+            if not os.path.isdir(root):
+                continue
+            for name in os.listdir(root):
+                path = os.path.join(root, name)
+                unit = units.setdefault(_flow_id_of(name), StorageUnit(_flow_id_of(name)))
+                size, last_used = _tree_usage(path)
+                unit.paths.append(path)
+                unit.bytes += size
+                unit.last_used = max(unit.last_used, last_used)
+        return units
+
+    @staticmethod
+    def _artifact_units() -> List[StorageUnit]:
+        """本地制品（对象存储中的制品不计入本机磁盘占用）"""
+        store = get_artifact_store()
+        if not isinstance(store, LocalArtifactStore) or not os.path.isdir(store.root):
+            return []
+        units = []
+        for root, _, files in os.walk(store.root):
+            for name in files:
+                path = os.path.join(root, name)
+                size, last_used = _file_usage(path)
+                units.append(StorageUnit(os.path.relpath(path, store.root).replace(os.sep, "/"), [path], size, last_used))
+        return units
+
+    @staticmethod
+    def _cache_units() -> List[StorageUnit]:
+        """合成缓存条目（写入中的临时文件不计入）"""
+        cache_dir = cache_module.synthesis_cache.cache_dir
+        if not os.path.isdir(cache_dir):
+            return []
+        units = []
+        for name in os.listdir(cache_dir):
+            if not name.endswith(".wav"):
+                continue
+            path = os.path.join(cache_dir, name)
+            try:
+                size, last_used = _file_usage(path)
+            except FileNotFoundError:
+                continue
+            units.append(StorageUnit(f"tts_cache/{name}", [path], size, last_used, cache_key=name[:-4]))
+        return units
+
+    def _remove_stale_node_files(self, flow, unit: StorageUnit, cutoff: float) -> int:
+        """删除工作流目录中已不属于任何节点的文件（节点被删除后遗留）
+
+        节点文件名为 {node_id}.{ext}；旧版本按 {node_id}_{节点名}.wav 命名的文件在节点 audioUrl 仍引用时保留。
+        """
+        prefixes = tuple(f"{node.get('id')}." for node in _flow_nodes(flow))
+        referenced = {os.path.basename(url) for url in _audio_urls(flow) if url and not parse_artifact_url(url)}
+        freed = 0
+        for path in unit.paths:
+            if not os.path.isdir(path):
+                continue
+            for name in os.listdir(path):
+                file_path = os.path.join(path, name)
+                stale = name.endswith(".tmp") or not (
+                    name.startswith(COMBINED_PREFIX) or name.startswith(prefixes) or name in referenced
+                )
+                if not stale or not os.path.isfile(file_path):
+                    continue
+                size, last_used = _file_usage(file_path)
+                if last_used < cutoff:
+                    _remove(file_path)
+                    freed += size
+                    self.orphans_removed += 1
+        return freed
+
+    def run_once(self, flows: List, running_flow_ids: Iterable[str] = ()) -> Dict[str, Any]:
+        """执行一轮维护（同步，在线程中调用），flows 为全部工作流"""
+        start = time.time()
+        cutoff = start - self.grace_seconds
+        flows_by_id = {str(flow.id): flow for flow in flows}
+        running = set(running_flow_ids)
+        orphan_bytes = evicted_bytes = 0
+
+        units = self._flow_units()
+        for flow_id, unit in list(units.items()):
+            if flow_id in running:
+                continue
+            if flow_id not in flows_by_id:
+                if unit.last_used < cutoff:
+                    for path in unit.paths:
+                        _remove(path)
+                    orphan_bytes += unit.bytes
+                    self.orphans_removed += 1
+                    del units[flow_id]
+                continue
+            freed = self._remove_stale_node_files(flows_by_id[flow_id], unit, cutoff)
+            unit.bytes -= freed
+            orphan_bytes += freed
+
+        artifacts = self._artifact_units()
+        referenced = _referenced_artifacts(flows)
+        for unit in list(artifacts):
+            if unit.name not in referenced and unit.last_used < cutoff:
+                _remove(unit.paths[0])
+                orphan_bytes += unit.bytes
+                self.orphans_removed += 1
+                artifacts.remove(unit)
+
+        # 回收后剩余的制品都被引用或仍在宽限期内，只计入占用，不参与淘汰
+        cache_units = self._cache_units()
+        total = sum(unit.bytes for unit in [*units.values(), *artifacts, *cache_units])
+        candidates = [
+            unit for unit in [*cache_units, *(unit for flow_id, unit in units.items() if flow_id not in running)]
+            if unit.last_used < cutoff
+        ]
+        if self.quota_bytes and total > self.quota_bytes:
+            # 未被引用的缓存条目优先，其次是工作流的工作文件（节点音频可从制品恢复）
+            for unit in sorted(candidates, key=lambda unit: (unit.cache_key is None, unit.last_used)):
+                if total <= self.quota_bytes:
+                    break
+                if unit.cache_key is not None:
+                    cache_module.synthesis_cache.discard(unit.cache_key)
+                else:
+                    for path in unit.paths:
+                        _remove(path)
+                total -= unit.bytes
+                evicted_bytes += unit.bytes
+                self.evictions += 1
+
+        self.runs += 1
+        self.orphan_bytes += orphan_bytes
+        self.evicted_bytes += evicted_bytes
+        self.last_run = start
+        self.last_duration = round(time.time() - start, 3)
+        return {"bytes": total, "orphanBytes": orphan_bytes, "evictedBytes": evicted_bytes}
+
+    async def maintain(self) -> Dict[str, Any]:
+        """加载全部工作流并执行一轮维护"""
+        from app.models.tts_flow import TTSFlow
+        from app.services.synthesis_jobs import synthesis_job_manager
+
+        flows = await TTSFlow.find_all().to_list()
+        return await asyncio.to_thread(self.run_once, flows, synthesis_job_manager.running_flow_ids())
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.maintain()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"警告: 存储维护失败: {e}")
+
+    def start(self):
+        """启动后台维护任务（interval为0时不启动）"""
+        if self.interval and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def usage(self) -> Dict[str, int]:
+        """当前占用（字节）"""
+        flow_units = self._flow_units()
+        return {
+            "flowFiles": sum(unit.bytes for unit in flow_units.values()),
+            "flows": len(flow_units),
+            "artifacts": sum(unit.bytes for unit in self._artifact_units()),
+            "cache": sum(unit.bytes for unit in self._cache_units()),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        usage = self.usage()
+        return {
+            **usage,
+            "bytes": usage["flowFiles"] + usage["artifacts"] + usage["cache"],
+            "quotaBytes": self.quota_bytes,
+            "runs": self.runs,
+            "evictions": self.evictions,
+            "evictedBytes": self.evicted_bytes,
+            "orphansRemoved": self.orphans_removed,
+            "orphanBytes": self.orphan_bytes,
+            "lastRun": self.last_run,
+            "lastDuration": self.last_duration,
+            "lastError": self.last_error,
+        }
+
+
+storage_maintainer = StorageMaintainer(
+    settings.storage_quota_bytes,
+    settings.storage_maintenance_interval,
+    settings.storage_gc_grace_seconds
+)
@@ -0,0 +1,256 @@
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import unicodedata
+import wave
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+from app.core.config import settings
+from app.core.constants import AppConstants
+from app.services.artifact_store import artifact_url, get_artifact_store
+from app.services.single_flight import SingleFlight
+
+
+def normalize_text(text: str) -> str:
+    """规范化文本：全角转半角、去除首尾空白、合并连续空白"""
+    text = unicodedata.normalize("NFKC", text or "")
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class SynthesisCache:
+    """按内容寻址的合成音频缓存
+
+    键为 (平台类型, 音色role_id, 规范化文本, 音频参数) 的sha256，
+    值为合成好的wav文件；总大小超过上限时按最近最少使用淘汰。
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # key -> 文件大小，按访问顺序排列
+        self._artifacts: Dict[str, str] = {}  # key -> 已保存到制品存储的制品键（进程内记录）
+        self._total_bytes = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(platform_type: str, role_id: str, text: str, audio_params: Dict[str, Any]) -> str:
+        """计算缓存键"""
+        raw = json.dumps(
+            [platform_type, role_id, normalize_text(text), audio_params],
+            ensure_ascii=False, sort_keys=True
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.wav")
+
+    def _load(self):
+        """首次使用时扫描缓存目录，按修改时间恢复LRU顺序"""
+        if self._loaded:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".wav"):
+                continue
+            stat = os.stat(os.path.join(self.cache_dir, name))
+            entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._total_bytes += size
+        self._loaded = True
+
+    def _evict(self):
+        """淘汰最久未使用的条目直到总大小不超过上限"""
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._artifacts.pop(key, None)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def lookup(self, key: str) -> Optional[str]:
+        """查询缓存，命中返回缓存文件路径"""
+        with self._lock:
+            self._load()
+            path = self._path(key)
+            if key in self._entries and os.path.exists(path):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                os.utime(path)
+                return path
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)
+                self._artifacts.pop(key, None)
+            self.misses += 1
+            return None
+
+    def contains(self, key: str) -> bool:
+        """是否已缓存（不计入命中统计，不改变淘汰顺序）"""
+        with self._lock:
+            self._load()
+            return key in self._entries and os.path.exists(self._path(key))
+
+    def restore(self, key: str, dest_path: str) -> bool:
+        """命中时将缓存音频复制到目标路径；复制过程中条目被并发淘汰时视为未命中"""
+        path = self.lookup(key)
+        if not path:
+            return False
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        try:
+            shutil.copyfile(path, dest_path)
+        except OSError:
+            return False
+        return True
+
+    def store(self, key: str, src_path: str):
+        """将合成结果写入缓存（先写临时文件再原子替换）"""
+        if not os.path.exists(src_path):
+            return
+        with self._lock:
+            self._load()
+            path = self._path(key)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            shutil.copyfile(src_path, tmp_path)
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+            self._total_bytes += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            self._artifacts.pop(key, None)
+            self._evict()
+
+    def discard(self, key: str):
+        """删除缓存条目（存储维护按配额淘汰时调用）"""
+        with self._lock:
+            self._load()
+            self._total_bytes -= self._entries.pop(key, 0)
+            self._artifacts.pop(key, None)
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def artifact_key(self, key: str) -> Optional[str]:
+        """缓存条目已保存到制品存储时返回制品键"""
+        with self._lock:
+            return self._artifacts.get(key) if key in self._entries else None
+
+    def set_artifact_key(self, key: str, artifact_key: str):
+        with self._lock:
+            if key in self._entries:
+                self._artifacts[key] = artifact_key
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        with self._lock:
+            self._load()
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": round(self.hits / total * 100, 1) if total else 0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "maxBytes": self.max_bytes,
+            }
+
+
+def _read_pcm_chunks(path: str, chunk_frames: int = 24000):
+    """读取wav文件的PCM数据并按块切分"""
+    chunks = []
+    with wave.open(path, "rb") as wavfile:
+        while True:
+            frames = wavfile.readframes(chunk_frames)
+            if not frames:
+                break
+            chunks.append(base64.b64encode(frames).decode())
+    return chunks
+
+
+async def publish_artifact(chunk: Dict, wav_path: str, cache_key: Optional[str] = None) -> Dict:
+    """将合成结果保存到制品存储，wav_path chunk 改为指向制品；保存失败时保留本地路径
+
+    缓存条目已保存过且制品仍存在时直接复用制品键，不再计算哈希与上传。
+    """
+    store = get_artifact_store()
+    try:
+        key = synthesis_cache.artifact_key(cache_key) if cache_key else None
+        if key is None or await store.size(key) is None:
+            key = await store.put_file(wav_path)
+            if cache_key:
+                synthesis_cache.set_artifact_key(cache_key, key)
+    except Exception as e:
+        print(f"警告: 保存音频制品失败: {e}")
+        return chunk
+    return {**chunk, "data": artifact_url(key)}
+
+
+async def cached_tts_stream(
+    key: str,
+    stream_factory: Callable[[], AsyncIterator[Dict]],
+    wav_path: str,
+    relative_path: str,
+    replay_pcm: bool = False,
+    publish: bool = True,
+    keep_pcm: bool = True
+) -> AsyncIterator[Dict]:
+    """先查缓存，未命中再调用平台流式合成，并在成功后写入缓存
+
+    chunk 格式与 tts_volcano_stream 一致；命中时 replay_pcm=True 会按块回放PCM，
+    最后的 wav_path chunk 带有 cached 标记。publish=True 时音频同时保存到制品存储，wav_path chunk 的 data 为制品地址。
+    keep_pcm=False 时PCM chunk可能只是占位chunk（调用方只使用最终wav）。
+    合并到其他请求的后来者收到的PCM可能已被丢弃：replay_pcm=True 时改为在完成后从wav回放完整PCM。
+    """
+    if await asyncio.to_thread(synthesis_cache.restore, key, wav_path):
+        if replay_pcm:
+            for data in await asyncio.to_thread(_read_pcm_chunks, wav_path):
+                yield {"data": data, "type": "pcm", "end": False}
+        chunk = {"data": relative_path, "type": "wav_path", "end": True, "cached": True}
+        yield await publish_artifact(chunk, wav_path, key) if publish else chunk
+        return
+
+    # 相同键的并发请求只调用一次平台，其他请求回放同一份chunk流，完成后从缓存复制音频
+    leader = False
+
+    async def synthesize():
+        nonlocal leader
+        leader = True
+        async for chunk in stream_factory():
+            if chunk.get("type") == "wav_path":
+                await asyncio.to_thread(synthesis_cache.store, key, wav_path)
+            yield chunk
+
+    async for chunk in synthesis_flights.stream(key, synthesize, keep_pcm):
+        if not leader and replay_pcm and chunk.get("type") == "pcm":
+            continue
+        if chunk.get("type") == "wav_path" and not leader:
+            if not await asyncio.to_thread(synthesis_cache.restore, key, wav_path):
+                yield {"data": "合成结果已被缓存淘汰，请重试", "type": "error", "end": True}
+                return
+            if replay_pcm:
+                for data in await asyncio.to_thread(_read_pcm_chunks, wav_path):
+                    yield {"data": data, "type": "pcm", "end": False}
+            chunk = {**chunk, "data": relative_path}
+        if chunk.get("type") == "wav_path" and publish:
+            chunk = await publish_artifact(chunk, wav_path, key)
+        yield chunk
+
+
+synthesis_cache = SynthesisCache(
+    os.path.join(AppConstants.STATIC_DIR, "tts_cache"),
+    settings.synthesis_cache_max_bytes
+)
+synthesis_flights = SingleFlight()  # 进行中的平台合成请求（按缓存键合并）
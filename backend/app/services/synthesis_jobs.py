@@ -0,0 +1,228 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+from app.services.workflow_synthesizer import ChunkEvent, WorkflowSynthesizer, EventType
+from app.utils.audio_utils import (
+    DEFAULT_CHANNELS, DEFAULT_SAMPLE_RATE, DEFAULT_SAMPLE_WIDTH, SilenceSegment,
+    iter_segment_frames, read_wav_params, streaming_wav_header
+)
+
+# 已结束任务的保留时间（秒），期间仍可重新连接获取事件
+JOB_RETENTION_SECONDS = 30 * 60
+# 事件日志中保留内容的重复进度事件（ChunkEvent）数，更早的只保留事件ID，重新连接时跳过
+MAX_REPLAY_CHUNK_EVENTS = 32
+
+
+class JobStatus:
+    """任务状态常量"""
+    RUNNING = "running"        # 运行中
+    COMPLETED = "completed"    # 已完成
+    FAILED = "failed"          # 失败
+    CANCELLED = "cancelled"    # 已取消
+
+
+class EventLogJob:
+    """在后台运行并缓存全部事件的任务，客户端断开后可按事件ID重新连接"""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = JobStatus.RUNNING
+        self.events: List[Optional[str]] = []  # 事件日志，下标即事件ID，已丢弃的重复进度事件为None
+        self._chunk_indexes: Deque[int] = deque()  # 日志中保留内容的重复进度事件下标
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._condition = asyncio.Condition()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status != JobStatus.RUNNING
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        raise NotImplementedError
+
+    async def _append(self, event: str):
+        async with self._condition:
+            if isinstance(event, ChunkEvent):
+                self._chunk_indexes.append(len(self.events))
+                if len(self._chunk_indexes) > MAX_REPLAY_CHUNK_EVENTS:
+                    self.events[self._chunk_indexes.popleft()] = None
+            self.events.append(event)
+            self._condition.notify_all()
+
+    async def _finish(self, status: str):
+        async with self._condition:
+            self.status = status
+            self.finished_at = time.time()
+            self._condition.notify_all()
+
+    def cancel(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+
+    async def stream(self, last_event_id: Optional[int] = None) -> AsyncIterator[str]:
+        """从 last_event_id 之后开始推送事件（带SSE id字段），任务结束且事件推送完毕后返回"""
+        index = 0 if last_event_id is None else last_event_id + 1
+        while True:
+            async with self._condition:
+                await self._condition.wait_for(lambda: len(self.events) > index or self.done)
+                events = self.events[index:]
+                done = self.done
+            for event in events:
+                if event is not None:
+                    yield f"id: {index}\n{event}"
+                index += 1
+            if done and index >= len(self.events):
+                return
+
+
+class SynthesisJob(EventLogJob):
+    """后台合成任务：在进程内运行合成器，并缓存全部事件供客户端断开后重新连接"""
+
+    def __init__(self, flow_id: str, synthesizer: WorkflowSynthesizer):
+        super().__init__()
+        self.flow_id = flow_id
+        self.synthesizer = synthesizer
+
+    async def _run(self):
+        status = JobStatus.COMPLETED
+        try:
+            async for event in self.synthesizer.synthesize_all():
+                await self._append(event)
+            last = self._last_event()
+            if not last or last.get('type') != EventType.END or last.get('code') != 0:
+                status = JobStatus.FAILED
+                self.error = ((last or {}).get('data') or {}).get('error')
+        except asyncio.CancelledError:
+            status = JobStatus.CANCELLED
+        except Exception as e:
+            status = JobStatus.FAILED
+            self.error = str(e)
+        finally:
+            await self._finish(status)
+
+    def _last_event(self) -> Optional[Dict[str, Any]]:
+        if not self.events:
+            return None
+        return json.loads(self.events[-1][len("data: "):])
+
+    async def _wait_segments(self, index: int):
+        """等待拼接计划中出现第 index 个片段或任务结束"""
+        async with self._condition:
+            await self._condition.wait_for(lambda: len(self.synthesizer.audio_files) > index or self.done)
+
+    async def audio_stream(self) -> AsyncIterator[bytes]:
+        """按流程顺序推送已完成片段的音频（流式wav），前序片段完成后立即播放，任务结束后返回
+
+        音频参数取自第一个音频文件（全部为留白时使用默认参数），之后的片段按拼接规则处理。
+        """
+        segments = self.synthesizer.audio_files
+        index = 0
+        params = None
+        while params is None:
+            first_file = next((f for f in segments if not isinstance(f, SilenceSegment) and os.path.exists(f)), None)
+            if first_file:
+                params = await asyncio.to_thread(read_wav_params, first_file)
+            elif self.done:
+                params = (DEFAULT_CHANNELS, DEFAULT_SAMPLE_WIDTH, DEFAULT_SAMPLE_RATE)
+            else:
+                index = len(segments)
+                await self._wait_segments(index)
+        yield streaming_wav_header(*params)
+
+        index = 0
+        while True:
+            await self._wait_segments(index)
+            if index >= len(segments):
+                return
+            frames = iter_segment_frames(segments[index], params)
+            while True:
+                block = await asyncio.to_thread(next, frames, None)
+                if block is None:
+                    break
+                yield block
+            index += 1
+
+    def status_data(self) -> Dict[str, Any]:
+        """任务状态"""
+        return {
+            'jobId': self.id,
+            'flowId': self.flow_id,
+            'status': self.status,
+            'error': self.error,
+            'eventCount': len(self.events),
+            'progress': self.synthesizer._get_progress_data(),
+            'createdAt': self.created_at,
+            'finishedAt': self.finished_at
+        }
+
+
+class SynthesisJobManager:
+    """进程内合成任务管理"""
+
+    def __init__(self, retention_seconds: int = JOB_RETENTION_SECONDS):
+        self.retention_seconds = retention_seconds
+        self._jobs: Dict[str, SynthesisJob] = {}
+
+    def _purge(self):
+        """清理超过保留时间的已结束任务"""
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.done and job.finished_at and now - job.finished_at > self.retention_seconds
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def create(self, flow_id: str, synthesizer: WorkflowSynthesizer) -> SynthesisJob:
+        """创建并启动合成任务"""
+        self._purge()
+        job = SynthesisJob(flow_id, synthesizer)
+        self._jobs[job.id] = job
+        job.start()
+        return job
+
+    def get(self, job_id: str) -> Optional[SynthesisJob]:
+        return self._jobs.get(job_id)
+
+    def running_for_flow(self, flow_id: str) -> Optional[SynthesisJob]:
+        """获取工作流正在运行的任务（同一工作流同时只运行一个任务）"""
+        return next((job for job in self._jobs.values() if job.flow_id == flow_id and not job.done), None)
+
+    def running_flow_ids(self) -> List[str]:
+        """正在合成的工作流ID"""
+        return [job.flow_id for job in self._jobs.values() if not job.done]
+
+    def create_or_attach(self, flow_id: str, synthesizer: WorkflowSynthesizer) -> SynthesisJob:
+        """工作流已有任务在运行时直接返回该任务（调用方重新订阅其事件），否则创建新任务
+
+        同一工作流的多个任务会写入相同的节点文件和 tts_all.wav，重复点击、多个标签页或代理重试都只运行一次合成。
+        """
+        running = self.running_for_flow(flow_id)
+        if running:
+            return running
+        return self.create(flow_id, synthesizer)
+
+    def latest_for_flow(self, flow_id: str) -> Optional[SynthesisJob]:
+        """获取工作流最近创建的任务"""
+        jobs = [job for job in self._jobs.values() if job.flow_id == flow_id]
+        return max(jobs, key=lambda job: job.created_at) if jobs else None
+
+
+def parse_last_event_id(value: Optional[str]) -> Optional[int]:
+    """解析 Last-Event-ID，无效值视为从头开始"""
+    try:
+        return int(value) if value not in (None, "") else None
+    except ValueError:
+        return None
+
+
+synthesis_job_manager = SynthesisJobManager()
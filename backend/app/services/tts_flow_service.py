@@ -1,6 +1,9 @@
-from typing import List, Optional
+import asyncio
+from typing import Any, Dict, List, Optional
 from app.models.tts_flow import TTSFlow
 from app.schemas.tts_flow import TTSFlowCreate, TTSFlowUpdate
+from app.services.storage_maintenance import remove_flow_files
+from app.services.presynthesis import presynthesizer
 from app.core.exceptions import (
     BusinessException,
     NotFoundException,
@@ -32,6 +35,8 @@ class TTSFlowService:
         )
         
         await tts_flow.insert()
+        # 后台预合成文本节点（settings.presynthesis_enabled）
+        presynthesizer.flow_saved(tts_flow)
         return tts_flow
     
     @staticmethod
@@ -67,6 +72,8 @@ class TTSFlowService:
             )
         
         update_data = tts_flow_update.dict(exclude_unset=True)
+        previous_config = tts_flow.flow_config
+        voice_changed = "voiceId" in update_data and update_data["voiceId"] != tts_flow.voiceId
         
         # 检查名称唯一性
         if "name" in update_data:
@@ -82,6 +89,9 @@ class TTSFlowService:
         tts_flow.update_timestamp()
         await tts_flow.save()
         
+        # 后台预合成新增或修改的文本节点，更换音色时全部节点都需要重新合成
+        if "flow_config" in update_data or voice_changed:
+            presynthesizer.flow_saved(tts_flow, None if voice_changed else previous_config)
         return tts_flow
     
     @staticmethod
@@ -95,8 +105,30 @@ class TTSFlowService:
             )
         
         await tts_flow.delete()
+        presynthesizer.discard(flow_id)
+        # 删除工作流的节点音频、拼接结果与压缩包（共享的制品由存储维护按引用回收）
+        await asyncio.to_thread(remove_flow_files, flow_id)
         return True
     
+    @staticmethod
+    async def save_node_fingerprints(tts_flow: TTSFlow, updates: Dict[str, Dict[str, Any]], removed: List[str] = ()):
+        """按节点合并保存节点指纹（不修改updated_at），不影响其他请求同时写入的节点"""
+        for node_id, record in updates.items():
+            tts_flow.node_fingerprints[node_id] = record
+        for node_id in removed:
+            tts_flow.node_fingerprints.pop(node_id, None)
+        if updates:
+            await tts_flow.set({f"node_fingerprints.{node_id}": record for node_id, record in updates.items()})
+        if removed:
+            await tts_flow.update({"$unset": {f"node_fingerprints.{node_id}": "" for node_id in removed}})
+    
+    @staticmethod
+    async def set_node_fingerprint(tts_flow: TTSFlow, node_id: str, fingerprint: str, audio_url: str):
+        """记录单个节点的指纹及其音频路径"""
+        record = {"fingerprint": fingerprint, "audioUrl": audio_url}
+        tts_flow.node_fingerprints[node_id] = record
+        await tts_flow.set({f"node_fingerprints.{node_id}": record})
+    
     @staticmethod
     async def get_tts_flows(skip: int = 0, limit: int = 100) -> List[TTSFlow]:
         """获取TTS工作流列表"""
@@ -0,0 +1,124 @@
+import array
+import asyncio
+import base64
+import hashlib
+import math
+import sys
+import wave
+from typing import Any, Dict
+from app.services.artifact_store import atomic_output
+from app.services.tts_provider import ProviderCapabilities, TTSProvider, register_provider
+
+LOCAL_SAMPLE_RATE = 24000
+LOCAL_AUDIO_PARAMS = {
+    "format": "pcm",
+    "sample_rate": LOCAL_SAMPLE_RATE,
+    "engine": "local-v1"
+}
+
+# 默认参数，可在平台配置 (TTSPlatform.config) 中覆盖
+DEFAULT_LATENCY_MS = 50        # 首包延迟（毫秒）
+DEFAULT_THROUGHPUT = 0         # 每秒生成的音频秒数，0表示不限速
+DEFAULT_CHAR_SECONDS = 0.2     # 每个字符的音频时长（秒）
+DEFAULT_CHUNK_SECONDS = 0.2    # 每个pcm chunk的音频时长（秒）
+
+_AMPLITUDE = 6000
+_SILENT_CHARS = set(" \t\r\n，。！？、；：,.!?;:…—-\"'“”‘’（）()")
+
+
+def _float_config(config: Dict[str, Any], key: str, default: float) -> float:
+    try:
+        return max(0.0, float(config.get(key, default)))
+    except (TypeError, ValueError):
+        return default
+
+
+def _tone_cycle(period: int) -> bytes:
+    """一个周期的正弦波（16bit小端）"""
+    samples = array.array("h", (
+        int(_AMPLITUDE * math.sin(2 * math.pi * i / period)) for i in range(period)
+    ))
+    if sys.byteorder == "big":
+        samples.byteswap()
+    return samples.tobytes()
+
+
+def render_pcm(text: str, role_id: str, char_seconds: float = DEFAULT_CHAR_SECONDS) -> bytes:
+    """确定性地生成PCM：每个字符一段正弦音（频率由音色和字符决定），标点为静音"""
+    digest = hashlib.sha256(f"{role_id}\0{text}".encode("utf-8")).digest()
+    char_frames = max(1, int(LOCAL_SAMPLE_RATE * char_seconds))
+    silence = b"\x00\x00" * char_frames
+    cycles: Dict[int, bytes] = {}
+    pcm = bytearray()
+    for index, char in enumerate(text):
+        if char in _SILENT_CHARS:
+            pcm += silence
+            continue
+        period = 40 + (ord(char) * 31 + digest[index % len(digest)]) % 80  # 200~600Hz
+        cycle = cycles.get(period)
+        if cycle is None:
+            cycle = cycles[period] = _tone_cycle(period)
+        repeats, remainder = divmod(char_frames, period)
+        pcm += cycle * repeats + cycle[:remainder * 2]
+    return bytes(pcm)
+
+
+def _save_wav(wav_path, audio_data):
+    """保存PCM数据为wav文件（原子写入，读取方不会看到写了一半的文件）"""
+    with atomic_output(wav_path) as tmp_path:
+        with wave.open(tmp_path, 'wb') as wavfile:
+            wavfile.setnchannels(1)
+            wavfile.setsampwidth(2)
+            wavfile.setframerate(LOCAL_SAMPLE_RATE)
+            wavfile.writeframes(audio_data)
+
+
+async def tts_local_stream(text, voice, platform, wav_path, relative_path):
+    """本地离线合成：按配置模拟首包延迟和生成速度，输出与平台流式接口一致的chunk"""
+    config = getattr(platform, "config", None) or {}
+    latency = _float_config(config, "latency_ms", DEFAULT_LATENCY_MS) / 1000
+    throughput = _float_config(config, "throughput", DEFAULT_THROUGHPUT)
+    char_seconds = _float_config(config, "char_seconds", DEFAULT_CHAR_SECONDS) or DEFAULT_CHAR_SECONDS
+    chunk_seconds = _float_config(config, "chunk_seconds", DEFAULT_CHUNK_SECONDS) or DEFAULT_CHUNK_SECONDS
+
+    pcm = render_pcm(text, getattr(voice, "role_id", "") or "", char_seconds)
+    if latency:
+        await asyncio.sleep(latency)
+
+    chunk_bytes = max(2, int(LOCAL_SAMPLE_RATE * chunk_seconds) * 2)
+    for start in range(0, len(pcm), chunk_bytes):
+        chunk = pcm[start:start + chunk_bytes]
+        yield {"data": base64.b64encode(chunk).decode(), "type": "pcm", "end": False}
+        if throughput:
+            await asyncio.sleep(len(chunk) / 2 / LOCAL_SAMPLE_RATE / throughput)
+
+    await asyncio.to_thread(_save_wav, wav_path, pcm)
+    yield {"data": relative_path, "type": "wav_path", "end": True}
+
+
+class LocalProvider(TTSProvider):
+    """本地确定性合成，不访问网络，用于开发调试和全流程基准测试
+
+    平台配置：latency_ms 首包延迟，throughput 生成速度（音频秒/秒，0不限速），
+    char_seconds 每字时长，chunk_seconds 每个chunk时长，max_concurrency 并发数。
+    """
+
+    type = "local"
+    capabilities = ProviderCapabilities(
+        streaming=True,
+        max_text_length=None,
+        sample_rates=(LOCAL_SAMPLE_RATE,),
+        max_concurrency=64
+    )
+    audio_params = LOCAL_AUDIO_PARAMS
+
+    def cache_params(self, platform):
+        config = getattr(platform, "config", None) or {}
+        char_seconds = _float_config(config, "char_seconds", DEFAULT_CHAR_SECONDS) or DEFAULT_CHAR_SECONDS
+        return {**self.audio_params, "char_seconds": char_seconds}
+
+    def synthesize_stream(self, text, voice, platform, wav_path, relative_path):
+        return tts_local_stream(text, voice, platform, wav_path, relative_path)
+
+
+register_provider(LocalProvider())
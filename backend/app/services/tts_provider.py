@@ -0,0 +1,282 @@
+import asyncio
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncIterator, Dict, FrozenSet, List, Optional, Tuple, Type
+from app.services.provider_governor import PlatformGovernor, provider_governor
+from app.services.provider_policy import (
+    LatencyTracker, ProviderEmptyResponse, ProviderTimeout, RequestPolicy, clamp_timeout, latency_registry,
+    remaining
+)
+from app.services.synthesis_cache import SynthesisCache
+
+_DONE = object()  # 请求结束标记
+
+
+@dataclass(frozen=True)
+class ProviderCapabilities:
+    """TTS平台能力声明"""
+    streaming: bool = True                      # 是否边合成边返回PCM
+    max_text_length: Optional[int] = None       # 单次请求最大文本长度（字符），None表示不限制
+    sample_rates: Tuple[int, ...] = (24000,)    # 支持的采样率
+    max_concurrency: int = 1                    # 单个工作流允许的最大并发请求数
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        return {
+            'streaming': data['streaming'],
+            'maxTextLength': data['max_text_length'],
+            'sampleRates': list(data['sample_rates']),
+            'maxConcurrency': data['max_concurrency'],
+        }
+
+
+class TTSProvider:
+    """TTS平台接入基类
+
+    子类声明 type / capabilities / audio_params 并实现 synthesize_stream，
+    chunk 格式与 tts_volcano_stream 一致：若干 pcm chunk，最后一个 wav_path 或 error chunk（带平台错误码 code）。
+    调用方统一使用 stream，请求经过平台调度器（QPS与自适应并发限制）。
+    """
+
+    type: str = ""
+    capabilities = ProviderCapabilities()
+    audio_params: Dict[str, Any] = {}  # 参与缓存键计算的音频参数
+    throttle_codes: FrozenSet[int] = frozenset({429})  # 表示被限流的错误码
+    retryable_codes: FrozenSet[int] = frozenset({500, 502, 503, 504})  # 可重试的服务端错误码
+    retryable_errors: Tuple[Type[Exception], ...] = (ConnectionError,)  # 可重试的异常（超时总是可重试）
+    split_threshold: Optional[int] = None  # 工作流合成时超过该长度的文本按句切分并发合成，None表示不切分
+
+    def cache_params(self, platform) -> Dict[str, Any]:
+        """参与缓存键计算的参数，平台配置影响音频内容时由子类补充"""
+        return self.audio_params
+
+    def cache_key(self, platform, voice, text: str) -> str:
+        """合成缓存键（同时作为节点指纹）"""
+        return SynthesisCache.make_key(
+            getattr(platform, 'type', None), getattr(voice, 'role_id', None), text, self.cache_params(platform)
+        )
+
+    def max_concurrency(self, platform) -> int:
+        """平台配置的并发数（platform.config.max_concurrency，默认1），不超过能力上限"""
+        config = getattr(platform, "config", None) or {}
+        try:
+            requested = max(1, int(config.get("max_concurrency", 1)))
+        except (TypeError, ValueError):
+            requested = 1
+        return min(requested, self.capabilities.max_concurrency)
+
+    def get_split_threshold(self, platform) -> Optional[int]:
+        """长文本切分阈值：平台配置 split_threshold（0表示不切分）优先，且不超过单次请求最大文本长度"""
+        config = getattr(platform, "config", None) or {}
+        threshold = self.split_threshold
+        if "split_threshold" in config:
+            try:
+                threshold = max(0, int(config["split_threshold"])) or None
+            except (TypeError, ValueError):
+                pass
+        max_length = self.capabilities.max_text_length
+        if max_length and (threshold is None or threshold > max_length):
+            return max_length
+        return threshold
+
+    def synthesize_stream(self, text: str, voice, platform, wav_path: str, relative_path: str) -> AsyncIterator[Dict]:
+        raise NotImplementedError
+
+    async def stream(self, text: str, voice, platform, wav_path: str, relative_path: str,
+                     deadline: Optional[float] = None, replayable: bool = False) -> AsyncIterator[Dict]:
+        """经过平台调度器的合成入口
+
+        按平台配置的首包/chunk间隔超时读取，超时、网络错误、服务端错误按抖动退避重试，被限流时按指数退避重试；
+        deadline（time.monotonic）为整体截止时间。已返回音频后出错只有 replayable=True（调用方只使用最终wav）时才重试。
+        超时等异常以 error chunk 返回。
+        """
+        policy = RequestPolicy.from_platform(platform)
+        governor = provider_governor.get(platform, self.capabilities.max_concurrency)
+        tracker = latency_registry.get(platform)
+        retries = throttle_retries = 0
+
+        while True:
+            started = False
+            error_chunk = None
+            try:
+                async for chunk in self._request(policy, governor, tracker, deadline,
+                                                 text, voice, platform, wav_path, relative_path):
+                    if chunk.get("type") == "error":
+                        error_chunk = chunk
+                        break
+                    started = started or chunk.get("type") == "pcm"
+                    yield chunk
+                if error_chunk is None:
+                    return
+                throttled = error_chunk.get("code") in self.throttle_codes
+                retryable = throttled or error_chunk.get("code") in self.retryable_codes
+            except (ProviderTimeout, ProviderEmptyResponse) + self.retryable_errors as e:
+                error_chunk = {"data": str(e) or type(e).__name__, "type": "error", "end": True, "code": None}
+                throttled, retryable = False, True
+
+            if throttled:
+                attempt, allowed = throttle_retries, throttle_retries < policy.throttle_retries
+            else:
+                attempt, allowed = retries, retryable and retries < policy.retries
+            delay = policy.retry_delay(attempt, throttled)
+            left = remaining(deadline)
+            if not allowed or (started and not replayable) or (left is not None and left <= delay):
+                yield error_chunk
+                return
+            if throttled:
+                throttle_retries += 1
+            else:
+                retries += 1
+            await asyncio.sleep(delay)
+
+    async def _request(self, policy: RequestPolicy, governor: PlatformGovernor, tracker: LatencyTracker,
+                       deadline: Optional[float], text, voice, platform, wav_path, relative_path) -> AsyncIterator[Dict]:
+        """一次逻辑请求：首包超过平台历史首包耗时分位数时（需开启hedge）再发一个对冲请求，先返回首包的胜出"""
+        primary = _Attempt(self, governor, tracker, (text, voice, platform, wav_path, relative_path))
+        attempts = [primary]
+        winner = primary
+        hedge_path = f"{wav_path}.hedge"
+        try:
+            # 排队等待调度名额的时间不计入首包超时
+            await primary.wait_started(remaining(deadline))
+            first_timeout = clamp_timeout(policy.first_chunk_timeout, deadline)
+            hedge_delay = tracker.quantile(policy.hedge_quantile) if policy.hedge else None
+            if hedge_delay is not None and (first_timeout is None or hedge_delay < first_timeout):
+                try:
+                    item = await primary.next(hedge_delay)
+                except ProviderTimeout:
+                    hedge = _Attempt(self, governor, tracker, (text, voice, platform, hedge_path, relative_path))
+                    attempts.append(hedge)
+                    tracker.hedged += 1
+                    winner, item = await _race(attempts, first_timeout - hedge_delay if first_timeout else None)
+                    if winner is hedge:
+                        tracker.hedge_wins += 1
+            else:
+                item = await primary.next(first_timeout)
+            if item is _DONE:
+                raise ProviderEmptyResponse("平台未返回数据")
+
+            for attempt in attempts:
+                if attempt is not winner:
+                    attempt.cancel()
+            while item is not _DONE:
+                if winner is not primary and item.get("type") == "wav_path":
+                    await asyncio.to_thread(os.replace, hedge_path, wav_path)
+                yield item
+                item = await winner.next(clamp_timeout(policy.chunk_timeout, deadline))
+        except ProviderTimeout:
+            for attempt in attempts:
+                attempt.cancel(failed=True)
+            raise
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+            if len(attempts) > 1 and os.path.exists(hedge_path):
+                os.remove(hedge_path)
+
+
+class _Attempt:
+    """在独立任务中执行一次平台请求，chunk通过队列交给调用方，便于超时取消与对冲"""
+
+    def __init__(self, provider: TTSProvider, governor: PlatformGovernor, tracker: LatencyTracker, args: Tuple):
+        self.failed = False
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._started = asyncio.Event()
+        self._task = asyncio.create_task(self._run(provider, governor, tracker, args))
+
+    async def _run(self, provider: TTSProvider, governor: PlatformGovernor, tracker: LatencyTracker, args: Tuple):
+        await governor.acquire()
+        self._started.set()
+        throttled = False
+        start = time.monotonic()
+        first = True
+        try:
+            async for chunk in provider.synthesize_stream(*args):
+                if chunk.get("type") == "error":
+                    throttled = chunk.get("code") in provider.throttle_codes
+                    self.failed = self.failed or not throttled
+                elif first:
+                    tracker.record(time.monotonic() - start)
+                first = False
+                self._queue.put_nowait(chunk)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed = True
+            self._queue.put_nowait(e)
+        finally:
+            governor.release(throttled=throttled, failed=self.failed)
+            self._queue.put_nowait(_DONE)
+
+    async def wait_started(self, timeout: Optional[float]):
+        try:
+            await asyncio.wait_for(self._started.wait(), timeout)
+        except asyncio.TimeoutError:
+            raise ProviderTimeout("等待平台调度超时")
+
+    async def next(self, timeout: Optional[float]):
+        """读取下一个chunk，结束时返回 _DONE"""
+        try:
+            item = await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            raise ProviderTimeout("等待平台返回数据超时")
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    def cancel(self, failed: bool = False):
+        if not self._task.done():
+            self.failed = self.failed or failed
+            self._task.cancel()
+
+
+async def _race(attempts: List[_Attempt], timeout: Optional[float]) -> Tuple[_Attempt, Any]:
+    """等待多个请求中最先返回数据的一个；没有返回数据就结束或出错的请求不算胜出，继续等待其他请求"""
+    waiters = {asyncio.ensure_future(attempt.next(None)): attempt for attempt in attempts}
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    error: Exception = ProviderEmptyResponse("平台未返回数据")
+    try:
+        while waiters:
+            done, _ = await asyncio.wait(waiters, timeout=remaining(deadline), return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                raise ProviderTimeout("等待平台返回数据超时")
+            for waiter in done:
+                attempt = waiters.pop(waiter)
+                try:
+                    item = waiter.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if item is not _DONE:
+                    return attempt, item
+        raise error
+    finally:
+        for waiter in waiters:
+            waiter.cancel()
+
+
+_providers: Dict[str, TTSProvider] = {}
+
+
+def register_provider(provider: TTSProvider) -> TTSProvider:
+    """注册TTS平台实现，按 TTSPlatform.type 查找，同类型后注册的覆盖先注册的"""
+    _providers[provider.type] = provider
+    return provider
+
+
+def get_provider(platform_type: Optional[str]) -> Optional[TTSProvider]:
+    """根据平台类型获取实现，未注册返回None"""
+    return _providers.get(platform_type)
+
+
+def list_providers() -> List[Dict[str, Any]]:
+    """已注册的平台类型及其能力"""
+    return [
+        {'type': provider.type, 'capabilities': provider.capabilities.to_dict()}
+        for provider in _providers.values()
+    ]
+
+
+# 注册内置平台
+from app.services import tts_volcano, tts_local  # noqa: E402,F401
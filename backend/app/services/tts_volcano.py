@@ -1,10 +1,143 @@
-import requests
+import asyncio
+import binascii
 import json
 import base64
+import re
 import wave
-import os
+import httpx
+from typing import AsyncIterator, List, Optional, Tuple
+from app.services.provider_pool import provider_pool
+from app.services.artifact_store import atomic_output
+from app.services.tts_provider import ProviderCapabilities, TTSProvider, register_provider
 
-def tts_volcano_stream(text, voice, platform, wav_path, relative_path):
+VOLCANO_TTS_URL = "https://openspeech.bytedance.com/api/v3/tts/unidirectional"
+VOLCANO_AUDIO_PARAMS = {
+    "format": "pcm",
+    "sample_rate": 24000
+}
+VOLCANO_THROTTLE_CODE = 45000292  # 并发/配额超限
+VOLCANO_SERVER_ERROR_CODE = 55000000  # 服务端错误
+
+
+# 数据行快速解析：{"code":0,...,"data":"<base64>"}，用 find 定位 data 字符串，直接在接收缓冲上解码；
+# 其他情况（含转义、data为null、结束/错误行）回退到json.loads
+_CODE_RE = re.compile(rb'"code"\s*:\s*(-?\d+)')
+_DATA_KEY = b'"data"'
+
+# 预估每个字符对应的PCM字节数（24kHz 16bit，约0.25秒/字），用于预分配音频缓冲
+_PCM_BYTES_PER_CHAR = 12000
+_MAX_PREALLOC_BYTES = 16 * 1024 * 1024
+
+
+class PCMBuffer:
+    """预分配、按倍数扩容的PCM缓冲区，解码结果直接写入，避免中间拷贝"""
+
+    def __init__(self, size_hint: int = 0):
+        self._buffer = bytearray(min(max(size_hint, 4096), _MAX_PREALLOC_BYTES))
+        self.length = 0
+
+    def write(self, data):
+        end = self.length + len(data)
+        if end > len(self._buffer):
+            self._buffer.extend(bytes(max(end, len(self._buffer) * 2) - len(self._buffer)))
+        self._buffer[self.length:end] = data
+        self.length = end
+
+    def getbuffer(self) -> memoryview:
+        return memoryview(self._buffer)[:self.length]
+
+
+class VolcanoStreamDecoder:
+    """火山引擎行分隔JSON流的增量解码器
+
+    feed 接收任意切分的原始字节，按行解析出 (code, base64数据, 完整响应)，
+    数据行走快速路径，音频直接解码进 PCMBuffer。
+    """
+
+    def __init__(self, size_hint: int = 0):
+        self.audio = PCMBuffer(size_hint)
+        self._pending = bytearray()
+
+    def _fast_data(self, buf: bytearray, start: int, end: int) -> Optional[str]:
+        """数据行快速路径，返回base64字符串；无法安全处理时返回None"""
+        code_match = _CODE_RE.search(buf, start, end)
+        if not code_match or code_match.group(1) != b"0":
+            return None
+        key = buf.find(_DATA_KEY, start, end)
+        if key < 0:
+            return None
+        open_quote = buf.find(b'"', key + len(_DATA_KEY), end)
+        if open_quote < 0 or buf[key + len(_DATA_KEY):open_quote].strip() != b":":
+            return None
+        close_quote = buf.find(b'"', open_quote + 1, end)
+        if close_quote < 0 or buf.find(b"\\", open_quote + 1, close_quote) >= 0:
+            return None
+        b64 = memoryview(buf)[open_quote + 1:close_quote]
+        try:
+            self.audio.write(binascii.a2b_base64(b64))
+            return str(b64, "ascii")
+        finally:
+            b64.release()
+
+    def _parse_line(self, buf: bytearray, start: int, end: int) -> Optional[Tuple[int, Optional[str], Optional[dict]]]:
+        b64 = self._fast_data(buf, start, end)
+        if b64 is not None:
+            return 0, b64 or None, None
+
+        line = bytes(buf[start:end]).strip()
+        if not line:
+            return None
+        data = json.loads(line)
+        code = data.get("code", 0)
+        if code == 0 and data.get("data"):
+            self.audio.write(base64.b64decode(data["data"]))
+            return 0, data["data"], data
+        return code, None, data
+
+    def feed(self, raw: bytes) -> List[Tuple[int, Optional[str], Optional[dict]]]:
+        """输入一段原始字节，返回其中完整行的解析结果"""
+        pending = self._pending
+        pending += raw
+        frames = []
+        start = 0
+        while True:
+            newline = pending.find(b"\n", start)
+            if newline < 0:
+                break
+            frame = self._parse_line(pending, start, newline)
+            start = newline + 1
+            if frame:
+                frames.append(frame)
+        if start:
+            del pending[:start]
+        return frames
+
+    def flush(self) -> List[Tuple[int, Optional[str], Optional[dict]]]:
+        """流结束时解析最后一行（没有换行符结尾）"""
+        frame = self._parse_line(self._pending, 0, len(self._pending))
+        self._pending.clear()
+        return [frame] if frame else []
+
+    async def iter_frames(self, byte_stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Optional[str], Optional[dict]]]:
+        """逐行解析异步字节流"""
+        async for raw in byte_stream:
+            for frame in self.feed(raw):
+                yield frame
+        for frame in self.flush():
+            yield frame
+
+
+def _save_wav(wav_path, audio_data):
+    """保存PCM数据为wav文件（原子写入，读取方不会看到写了一半的文件）"""
+    with atomic_output(wav_path) as tmp_path:
+        with wave.open(tmp_path, 'wb') as wavfile:
+            wavfile.setnchannels(1)
+            wavfile.setsampwidth(2)
+            wavfile.setframerate(24000)
+            wavfile.writeframes(audio_data)
+
+
+async def tts_volcano_stream(text, voice, platform, wav_path, relative_path):
     headers = {
         "X-Api-App-Id": platform.config.get("appid"),
         "X-Api-Access-Key": platform.config.get("access_token"),
@@ -19,39 +152,52 @@ def tts_volcano_stream(text, voice, platform, wav_path, relative_path):
             "text": text,
             "speaker": voice.role_id,
             "additions": "{}",
-            "audio_params": {
-                "format": "pcm",
-                "sample_rate": 24000
-            }
+            "audio_params": VOLCANO_AUDIO_PARAMS
         }
     }
-    session = requests.Session()
-    audio_data = bytearray()
-    try:
-        response = session.post("https://openspeech.bytedance.com/api/v3/tts/unidirectional",
-                                headers=headers, json=payload, stream=True)
-        for chunk in response.iter_lines(decode_unicode=True):
-            if not chunk:
-                continue
-            data = json.loads(chunk)
-            if data.get("code", 0) == 0 and "data" in data and data["data"]:
-                chunk_audio = base64.b64decode(data["data"])
-                audio_data.extend(chunk_audio)
+    # 与requests一致：忽略未配置（None）的请求头
+    headers = {k: v for k, v in headers.items() if v is not None}
+    decoder = VolcanoStreamDecoder(len(text) * _PCM_BYTES_PER_CHAR)
+    # 平台配置 endpoint 可指向兼容协议的其他地址（如本地压测替身服务）
+    url = platform.config.get("endpoint") or VOLCANO_TTS_URL
+    # 使用按平台共享的keep-alive连接池，请求期间持有客户端
+    async with provider_pool.client(platform) as client, \
+            client.stream("POST", url, headers=headers, json=payload) as response:
+        if response.status_code == 429 or response.status_code >= 500:
+            yield {"data": f"HTTP {response.status_code}", "type": "error", "end": True, "code": response.status_code}
+            return
+        async for code, b64, data in decoder.iter_frames(response.aiter_bytes()):
+            if code == 0 and b64:
                 # 流式返回
-                yield {"data": data["data"], "type": "pcm", "end": False}
-            if data.get("code", 0) == 20000000:
+                yield {"data": b64, "type": "pcm", "end": False}
+            if code == 20000000:
                 break
-            if data.get("code", 0) > 0:
-                yield {"data": str(data), "type": "error", "end": True}
+            if code > 0:
+                yield {"data": str(data), "type": "error", "end": True, "code": code}
                 return
-        # 保存为wav
-        os.makedirs(os.path.dirname(wav_path), exist_ok=True)
-        with wave.open(wav_path, 'wb') as wavfile:
-            wavfile.setnchannels(1)
-            wavfile.setsampwidth(2)
-            wavfile.setframerate(24000)
-            wavfile.writeframes(audio_data)
-        yield {"data": relative_path, "type": "wav_path", "end": True}
-    finally:
-        response.close()
-        session.close() 
\ No newline at end of file
+    # 保存为wav
+    await asyncio.to_thread(_save_wav, wav_path, decoder.audio.getbuffer())
+    yield {"data": relative_path, "type": "wav_path", "end": True}
+
+
+class VolcanoProvider(TTSProvider):
+    """火山引擎（豆包语音）单向流式合成"""
+
+    type = "volcano"
+    capabilities = ProviderCapabilities(
+        streaming=True,
+        max_text_length=1024,
+        sample_rates=(8000, 16000, 22050, 24000, 32000, 44100, 48000),
+        max_concurrency=16
+    )
+    audio_params = VOLCANO_AUDIO_PARAMS
+    throttle_codes = frozenset({429, VOLCANO_THROTTLE_CODE})
+    retryable_codes = frozenset({500, 502, 503, 504, VOLCANO_SERVER_ERROR_CODE})
+    retryable_errors = (httpx.TransportError,)
+    split_threshold = 200
+
+    def synthesize_stream(self, text, voice, platform, wav_path, relative_path):
+        return tts_volcano_stream(text, voice, platform, wav_path, relative_path)
+
+
+register_provider(VolcanoProvider())
@@ -0,0 +1,163 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from app.services.tts_provider import get_provider
+
+# 最多缓存的执行计划数量
+PLAN_CACHE_SIZE = 256
+
+
+class Node:
+    """节点数据结构"""
+    def __init__(self, node_data: Dict):
+        self.id = node_data.get('id')
+        self.type = node_data.get('type')
+        self.properties = node_data.get('properties', {})
+        self.next: Optional[Node] = None
+
+
+@dataclass(frozen=True)
+class PlanNode:
+    """执行计划中的节点（按流程顺序，只读）"""
+    id: str
+    type: Optional[str]           # 节点类型，如 event-node / common-node
+    kind: Optional[str]           # 业务类型，如 ttsTextChunk / spaceVoid
+    name: str = ''
+    text: str = ''
+    audio_url: Optional[str] = None
+    duration: float = 3           # 留白时长（秒）
+    fingerprint: Optional[str] = None
+
+    @property
+    def is_event(self) -> bool:
+        return self.type == 'event-node'
+
+
+@dataclass(frozen=True)
+class WorkflowPlan:
+    """编译后的工作流执行计划"""
+    flow_id: str
+    nodes: Tuple[PlanNode, ...]   # 从开始节点出发按链表顺序排列
+    total_nodes: int              # 进度总数：非事件节点数 + 1（拼接打包）
+    has_start: bool
+
+    @property
+    def tts_nodes(self) -> Tuple[PlanNode, ...]:
+        return tuple(node for node in self.nodes if node.kind == 'ttsTextChunk')
+
+    def summary(self, stored_fingerprints: Optional[Dict[str, Dict]] = None,
+                is_cached: Optional[Callable[[str], bool]] = None) -> Dict[str, Any]:
+        """计划预览：节点列表及是否需要重新合成，is_cached 判断合成缓存中是否有该指纹的音频"""
+        stored_fingerprints = stored_fingerprints or {}
+        segments = []
+        for node in self.nodes:
+            if node.is_event:
+                continue
+            segment = {'nodeId': node.id, 'nodeName': node.name, 'nodeType': node.kind}
+            if node.kind == 'ttsTextChunk':
+                # 没有指纹记录的节点只有合成缓存中有当前指纹的音频时才复用已有 audioUrl
+                stored = stored_fingerprints.get(node.id)
+                if stored:
+                    dirty = stored.get('fingerprint') != node.fingerprint
+                else:
+                    dirty = not (node.audio_url and is_cached and is_cached(node.fingerprint))
+                segment.update({'text': node.text, 'fingerprint': node.fingerprint, 'dirty': dirty})
+            elif node.kind == 'spaceVoid':
+                segment['duration'] = node.duration
+            segments.append(segment)
+        return {
+            'flowId': self.flow_id,
+            'totalNodes': self.total_nodes,
+            'ttsNodes': len(self.tts_nodes),
+            'dirtyNodes': sum(1 for segment in segments if segment.get('dirty')),
+            'segments': segments
+        }
+
+
+def _parse_nodes(flow_config: Dict) -> List[Node]:
+    """解析工作流配置，构建节点链表"""
+    logic_list = flow_config.get('logicList', [])
+    if not logic_list:
+        raise Exception("工作流配置为空")
+
+    logic = logic_list[0]  # 取第一个逻辑
+    nodes: List[Node] = []
+    node_map: Dict[str, Node] = {}
+    for node_data in logic.get('nodes', []):
+        node = Node(node_data)
+        nodes.append(node)
+        node_map[node.id] = node
+
+    # 构建节点链表关系
+    for edge in logic.get('edges', []):
+        source_id = edge.get('sourceNodeId')
+        target_id = edge.get('targetNodeId')
+        if source_id in node_map and target_id in node_map:
+            node_map[source_id].next = node_map[target_id]
+    return nodes
+
+
+def _compile_node(node: Node, voice, platform) -> PlanNode:
+    properties = node.properties or {}
+    node_content = properties.get('nodeContentData', {}) or {}
+    kind = properties.get('type')
+    text = node_content.get('text', '') or ''
+    provider = get_provider(getattr(platform, 'type', None))
+    return PlanNode(
+        id=node.id,
+        type=node.type,
+        kind=kind,
+        name=properties.get('name', ''),
+        text=text,
+        audio_url=node_content.get('audioUrl'),
+        duration=node_content.get('duration', 3),
+        fingerprint=(
+            provider.cache_key(platform, voice, text)
+            if kind == 'ttsTextChunk' and provider else None
+        )
+    )
+
+
+def compile_workflow_plan(flow, voice, platform) -> WorkflowPlan:
+    """将工作流配置编译为执行计划"""
+    nodes = _parse_nodes(flow.flow_config or {})
+
+    ordered: List[PlanNode] = []
+    start = next((node for node in nodes if node.type == 'event-node'), None)
+    visited = set()
+    current = start
+    while current and current.id not in visited:
+        visited.add(current.id)
+        ordered.append(_compile_node(current, voice, platform))
+        current = current.next
+
+    return WorkflowPlan(
+        flow_id=str(flow.id),
+        nodes=tuple(ordered),
+        total_nodes=len([node for node in nodes if node.type != 'event-node']) + 1,
+        has_start=start is not None
+    )
+
+
+_plan_cache: "OrderedDict[tuple, WorkflowPlan]" = OrderedDict()
+
+
+def get_workflow_plan(flow, voice, platform) -> WorkflowPlan:
+    """获取执行计划，按 (工作流ID, 更新时间, 平台类型及更新时间, 音色) 缓存"""
+    key = (
+        str(flow.id),
+        getattr(flow, 'updated_at', None),
+        getattr(platform, 'type', None),
+        getattr(platform, 'updated_at', None),
+        getattr(voice, 'role_id', None)
+    )
+    plan = _plan_cache.get(key)
+    if plan is not None:
+        _plan_cache.move_to_end(key)
+        return plan
+
+    plan = compile_workflow_plan(flow, voice, platform)
+    _plan_cache[key] = plan
+    while len(_plan_cache) > PLAN_CACHE_SIZE:
+        _plan_cache.popitem(last=False)
+    return plan
@@ -1,24 +1,41 @@
+import asyncio
+import contextlib
+import functools
 import json
 import os
-import wave
-import numpy as np
-import zipfile
-from typing import Dict, List, Optional, Generator
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, AsyncGenerator, AsyncIterator, Tuple
 from fastapi.responses import StreamingResponse
 from app.models.tts_flow import TTSFlow
 from app.models.tts_voice import TTSVoice
 from app.models.tts_platform import TTSPlatform
-from app.services.tts_volcano import tts_volcano_stream
+from app.services.artifact_store import artifact_digest, file_digest, get_artifact_store, parse_artifact_url
+from app.services.tts_provider import get_provider
+from app.services.single_flight import PCM_PLACEHOLDER
+from app.services import synthesis_cache as cache_module
+from app.services.synthesis_cache import cached_tts_stream
+from app.services.tts_flow_service import TTSFlowService
+from app.services.workflow_plan import PlanNode, WorkflowPlan, get_workflow_plan
+from app.core.config import settings
 from app.core.constants import AppConstants
+from app.utils.audio_encoder import DEFAULT_OUTPUT_PROFILE, encode_audio_async, ffmpeg_path, profile_extension
+from app.utils.audio_utils import AudioSegment, SilenceSegment, concatenate_wav_files, write_silence_wav
+from app.utils.text_splitter import split_text
+from app.utils.zip_packager import ZipPackager, get_zip_compression
 
+# 长文本切分后单个节点同时合成的段数，可在平台配置 split_concurrency 中覆盖
+DEFAULT_SPLIT_CONCURRENCY = 4
+# 预合成队列最多缓存的chunk数，写满后合成方等待读取
+PREFETCH_QUEUE_SIZE = 64
+# 并发模式下最多领先当前节点提交的节点数（不小于并发数）
+PREFETCH_AHEAD_NODES = 8
 
-class Node:
-    """节点数据结构"""
-    def __init__(self, node_data: Dict):
-        self.id = node_data.get('id')
-        self.type = node_data.get('type')
-        self.properties = node_data.get('properties', {})
-        self.next: Optional[Node] = None
+
+def package_name(node_id: str, node_name: str) -> str:
+    """节点音频在压缩包中的文件名：节点ID_节点名.wav（节点名中的路径分隔符替换为下划线）"""
+    name = (node_name or "").replace("/", "_").replace("\\", "_")
+    return f"{node_id}_{name}.wav"
 
 
 class EventType:
@@ -31,58 +48,94 @@ class EventType:
     END = "end"                        # 结束
 
 
+class ChunkEvent(str):
+    """节点生成中的重复进度事件（每个节点首个之后的chunk事件），任务事件日志只保留最近的若干个用于断线重连"""
+
+
+class ProgressMode:
+    """节点生成中（每个平台chunk）事件的推送方式"""
+    ALL = "all"                        # 每个chunk推送一次
+    COALESCED = "coalesced"            # 合并：每个节点的首个chunk立即推送，之后按任务最大事件速率推送，带累计chunk数
+    TRANSITIONS = "transitions"        # 只推送状态变化：每个节点只推送首个chunk
+    
+    @classmethod
+    def normalize(cls, mode: Optional[str]) -> str:
+        mode = (mode or settings.progress_event_mode).lower()
+        if mode not in (cls.ALL, cls.COALESCED, cls.TRANSITIONS):
+            raise ValueError(f"不支持的进度事件模式: {mode}，可选 all、coalesced、transitions")
+        return mode
+
+
 class WorkflowSynthesizer:
     """工作流音频合成器"""
     
-    def __init__(self, flow: TTSFlow, voice: TTSVoice, platform: TTSPlatform):
+    def __init__(self, flow: TTSFlow, voice: TTSVoice, platform: TTSPlatform, include_silence_files: bool = False,
+                 output_profile: str = DEFAULT_OUTPUT_PROFILE, progress_mode: Optional[str] = None):
         self.flow = flow
-        self.flow_config = flow.flow_config or {}
-        self.nodes: List[Node] = []
-        self.node_map: Dict[str, Node] = {}
+        self.plan: Optional[WorkflowPlan] = None  # 编译后的执行计划（按工作流版本缓存）
         self.voice = voice
         self.platform = platform
-        self.audio_files: List[str] = []  # 收集所有音频文件路径
+        self.audio_files: List[AudioSegment] = []  # 拼接计划：音频文件路径或虚拟留白片段
+        self.include_silence_files = include_silence_files  # 是否为留白节点生成wav文件（放入ZIP）
         self.wav_dir = os.path.join(AppConstants.STATIC_DIR, "tts_wav", str(self.flow.id))
+        # 输出格式（wav/flac/opus/mp3）：非wav时节点音频和拼接结果编码后再打包，压缩包按格式区分
+        self.output_profile = output_profile
+        zip_name = f"{self.flow.id}.zip" if output_profile == DEFAULT_OUTPUT_PROFILE else f"{self.flow.id}_{output_profile}.zip"
+        self.zip_path = os.path.join(AppConstants.STATIC_DIR, "tts_wav", zip_name)
+        self.zip_download_path = f"/static/tts_wav/{zip_name}"
+        self.progress_mode = ProgressMode.normalize(progress_mode)
+        self.progress_max_rate = settings.progress_event_max_rate  # 合并模式下每秒最多推送的生成中事件数，0表示不限制
+        self._last_chunk_event_at = 0.0
+        self._encode_tasks: List[asyncio.Task] = []  # 按节点顺序提交的编码任务，结果依次写入压缩包
+        self.zip_compression = get_zip_compression(settings.zip_compression)
+        self.packager: Optional[ZipPackager] = None  # 合成过程中增量写入的压缩包
+        # 节点指纹：上次合成记录（来自工作流）与本次合成结果，node_id -> {'fingerprint', 'audioUrl'}
+        self.stored_fingerprints: Dict[str, Dict] = dict(getattr(flow, 'node_fingerprints', None) or {})
+        self.node_fingerprints: Dict[str, Dict] = {}
         self.processed_count = 0  # 已处理节点计数
         self.total_nodes = 0      # 总节点数
+        self.provider = get_provider(getattr(platform, "type", None))  # 平台实现（按platform.type注册）
+        self.max_concurrency = self.provider.max_concurrency(platform) if self.provider else 1  # 同时合成的TTS节点数
+        self.split_threshold = self.provider.get_split_threshold(platform) if self.provider else None  # 长文本切分阈值
+        self.split_concurrency = self._get_split_concurrency()  # 单个节点切分后同时合成的段数
+        self._prefetched: Dict[str, AsyncIterator[Dict]] = {}  # 并发模式下预先提交的节点合成结果
+        self._prefetch_pending: Deque[Tuple[PlanNode, Dict]] = deque()  # 尚未提交的待合成节点
+        self._prefetch_tasks: List[asyncio.Task] = []
+        self._prefetch_semaphore = None
+        self.prefetch_ahead = max(PREFETCH_AHEAD_NODES, self.max_concurrency)
+        self.node_slots = None  # 批量合成时由共享工作池分配的名额（async with），每次平台请求（含切分后的每段）占用一个
+        self.deadline: Optional[float] = None  # 任务截止时间（time.monotonic），由 settings.synthesis_job_timeout 决定
         
+    def _get_split_concurrency(self) -> int:
+        """平台配置 split_concurrency（默认4），不超过平台能力上限"""
+        config = getattr(self.platform, "config", None) or {}
+        try:
+            concurrency = max(1, int(config.get("split_concurrency", DEFAULT_SPLIT_CONCURRENCY)))
+        except (TypeError, ValueError):
+            concurrency = DEFAULT_SPLIT_CONCURRENCY
+        if self.provider:
+            concurrency = min(concurrency, self.provider.capabilities.max_concurrency)
+        return concurrency
     
-    def _parse_workflow(self):
-        """解析工作流配置，构建节点链表"""
-        logic_list = self.flow_config.get('logicList', [])
-        if not logic_list:
-            raise Exception("工作流配置为空")
-            
-        logic = logic_list[0]  # 取第一个逻辑
-        nodes_data = logic.get('nodes', [])
-        edges_data = logic.get('edges', [])
-        
-        # 构建节点映射
-        for node_data in nodes_data:
-            node = Node(node_data)
-            self.nodes.append(node)
-            self.node_map[node.id] = node
-        
-        # 构建节点链表关系
-        for edge in edges_data:
-            source_id = edge.get('sourceNodeId')
-            target_id = edge.get('targetNodeId')
-            
-            if source_id in self.node_map and target_id in self.node_map:
-                source_node = self.node_map[source_id]
-                target_node = self.node_map[target_id]
-                source_node.next = target_node
-    
-    def _find_start_node(self) -> Optional[Node]:
-        """找到开始节点"""
-        for node in self.nodes:
-            if node.type == 'event-node':
-                return node
-        return None
+    def _yield_event(self, data: Dict, code: int = 0, type: str = EventType.NODE, repeated: bool = False):
+        """生成事件流数据，repeated 表示节点生成中的重复进度事件"""
+        event = f"data: {json.dumps({'data': data, 'code': code, 'type': type}, ensure_ascii=False)}\n\n"
+        return ChunkEvent(event) if repeated else event
     
-    def _yield_event(self, data: Dict, code: int = 0, type: str = EventType.NODE):
-        """生成事件流数据"""
-        return f"data: {json.dumps({'data': data, 'code': code, 'type': type}, ensure_ascii=False)}\n\n"
+    def _should_emit_chunk_event(self, chunk_count: int) -> bool:
+        """按进度事件模式决定是否推送第 chunk_count 个chunk的生成中事件"""
+        if self.progress_mode == ProgressMode.ALL:
+            return True
+        if chunk_count == 1:
+            self._last_chunk_event_at = time.monotonic()
+            return True
+        if self.progress_mode == ProgressMode.TRANSITIONS:
+            return False
+        now = time.monotonic()
+        if self.progress_max_rate and now - self._last_chunk_event_at < 1 / self.progress_max_rate:
+            return False
+        self._last_chunk_event_at = now
+        return True
     
     def _get_progress_data(self, current_node_name: str = ""):
         """获取进度数据"""
@@ -93,56 +146,237 @@ class WorkflowSynthesizer:
             'currentNode': current_node_name
         }
     
-    def _concatenate_audio_files(self, audio_files: List[str], output_path: str):
-        """拼接多个音频文件"""
-        if not audio_files:
+    def _concatenate_audio_files(self, audio_files: List[AudioSegment], output_path: str):
+        """拼接多个音频文件（流式写入，不在内存中缓存整段音频）"""
+        concatenate_wav_files(audio_files, output_path)
+    
+    def _create_zip_archive(self, source_dir: str, zip_path: str):
+        """创建ZIP压缩包"""
+        packager = ZipPackager(zip_path, self.zip_compression)
+        for root, dirs, files in os.walk(source_dir):
+            for file in files:
+                file_path = os.path.join(root, file)
+                # 计算相对路径，避免在ZIP中包含完整路径
+                packager.add(file_path, os.path.relpath(file_path, source_dir))
+        packager.close()
+    
+    async def _add_to_package(self, file_path: str, arcname: Optional[str] = None):
+        """节点音频就绪后立即写入压缩包；压缩格式先在编码线程池中编码，不阻塞后续节点合成
+
+        arcname 为压缩包中的文件名（默认与文件同名），压缩格式时扩展名替换为输出格式。
+        """
+        if not self.packager:
             return
-            
-        # 读取第一个文件获取音频参数
-        with wave.open(audio_files[0], 'rb') as first_wav:
-            channels = first_wav.getnchannels()
-            sample_width = first_wav.getsampwidth()
-            sample_rate = first_wav.getframerate()
-        
-        # 拼接所有音频数据
-        all_audio_data = bytearray()
+        arcname = arcname or os.path.basename(file_path)
+        if self.output_profile == DEFAULT_OUTPUT_PROFILE:
+            await asyncio.to_thread(self.packager.add, file_path, arcname)
+        else:
+            self._encode_tasks.append(asyncio.ensure_future(self._encode_file(file_path, arcname)))
+    
+    async def _encode_file(self, file_path: str, arcname: str) -> Tuple[str, str]:
+        """将wav编码为输出格式，编码结果比wav新时直接复用；返回编码文件路径与压缩包中的文件名"""
+        extension = profile_extension(self.output_profile)
+        dest_path = f"{os.path.splitext(file_path)[0]}.{extension}"
+        if not (os.path.exists(dest_path) and os.path.getmtime(dest_path) >= os.path.getmtime(file_path)):
+            await encode_audio_async(file_path, dest_path, self.output_profile)
+        return dest_path, f"{os.path.splitext(arcname)[0]}.{extension}"
+    
+    async def _flush_encoded(self):
+        """按提交顺序等待编码完成并写入压缩包"""
+        tasks, self._encode_tasks = self._encode_tasks, []
+        for task in tasks:
+            await asyncio.to_thread(self.packager.add, *await task)
+    
+    def _resolve_tts_node(self, node: PlanNode) -> Dict:
+        """解析TTS节点的文本、指纹、可复用音频及输出路径"""
+        audio_url = node.audio_url
+        node_name = node.name
+        text = node.text
+        # 节点指纹：平台类型、音色、规范化文本与音频参数的哈希（与合成缓存键一致）
+        fingerprint = node.fingerprint
         
-        for audio_file in audio_files:
-            if os.path.exists(audio_file):
-                with wave.open(audio_file, 'rb') as wav_file:
-                    # 确保音频参数一致
-                    if (wav_file.getnchannels() == channels and 
-                        wav_file.getsampwidth() == sample_width and 
-                        wav_file.getframerate() == sample_rate):
-                        audio_data = wav_file.readframes(wav_file.getnframes())
-                        all_audio_data.extend(audio_data)
-                    else:
-                        print(f"警告: 音频文件 {audio_file} 参数不匹配，跳过")
+        # 只有指纹未变化且文件真实存在才复用已有音频，否则视为脏节点重新合成（会先查合成缓存）
+        # 制品地址的音频在处理节点时从制品存储取回（可能由其他后端实例合成）
+        # 没有指纹记录的节点（引入指纹之前合成的）无法确认文本是否修改过：只有合成缓存中有当前指纹的音频
+        # （即当前文本合成过）时才复用 audioUrl 并补记指纹，否则视为脏节点
+        existing_path = None
+        artifact_key = None
+        stored_url = None
+        stored = self.stored_fingerprints.get(node.id)
+        if stored:
+            reusable = stored.get('fingerprint') == fingerprint
+        else:
+            reusable = bool(audio_url) and cache_module.synthesis_cache.contains(fingerprint)
+        if reusable:
+            stored_url = (stored or {}).get('audioUrl') or audio_url
+            artifact_key = parse_artifact_url(stored_url)
+            if stored_url and not artifact_key:
+                static_path = os.path.join(AppConstants.STATIC_DIR, stored_url.lstrip('/'))
+                if os.path.exists(static_path):
+                    existing_path = static_path
         
-        # 保存拼接后的音频
-        with wave.open(output_path, 'wb') as output_wav:
-            output_wav.setnchannels(channels)
-            output_wav.setsampwidth(sample_width)
-            output_wav.setframerate(sample_rate)
-            output_wav.writeframes(all_audio_data)
+        return {
+            'text': text,
+            'audio_url': audio_url,
+            'node_name': node_name,
+            'fingerprint': fingerprint,
+            'existing_path': existing_path,
+            'artifact_key': artifact_key,
+            'stored_url': stored_url,
+            # 工作文件只用节点ID命名，不使用用户填写的节点名；压缩包中仍带节点名便于识别
+            'wav_path': os.path.join(self.wav_dir, f"{node.id}.wav"),
+            'package_name': package_name(node.id, node_name),
+            'relative_path': f"tts_wav/{self.flow.id}/{node.id}.wav",
+        }
     
-    def _create_zip_archive(self, source_dir: str, zip_path: str):
-        """创建ZIP压缩包"""
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for root, dirs, files in os.walk(source_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    # 计算相对路径，避免在ZIP中包含完整路径
-                    arcname = os.path.relpath(file_path, source_dir)
-                    zipf.write(file_path, arcname)
+    async def _tts_stream(self, info: Dict, publish: bool = True, keep_pcm: bool = True) -> AsyncIterator[Dict]:
+        """调用TTS平台流式合成音频（优先使用合成缓存），publish=False 时不保存到制品存储，
+        keep_pcm=False 时合成请求不为本次调用保留PCM数据（预合成节点的音频只从wav读取）"""
+        if self.provider is None:
+            raise Exception("暂不支持该平台类型的TTS合成")
+        text = info['text']
+        wav_path = info['wav_path']
+        relative_path = info['relative_path']
+        pieces = split_text(text, self.split_threshold) if self.split_threshold else [text]
+        if len(pieces) > 1:
+            stream_factory = functools.partial(self._split_stream, pieces, wav_path, relative_path)
+        else:
+            stream_factory = functools.partial(self._provider_stream, text, wav_path, relative_path)
+        async for chunk in cached_tts_stream(info['fingerprint'], stream_factory, wav_path, relative_path,
+                                             publish=publish, keep_pcm=keep_pcm):
+            yield chunk
+    
+    async def _provider_stream(self, text: str, wav_path: str, relative_path: str) -> AsyncIterator[Dict]:
+        """一次平台合成请求；批量合成时在共享工作池中占用一个名额"""
+        async with self.node_slots or contextlib.nullcontext():
+            async for chunk in self.provider.stream(
+                text=text,
+                voice=self.voice,
+                platform=self.platform,
+                wav_path=wav_path,
+                relative_path=relative_path,
+                deadline=self.deadline,
+                replayable=True  # 只使用最终wav，中途出错可整段重试
+            ):
+                yield chunk
+    
+    async def _split_stream(self, pieces: List[str], wav_path: str, relative_path: str) -> AsyncIterator[Dict]:
+        """长文本按句切分后并发合成，按顺序转发各段chunk，全部完成后拼接为节点wav"""
+        parts_dir = os.path.join(AppConstants.STATIC_DIR, "tts_parts", str(self.flow.id))
+        os.makedirs(parts_dir, exist_ok=True)
+        name = os.path.splitext(os.path.basename(wav_path))[0]
+        part_paths = [os.path.join(parts_dir, f"{name}_{index}.wav") for index in range(len(pieces))]
+        semaphore = asyncio.Semaphore(self.split_concurrency)
+        queues = [asyncio.Queue(PREFETCH_QUEUE_SIZE) for _ in pieces]
+        tasks = [
+            asyncio.create_task(self._prefetch_worker(
+                functools.partial(self._provider_stream, piece, part_path, relative_path), chunk_queue, semaphore
+            ))
+            for piece, part_path, chunk_queue in zip(pieces, part_paths, queues)
+        ]
+        try:
+            for chunk_queue in queues:
+                async for chunk in self._drain_queue(chunk_queue):
+                    if chunk.get('type') == 'error':
+                        yield chunk
+                        return
+                    if chunk.get('type') == 'pcm':
+                        yield chunk
+            await asyncio.to_thread(concatenate_wav_files, part_paths, wav_path)
+            yield {"data": relative_path, "type": "wav_path", "end": True}
+        finally:
+            for task in tasks:
+                task.cancel()
+            for part_path in part_paths:
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+    
+    async def _prefetch_worker(self, stream_factory: Callable[[], AsyncIterator[Dict]],
+                               chunk_queue: asyncio.Queue, semaphore: contextlib.AbstractAsyncContextManager,
+                               keep_pcm: bool = True):
+        """后台任务：获取并发名额后执行合成，将chunk放入队列（有界队列写满时等待读取），结束时放入None
+
+        keep_pcm=False 时PCM chunk替换为占位chunk，避免在内存中缓存尚未轮到的节点音频。
+        """
+        try:
+            async with semaphore:
+                async for chunk in stream_factory():
+                    if not keep_pcm and chunk.get('type') == 'pcm':
+                        chunk = PCM_PLACEHOLDER
+                    await chunk_queue.put(chunk)
+        except Exception as e:
+            await chunk_queue.put(e)
+            return
+        await chunk_queue.put(None)
+    
+    async def _drain_queue(self, chunk_queue: asyncio.Queue) -> AsyncIterator[Dict]:
+        """按顺序读取预合成队列中的chunk"""
+        while True:
+            item = await chunk_queue.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    
+    def _prefetch_tts_nodes(self):
+        """并发模式：为需要生成音频的TTS节点提交后台任务，最多同时执行max_concurrency个，
+        最多领先当前节点 prefetch_ahead 个，事件仍按流程顺序输出
+
+        批量合成时节点本身不占名额（否则切分节点持有名额等待各段名额会占满工作池），由平台请求在共享工作池中排队。
+        """
+        if self.node_slots is not None:
+            self._prefetch_semaphore = contextlib.nullcontext()
+        else:
+            self._prefetch_semaphore = asyncio.Semaphore(self.max_concurrency)
+        for node in self.plan.tts_nodes:
+            info = self._resolve_tts_node(node)
+            if not info['text'] or info['existing_path'] or info['artifact_key']:
+                continue
+            self._prefetch_pending.append((node, info))
+        self._fill_prefetch()
+    
+    def _fill_prefetch(self):
+        """补充提交待合成节点，直到领先的节点数达到 prefetch_ahead"""
+        self._prefetch_tasks = [task for task in self._prefetch_tasks if not task.done()]
+        while self._prefetch_pending and len(self._prefetched) < self.prefetch_ahead:
+            node, info = self._prefetch_pending.popleft()
+            # 队列中只有占位chunk，不设上限：合成完成即释放并发名额，不因尚未轮到读取而占用
+            chunk_queue = asyncio.Queue()
+            self._prefetch_tasks.append(asyncio.create_task(self._prefetch_worker(
+                functools.partial(self._tts_stream, info, keep_pcm=False), chunk_queue, self._prefetch_semaphore,
+                keep_pcm=False
+            )))
+            self._prefetched[node.id] = self._drain_queue(chunk_queue)
+    
+    def _cancel_prefetch(self):
+        for task in self._prefetch_tasks:
+            task.cancel()
+        self._prefetch_tasks.clear()
+        self._prefetch_pending.clear()
+        self._prefetched.clear()
+    
+    async def _restore_artifact(self, key: str, wav_path: str) -> bool:
+        """将制品取回到节点wav路径，本地文件的sha256与制品键中的哈希一致时直接复用（制品按内容寻址）"""
+        store = get_artifact_store()
+        try:
+            size = await store.size(key)
+            if size is None:
+                return False
+            if (os.path.exists(wav_path) and os.path.getsize(wav_path) == size
+                    and await asyncio.to_thread(file_digest, wav_path) == artifact_digest(key)):
+                return True
+            return await store.get_file(key, wav_path)
+        except Exception as e:
+            print(f"警告: 读取音频制品 {key} 失败: {e}")
+            return False
     
-    def _process_tts_node(self, node: Node) -> Generator[str, None, None]:
+    async def _process_tts_node(self, node: PlanNode) -> AsyncGenerator[str, None]:
         """处理TTS文本节点"""
-        properties = node.properties
-        node_content = properties.get('nodeContentData', {})
-        audio_url = node_content.get('audioUrl')
-        text = node_content.get('text', '')
-        node_name = properties.get('name', '')
+        info = self._resolve_tts_node(node)
+        audio_url = info['audio_url']
+        text = info['text']
+        node_name = info['node_name']
         
         # 返回节点信息
         yield self._yield_event({
@@ -162,22 +396,22 @@ class WorkflowSynthesizer:
             return
         
         # 检查是否已有音频文件（只有文件真实存在才直接返回，否则继续生成新音频）
-        if audio_url:
-            static_path = os.path.join(AppConstants.STATIC_DIR, audio_url.lstrip('/'))
-            if os.path.exists(static_path):
-                yield self._yield_event({
-                    'status': '使用已有音频文件',
-                    'audioUrl': audio_url,
-                    'progress': self._get_progress_data(node_name)
-                }, 0, EventType.NODE_TASK)
-                self.audio_files.append(static_path)
-                return
-            # 文件不存在则自动生成新音频（继续往下执行）
+        if info['artifact_key'] and await self._restore_artifact(info['artifact_key'], info['wav_path']):
+            info['existing_path'] = info['wav_path']
+        if info['existing_path']:
+            yield self._yield_event({
+                'status': '使用已有音频文件',
+                'audioUrl': audio_url,
+                'progress': self._get_progress_data(node_name)
+            }, 0, EventType.NODE_TASK)
+            self.audio_files.append(info['existing_path'])
+            await self._add_to_package(info['existing_path'], info['package_name'])
+            self.node_fingerprints[node.id] = {'fingerprint': info['fingerprint'], 'audioUrl': info['stored_url']}
+            return
         
         # 生成新音频
         os.makedirs(self.wav_dir, exist_ok=True)
-        wav_path = os.path.join(self.wav_dir, f"{node.id}_{node_name}.wav")
-        relative_path = f"tts_wav/{self.flow.id}/{node.id}_{node_name}.wav"
+        wav_path = info['wav_path']
         
         yield self._yield_event({
             'status': '开始生成音频',
@@ -185,35 +419,63 @@ class WorkflowSynthesizer:
         }, 0, EventType.NODE_TASK)
         
         try:
-            if getattr(self.platform, "type", None) == "volcano":
-                for chunk in tts_volcano_stream(
-                    text=text,
-                    voice=self.voice,
-                    platform=self.platform,
-                    wav_path=wav_path,
-                    relative_path=relative_path
-                ):
-                    # 为每个chunk添加进度信息
+            chunks = self._prefetched.pop(node.id, None)
+            if chunks is None:
+                chunks = self._tts_stream(info)
+            else:
+                self._fill_prefetch()
+            # 同一节点的chunk事件内容相同，只序列化一次（合并模式下带累计chunk数，按速率限制推送）
+            chunk_event = None
+            chunk_count = 0
+            result_url = None
+            async for chunk in chunks:
+                if chunk.get('type') == 'error':
+                    raise Exception(chunk.get('data'))
+                if chunk.get('type') == 'wav_path':
+                    result_url = chunk.get('data') or info['relative_path']
+                if chunk.get('cached'):
+                    yield self._yield_event({
+                        'status': '使用缓存音频',
+                        'progress': self._get_progress_data(node_name)
+                    }, 0, EventType.NODE_TASK)
+                    continue
+                chunk_count += 1
+                if not self._should_emit_chunk_event(chunk_count):
+                    continue
+                if self.progress_mode == ProgressMode.COALESCED:
                     yield self._yield_event({
+                        'status': f'{node.id}_{node_name}_生成中...',
+                        'chunks': chunk_count,
+                        'progress': self._get_progress_data(node_name)
+                    }, 0, EventType.NODE_TASK, repeated=chunk_count > 1)
+                    continue
+                # 为每个chunk添加进度信息
+                if chunk_event is None:
+                    chunk_event = self._yield_event({
                         'status': f'{node.id}_{node_name}_生成中...',
                         'progress': self._get_progress_data(node_name)
                     }, 0, EventType.NODE_TASK)
-            else:
-                raise Exception("暂不支持该平台类型的TTS合成")
+                yield chunk_event if chunk_count == 1 else ChunkEvent(chunk_event)
+            if result_url is None:
+                # 流在结束chunk之前中断（如合并的请求被取消），wav文件不完整
+                raise Exception("合成中断，未返回音频")
             # 添加到音频文件列表
             self.audio_files.append(wav_path)
+            await self._add_to_package(wav_path, info['package_name'])
+            self.node_fingerprints[node.id] = {
+                'fingerprint': info['fingerprint'],
+                'audioUrl': result_url
+            }
         except Exception as e:
             yield self._yield_event({
                 'error': str(e),
                 'progress': self._get_progress_data(node_name)
             }, 1, EventType.NODE_TASK)
     
-    def _process_space_node(self, node: Node) -> Generator[str, None, None]:
+    async def _process_space_node(self, node: PlanNode) -> AsyncGenerator[str, None]:
         """处理留白节点"""
-        properties = node.properties
-        node_content = properties.get('nodeContentData', {})
-        duration = node_content.get('duration', 3)  # 默认3秒
-        node_name = properties.get('name', '')
+        duration = node.duration  # 默认3秒
+        node_name = node.name
         
         # 返回节点信息
         yield self._yield_event({
@@ -224,23 +486,15 @@ class WorkflowSynthesizer:
             'progress': self._get_progress_data(node_name)
         }, 0, EventType.NODE)
         
-        # 生成空白音频
-        os.makedirs(self.wav_dir, exist_ok=True)
-        wav_path = os.path.join(self.wav_dir, f"{node.id}_{node_name}.wav")
-        
-        # 生成指定时长的空白音频
-        sample_rate = 24000
-        samples = int(duration * sample_rate)
-        silence = np.zeros(samples, dtype=np.int16)
-        
-        with wave.open(wav_path, 'wb') as wavfile:
-            wavfile.setnchannels(1)
-            wavfile.setsampwidth(2)
-            wavfile.setframerate(sample_rate)
-            wavfile.writeframes(silence.tobytes())
+        # 拼接时直接写入静音帧，仅在需要放入ZIP时生成空白音频文件
+        if self.include_silence_files:
+            os.makedirs(self.wav_dir, exist_ok=True)
+            wav_path = os.path.join(self.wav_dir, f"{node.id}.wav")
+            await asyncio.to_thread(write_silence_wav, wav_path, duration)
+            await self._add_to_package(wav_path, package_name(node.id, node_name))
         
-        # 添加到音频文件列表
-        self.audio_files.append(wav_path)
+        # 添加到拼接计划
+        self.audio_files.append(SilenceSegment.from_duration(duration))
         
         yield self._yield_event({
             'status': '空白音频生成完成',
@@ -248,32 +502,52 @@ class WorkflowSynthesizer:
             'progress': self._get_progress_data(node_name)
         }, 0, EventType.NODE_TASK)
     
-    def _process_node(self, node: Node) -> Generator[str, None, None]:
+    async def _process_node(self, node: PlanNode) -> AsyncGenerator[str, None]:
         """处理单个节点"""
-        if not node or not node.properties:
-            return
-            
-        node_type = node.properties.get('type')
+        node_type = node.kind
         if not node_type:
             return
         
         if node_type == 'ttsTextChunk':
-            for event in self._process_tts_node(node):
+            async for event in self._process_tts_node(node):
                 yield event
         elif node_type == 'spaceVoid':
-            for event in self._process_space_node(node):
+            async for event in self._process_space_node(node):
                 yield event
         # 可以扩展其他节点类型
     
-    def synthesize_all(self):
+    def _check_deadline(self):
+        """超出任务时间预算时终止合成"""
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise Exception(f"合成超出时间预算（{settings.synthesis_job_timeout:g}秒）")
+    
+    async def _save_node_fingerprints(self):
+        """将本次合成的节点指纹按节点合并保存到工作流，不覆盖合成期间单节点合成写入的其他节点；
+        删除已不在流程中的节点记录"""
+        updates = {
+            node_id: record for node_id, record in self.node_fingerprints.items()
+            if self.stored_fingerprints.get(node_id) != record
+        }
+        node_ids = {node.id for node in self.plan.nodes}
+        removed = [node_id for node_id in self.stored_fingerprints if node_id not in node_ids]
+        if not updates and not removed:
+            return
+        await TTSFlowService.save_node_fingerprints(self.flow, updates, removed)
+        self.stored_fingerprints.update(updates)
+        for node_id in removed:
+            self.stored_fingerprints.pop(node_id, None)
+    
+    async def synthesize_all(self) -> AsyncGenerator[str, None]:
         """开始合成整个工作流音频"""
         try:
+            if settings.synthesis_job_timeout:
+                self.deadline = time.monotonic() + settings.synthesis_job_timeout
 
-            # 解析工作流
-            self._parse_workflow()
+            # 获取编译后的执行计划（工作流未修改时直接复用）
+            self.plan = get_workflow_plan(self.flow, self.voice, self.platform)
             
             # 计算需要处理的节点数量（排除事件节点）
-            self.total_nodes = len([node for node in self.nodes if node.type != 'event-node']) + 1
+            self.total_nodes = self.plan.total_nodes
             
             # 返回开始事件
             yield self._yield_event({
@@ -282,23 +556,44 @@ class WorkflowSynthesizer:
             }, 0, EventType.START)
             
             # 找到开始节点
-            current_node = self._find_start_node()
-            if not current_node:
+            if not self.plan.has_start:
                 yield self._yield_event({
                     'error': '未找到开始节点',
                     'progress': self._get_progress_data()
                 }, 1, EventType.END)
                 return
             
+            if self.output_profile != DEFAULT_OUTPUT_PROFILE and not ffmpeg_path():
+                yield self._yield_event({
+                    'error': f'未安装ffmpeg，无法输出{self.output_profile}格式',
+                    'progress': self._get_progress_data()
+                }, 1, EventType.END)
+                return
+            
+            self.packager = ZipPackager(self.zip_path, self.zip_compression)
+            
+            # 并发模式或批量合成时提前提交TTS节点合成
+            if self.max_concurrency > 1 or self.node_slots is not None:
+                os.makedirs(self.wav_dir, exist_ok=True)
+                self._prefetch_tts_nodes()
+            
             # 处理节点链表
-            while current_node:
-                if current_node.type != 'event-node':  # 跳过事件节点
-                    for event in self._process_node(current_node):
-                        yield event
-
-                self.processed_count += 1
-                
-                current_node = current_node.next
+            try:
+                for current_node in self.plan.nodes:
+                    self._check_deadline()
+                    if not current_node.is_event:  # 跳过事件节点
+                        async for event in self._process_node(current_node):
+                            yield event
+                    
+                    self.processed_count += 1
+            finally:
+                self._cancel_prefetch()
+            
+            # 保存节点指纹，下次只重新合成内容变化的节点；保存失败只影响下次的增量判断，不影响本次结果
+            try:
+                await self._save_node_fingerprints()
+            except Exception as e:
+                print(f"警告: 保存节点指纹失败: {e}")
             
             # 拼接所有音频文件
             if self.audio_files:
@@ -312,7 +607,7 @@ class WorkflowSynthesizer:
                 
                 # 拼接音频
                 combined_audio_path = os.path.join(self.wav_dir, "tts_all.wav")
-                self._concatenate_audio_files(self.audio_files, combined_audio_path)
+                await asyncio.to_thread(self._concatenate_audio_files, self.audio_files, combined_audio_path)
                 
                 yield self._yield_event({
                     'status': '音频拼接完成',
@@ -321,19 +616,21 @@ class WorkflowSynthesizer:
                     'progress': self._get_progress_data("音频拼接完成")
                 }, 0, EventType.AUDIO_CONCAT)
                 
-                # 创建ZIP压缩包
+                # 创建ZIP压缩包（节点音频已在合成过程中写入，这里补充拼接结果）
                 yield self._yield_event({
                     'status': '开始创建ZIP压缩包',
                     'progress': self._get_progress_data("ZIP打包")
                 }, 0, EventType.ZIP_PACKAGE)
                 
-                zip_path = os.path.join(AppConstants.STATIC_DIR, "tts_wav", f"{self.flow.id}.zip")
-                self._create_zip_archive(self.wav_dir, zip_path)
+                await self._add_to_package(combined_audio_path)
+                await self._flush_encoded()
+                rebuilt = await asyncio.to_thread(self.packager.close)
+                self.packager = None
                 
                 # 返回ZIP下载路径
-                zip_download_path = f"/static/tts_wav/{self.flow.id}.zip"
+                zip_download_path = self.zip_download_path
                 yield self._yield_event({
-                    'status': 'ZIP压缩包创建完成',
+                    'status': 'ZIP压缩包创建完成' if rebuilt else 'ZIP压缩包内容未变化',
                     'zipPath': zip_download_path,
                     'downloadUrl': zip_download_path,
                     'progress': self._get_progress_data("ZIP打包完成")
@@ -345,7 +642,8 @@ class WorkflowSynthesizer:
                 'processedNodes': self.processed_count,
                 'status': '合成完成',
                 'audioFiles': len(self.audio_files),
-                'zipDownloadPath': f"/static/tts_wav/{self.flow.id}.zip" if self.audio_files else None,
+                'zipDownloadPath': self.zip_download_path if self.audio_files else None,
+                'outputProfile': self.output_profile,
                 'progress': self._get_progress_data("处理完成")
             }, 0, EventType.END)
             
@@ -353,4 +651,11 @@ class WorkflowSynthesizer:
             yield self._yield_event({
                 'error': str(e),
                 'progress': self._get_progress_data()
-            }, 1, EventType.END)
\ No newline at end of file
+            }, 1, EventType.END)
+        finally:
+            for task in self._encode_tasks:
+                task.cancel()
+            self._encode_tasks.clear()
+            if self.packager:
+                self.packager.discard()
+                self.packager = None
\ No newline at end of file
@@ -0,0 +1,74 @@
+import asyncio
+import os
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from app.core.config import settings
+
+# 输出格式：扩展名与ffmpeg编码参数；wav为原始PCM，不需要编码
+OUTPUT_PROFILES: Dict[str, Dict] = {
+    "wav": {"ext": "wav", "args": None},
+    "flac": {"ext": "flac", "args": ["-c:a", "flac", "-compression_level", "5"]},
+    "opus": {"ext": "ogg", "args": ["-c:a", "libopus", "-b:a", "32k", "-application", "voip"]},
+    "mp3": {"ext": "mp3", "args": ["-c:a", "libmp3lame", "-b:a", "64k"]},
+}
+DEFAULT_OUTPUT_PROFILE = "wav"
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def normalize_profile(profile: Optional[str]) -> str:
+    """校验输出格式名称，未指定时为wav"""
+    profile = (profile or DEFAULT_OUTPUT_PROFILE).lower()
+    if profile not in OUTPUT_PROFILES:
+        raise ValueError(f"不支持的输出格式: {profile}，可选 {', '.join(OUTPUT_PROFILES)}")
+    return profile
+
+
+def profile_extension(profile: str) -> str:
+    return OUTPUT_PROFILES[profile]["ext"]
+
+
+def ffmpeg_path() -> Optional[str]:
+    """ffmpeg为可选依赖，未安装时只能输出wav"""
+    return shutil.which("ffmpeg")
+
+
+def available_profiles() -> List[str]:
+    return list(OUTPUT_PROFILES) if ffmpeg_path() else [DEFAULT_OUTPUT_PROFILE]
+
+
+def encode_audio(src_path: str, dest_path: str, profile: str):
+    """调用ffmpeg将wav编码为指定格式（先写临时文件再原子替换）"""
+    args = OUTPUT_PROFILES[profile]["args"]
+    if args is None:
+        if os.path.abspath(src_path) != os.path.abspath(dest_path):
+            shutil.copyfile(src_path, dest_path)
+        return
+    ffmpeg = ffmpeg_path()
+    if not ffmpeg:
+        raise Exception("未安装ffmpeg，无法输出压缩格式")
+    tmp_path = f"{dest_path}.tmp.{profile_extension(profile)}"
+    result = subprocess.run(
+        [ffmpeg, "-y", "-nostdin", "-loglevel", "error", "-i", src_path, *args, tmp_path],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    if result.returncode != 0:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise Exception(f"音频编码失败: {result.stderr.decode(errors='ignore').strip()}")
+    os.replace(tmp_path, dest_path)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.audio_encode_workers, thread_name_prefix="audio-encode")
+    return _executor
+
+
+async def encode_audio_async(src_path: str, dest_path: str, profile: str):
+    """在编码线程池中执行（ffmpeg子进程），不阻塞事件循环"""
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(_get_executor(), encode_audio, src_path, dest_path, profile)
@@ -0,0 +1,141 @@
+import os
+import struct
+import wave
+from typing import Iterator, List, Tuple, Union
+
+# 拼接时每次读写的帧数（24kHz单声道16bit约2.7秒，128KB）
+CONCAT_BLOCK_FRAMES = 64 * 1024
+
+# 默认音频参数（与TTS平台输出一致）
+DEFAULT_SAMPLE_RATE = 24000
+DEFAULT_CHANNELS = 1
+DEFAULT_SAMPLE_WIDTH = 2
+
+# 流式wav头中的数据长度：总长度未知时填最大值，播放器会一直读到连接结束
+STREAMING_WAV_DATA_SIZE = 0xFFFFFFFF - 36
+
+
+class SilenceSegment:
+    """虚拟留白片段：拼接时直接写入静音帧，不产生中间文件"""
+    def __init__(self, frames: int, sample_rate: int = DEFAULT_SAMPLE_RATE):
+        self.frames = max(0, int(frames))
+        self.sample_rate = sample_rate
+    
+    @classmethod
+    def from_duration(cls, duration: float, sample_rate: int = DEFAULT_SAMPLE_RATE) -> "SilenceSegment":
+        return cls(int(duration * sample_rate), sample_rate)
+    
+    def frames_at(self, sample_rate: int) -> int:
+        """换算为目标采样率下的帧数"""
+        if sample_rate == self.sample_rate:
+            return self.frames
+        return self.frames * sample_rate // self.sample_rate
+    
+    def __repr__(self):
+        return f"SilenceSegment(frames={self.frames}, sample_rate={self.sample_rate})"
+
+
+AudioSegment = Union[str, SilenceSegment]
+
+
+def _write_silence_frames(output_wav: wave.Wave_write, frames: int, block_frames: int):
+    """分块写入静音帧，只分配一个块大小的缓冲"""
+    frame_size = output_wav.getnchannels() * output_wav.getsampwidth()
+    zero_block = bytes(min(frames, block_frames) * frame_size)
+    while frames > 0:
+        count = min(frames, block_frames)
+        output_wav.writeframesraw(zero_block[:count * frame_size] if count < block_frames else zero_block)
+        frames -= count
+
+
+def write_silence_wav(wav_path: str, duration: float, sample_rate: int = DEFAULT_SAMPLE_RATE,
+                      block_frames: int = CONCAT_BLOCK_FRAMES):
+    """生成指定时长的空白wav文件"""
+    with wave.open(wav_path, 'wb') as wavfile:
+        wavfile.setnchannels(DEFAULT_CHANNELS)
+        wavfile.setsampwidth(DEFAULT_SAMPLE_WIDTH)
+        wavfile.setframerate(sample_rate)
+        _write_silence_frames(wavfile, int(duration * sample_rate), block_frames)
+
+
+def concatenate_wav_files(audio_files: List[AudioSegment], output_path: str, block_frames: int = CONCAT_BLOCK_FRAMES):
+    """按顺序流式拼接wav文件与虚拟留白片段，逐块写入输出文件，内存占用与总时长无关"""
+    if not audio_files:
+        return
+    
+    # 读取第一个音频文件获取音频参数（全部为留白时使用默认参数）
+    channels, sample_width, sample_rate = DEFAULT_CHANNELS, DEFAULT_SAMPLE_WIDTH, DEFAULT_SAMPLE_RATE
+    first_file = next((f for f in audio_files if not isinstance(f, SilenceSegment)), None)
+    if first_file:
+        with wave.open(first_file, 'rb') as first_wav:
+            channels = first_wav.getnchannels()
+            sample_width = first_wav.getsampwidth()
+            sample_rate = first_wav.getframerate()
+    
+    with wave.open(output_path, 'wb') as output_wav:
+        output_wav.setnchannels(channels)
+        output_wav.setsampwidth(sample_width)
+        output_wav.setframerate(sample_rate)
+        
+        for audio_file in audio_files:
+            if isinstance(audio_file, SilenceSegment):
+                _write_silence_frames(output_wav, audio_file.frames_at(sample_rate), block_frames)
+                continue
+            if not os.path.exists(audio_file):
+                continue
+            with wave.open(audio_file, 'rb') as wav_file:
+                # 确保音频参数一致
+                if (wav_file.getnchannels() != channels or
+                        wav_file.getsampwidth() != sample_width or
+                        wav_file.getframerate() != sample_rate):
+                    print(f"警告: 音频文件 {audio_file} 参数不匹配，跳过")
+                    continue
+                while True:
+                    frames = wav_file.readframes(block_frames)
+                    if not frames:
+                        break
+                    # 头部的数据长度在关闭时统一回写
+                    output_wav.writeframesraw(frames)
+
+
+def streaming_wav_header(channels: int = DEFAULT_CHANNELS, sample_width: int = DEFAULT_SAMPLE_WIDTH,
+                         sample_rate: int = DEFAULT_SAMPLE_RATE) -> bytes:
+    """总长度未知的wav头（RIFF/data长度填最大值），用于边合成边播放"""
+    block_align = channels * sample_width
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', STREAMING_WAV_DATA_SIZE + 36, b'WAVE',
+        b'fmt ', 16, 1, channels, sample_rate, sample_rate * block_align, block_align, sample_width * 8,
+        b'data', STREAMING_WAV_DATA_SIZE
+    )
+
+
+def read_wav_params(audio_file: str) -> Tuple[int, int, int]:
+    """读取wav文件的 (声道数, 采样宽度, 采样率)"""
+    with wave.open(audio_file, 'rb') as wav_file:
+        return wav_file.getnchannels(), wav_file.getsampwidth(), wav_file.getframerate()
+
+
+def iter_segment_frames(audio_file: AudioSegment, params: Tuple[int, int, int],
+                        block_frames: int = CONCAT_BLOCK_FRAMES) -> Iterator[bytes]:
+    """逐块读取一个片段的PCM帧（与拼接规则一致：参数不匹配或文件不存在时跳过）"""
+    channels, sample_width, sample_rate = params
+    if isinstance(audio_file, SilenceSegment):
+        frames = audio_file.frames_at(sample_rate)
+        frame_size = channels * sample_width
+        while frames > 0:
+            count = min(frames, block_frames)
+            yield bytes(count * frame_size)
+            frames -= count
+        return
+    if not os.path.exists(audio_file):
+        return
+    with wave.open(audio_file, 'rb') as wav_file:
+        if (wav_file.getnchannels(), wav_file.getsampwidth(), wav_file.getframerate()) != params:
+            print(f"警告: 音频文件 {audio_file} 参数不匹配，跳过")
+            return
+        while True:
+            frames = wav_file.readframes(block_frames)
+            if not frames:
+                break
+            yield frames
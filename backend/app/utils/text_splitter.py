@@ -0,0 +1,53 @@
+import re
+from typing import List
+
+# 句末标点（保留在句子末尾，包括其后的右引号/括号）
+_SENTENCE_RE = re.compile(r'[^。！？!?；;…\n]*(?:[。！？!?；;…\n]+[”’」』）)"\']*|$)')
+# 句内停顿标点，句子过长时在这些位置继续切分
+_CLAUSE_RE = re.compile(r'[^，,、：:]*(?:[，,、：:]+|$)')
+
+
+def _split_by(pattern: re.Pattern, text: str) -> List[str]:
+    return [part for part in pattern.findall(text) if part]
+
+
+def _pack(parts: List[str], max_length: int) -> List[str]:
+    """把相邻片段合并为不超过 max_length 的段落"""
+    pieces: List[str] = []
+    current = ""
+    for part in parts:
+        if current and len(current) + len(part) > max_length:
+            pieces.append(current)
+            current = ""
+        current += part
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_text(text: str, max_length: int) -> List[str]:
+    """按句子边界切分长文本，每段不超过 max_length 个字符
+
+    优先在句末标点处切分，单句过长时在逗号等句内标点处切分，仍过长则按长度硬切；
+    不含文字的纯空白/标点段落会并入前一段或被丢弃。
+    """
+    if max_length <= 0 or len(text) <= max_length:
+        return [text] if text.strip() else []
+
+    parts: List[str] = []
+    for sentence in _split_by(_SENTENCE_RE, text):
+        if len(sentence) <= max_length:
+            parts.append(sentence)
+            continue
+        for clause in _split_by(_CLAUSE_RE, sentence):
+            parts.extend(clause[i:i + max_length] for i in range(0, len(clause), max_length))
+
+    pieces: List[str] = []
+    for piece in _pack(parts, max_length):
+        # 纯空白/标点段落不单独请求平台，能放下时并入前一段
+        if not re.search(r'\w', piece):
+            if pieces and len(pieces[-1]) + len(piece) <= max_length:
+                pieces[-1] += piece
+            continue
+        pieces.append(piece)
+    return pieces
@@ -0,0 +1,130 @@
+import os
+import shutil
+import uuid
+import zipfile
+import zlib
+from typing import List, Optional, Tuple
+
+# 配置值到zipfile压缩方式的映射
+ZIP_COMPRESSION_MODES = {
+    "stored": zipfile.ZIP_STORED,
+    "deflated": zipfile.ZIP_DEFLATED,
+}
+
+_CRC_BLOCK_SIZE = 1024 * 1024
+
+
+def get_zip_compression(mode: str) -> int:
+    """根据配置名称获取压缩方式，未知值按stored处理"""
+    return ZIP_COMPRESSION_MODES.get((mode or "").lower(), zipfile.ZIP_STORED)
+
+
+def _file_crc(file_path: str) -> int:
+    crc = 0
+    with open(file_path, 'rb') as f:
+        while True:
+            block = f.read(_CRC_BLOCK_SIZE)
+            if not block:
+                return crc
+            crc = zlib.crc32(block, crc)
+
+
+class ZipPackager:
+    """增量ZIP打包器
+
+    文件就绪后立即调用 add 写入临时压缩包，close 时原子替换目标文件。
+    只要已加入的条目（文件名、大小、CRC、压缩方式）与已有压缩包逐一相同，就不会写入任何数据；
+    全部相同时保留原压缩包，不再重建。条目注释中记录源文件的修改时间（纳秒），
+    大小与修改时间都未变化的文件直接沿用原压缩包中的CRC，不再重新读取。
+    """
+
+    def __init__(self, zip_path: str, compression: int = zipfile.ZIP_STORED):
+        self.zip_path = zip_path
+        self.compression = compression
+        # 同一工作流可能有多个任务同时打包，临时文件名各不相同
+        self.tmp_path = f"{zip_path}.{uuid.uuid4().hex}.tmp"
+        self.changed = False
+        self._old_entries, self._old_mtimes = self._read_entries(zip_path)
+        self._entries: List[Tuple[str, int, int, int]] = []
+        self._pending: List[Tuple[str, str, int]] = []  # 与原压缩包一致、尚未写入的文件
+        self._zipf: Optional[zipfile.ZipFile] = None
+
+    @staticmethod
+    def _read_entries(zip_path: str) -> Tuple[List[Tuple[str, int, int, int]], List[Optional[int]]]:
+        if not os.path.exists(zip_path):
+            return [], []
+        try:
+            with zipfile.ZipFile(zip_path, 'r') as zipf:
+                infos = zipf.infolist()
+        except zipfile.BadZipFile:
+            return [], []
+        entries = [(i.filename, i.file_size, i.CRC, i.compress_type) for i in infos]
+        mtimes = [int(i.comment) if i.comment.isdigit() else None for i in infos]
+        return entries, mtimes
+
+    def _write(self, file_path: str, arcname: str, mtime_ns: int):
+        info = zipfile.ZipInfo.from_file(file_path, arcname)
+        info.compress_type = self.compression
+        info.comment = str(mtime_ns).encode()
+        with open(file_path, 'rb') as src, self._zipf.open(info, 'w') as dest:
+            shutil.copyfileobj(src, dest, _CRC_BLOCK_SIZE)
+
+    def _open(self):
+        """出现差异时开始写临时压缩包，并补写之前暂存的条目"""
+        os.makedirs(os.path.dirname(self.zip_path), exist_ok=True)
+        self._zipf = zipfile.ZipFile(self.tmp_path, 'w', self.compression)
+        self.changed = True
+        for file_path, arcname, mtime_ns in self._pending:
+            self._write(file_path, arcname, mtime_ns)
+        self._pending.clear()
+
+    def _crc(self, index: int, arcname: str, stat: os.stat_result) -> Optional[int]:
+        """原压缩包同位置条目的文件名、大小与修改时间都相同时沿用其CRC"""
+        if index < len(self._old_entries):
+            old = self._old_entries[index]
+            if old[0] == arcname and old[1] == stat.st_size and self._old_mtimes[index] == stat.st_mtime_ns:
+                return old[2]
+        return None
+
+    def add(self, file_path: str, arcname: Optional[str] = None):
+        """加入一个文件，同名条目只保留第一个"""
+        if not os.path.exists(file_path):
+            return
+        arcname = arcname or os.path.basename(file_path)
+        if any(entry[0] == arcname for entry in self._entries):
+            return
+        stat = os.stat(file_path)
+        index = len(self._entries)
+        crc = self._crc(index, arcname, stat)
+        if crc is None:
+            crc = _file_crc(file_path)
+        entry = (arcname, stat.st_size, crc, self.compression)
+        self._entries.append(entry)
+
+        if self._zipf is None:
+            if index < len(self._old_entries) and self._old_entries[index] == entry:
+                self._pending.append((file_path, arcname, stat.st_mtime_ns))
+                return
+            self._open()
+        self._write(file_path, arcname, stat.st_mtime_ns)
+
+    def close(self) -> bool:
+        """完成打包，返回是否重建了压缩包"""
+        if self._zipf is None:
+            if self._entries == self._old_entries and os.path.exists(self.zip_path):
+                self._pending.clear()
+                return False
+            self._open()
+        self._zipf.close()
+        self._zipf = None
+        os.replace(self.tmp_path, self.zip_path)
+        return True
+
+    def discard(self):
+        """放弃本次打包，保留原压缩包"""
+        if self._zipf is not None:
+            self._zipf.close()
+            self._zipf = None
+        self._pending.clear()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+音频拼接内存基准测试
+
+对比旧的整段缓存拼接（bytearray）与流式拼接在不同输出时长下的峰值内存(RSS)。
+每次测量在独立子进程中执行，避免相互影响。
+
+用法:
+    python benchmarks/bench_concat.py                  # 默认 1/5/15/30 分钟
+    python benchmarks/bench_concat.py --minutes 1 10 60
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.audio_utils import concatenate_wav_files  # noqa: E402
+
+SAMPLE_RATE = 24000
+SEGMENT_SECONDS = 30
+
+
+def buffered_concatenate(audio_files, output_path):
+    """旧实现：读入全部音频后一次性写出"""
+    with wave.open(audio_files[0], 'rb') as first_wav:
+        params = first_wav.getparams()
+    all_audio_data = bytearray()
+    for audio_file in audio_files:
+        with wave.open(audio_file, 'rb') as wav_file:
+            all_audio_data.extend(wav_file.readframes(wav_file.getnframes()))
+    with wave.open(output_path, 'wb') as output_wav:
+        output_wav.setparams(params)
+        output_wav.writeframes(all_audio_data)
+
+
+def create_segments(work_dir, minutes):
+    """生成总时长为 minutes 的若干段30秒音频"""
+    segment = os.urandom(SAMPLE_RATE * 2 * SEGMENT_SECONDS)
+    files = []
+    for i in range(int(minutes * 60 / SEGMENT_SECONDS)):
+        path = os.path.join(work_dir, f"seg_{i:05d}.wav")
+        with wave.open(path, 'wb') as wavfile:
+            wavfile.setnchannels(1)
+            wavfile.setsampwidth(2)
+            wavfile.setframerate(SAMPLE_RATE)
+            wavfile.writeframes(segment)
+        files.append(path)
+    return files
+
+
+def _measure(impl, audio_files, output_path, result_queue):
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    impl(audio_files, output_path)
+    elapsed = time.perf_counter() - start
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result_queue.put((elapsed, base_rss, peak_rss))
+
+
+def measure(impl, audio_files, output_path):
+    ctx = multiprocessing.get_context("spawn")
+    result_queue = ctx.Queue()
+    process = ctx.Process(target=_measure, args=(impl, audio_files, output_path, result_queue))
+    process.start()
+    result = result_queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="音频拼接峰值内存基准测试")
+    parser.add_argument("--minutes", type=float, nargs="+", default=[1, 5, 15, 30], help="输出音频时长（分钟）")
+    args = parser.parse_args()
+
+    print(f"{'时长(分钟)':>10} {'输出(MB)':>10} {'实现':>10} {'耗时(s)':>10} {'峰值RSS(MB)':>12} {'增量(MB)':>10}")
+    for minutes in args.minutes:
+        with tempfile.TemporaryDirectory() as work_dir:
+            audio_files = create_segments(work_dir, minutes)
+            output_path = os.path.join(work_dir, "tts_all.wav")
+            for name, impl in (("buffered", buffered_concatenate), ("streaming", concatenate_wav_files)):
+                elapsed, base_rss, peak_rss = measure(impl, audio_files, output_path)
+                output_mb = os.path.getsize(output_path) / 1024 / 1024
+                # ru_maxrss 在 Linux 上单位为 KB
+                print(f"{minutes:>10g} {output_mb:>10.1f} {name:>10} {elapsed:>10.2f} "
+                      f"{peak_rss / 1024:>12.1f} {(peak_rss - base_rss) / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
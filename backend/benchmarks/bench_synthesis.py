@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+工作流合成端到端基准测试
+
+启动本地火山引擎替身服务（benchmarks/volcano_standin.py），用不同规模的工作流和并发数
+执行完整的 synthesize_all（平台请求、wav落盘、拼接、ZIP打包），统计：
+
+- 首事件耗时：从开始到第一个节点生成事件（node_task）的时间
+- 首音频耗时：从开始到第一个音频chunk事件（"生成中..."）的时间，主要取决于平台首包延迟
+- 总耗时、节点吞吐（节点/秒）、音频吞吐（音频秒/秒）
+- 峰值内存（RSS）
+
+每个用例在独立子进程中运行，使用临时静态目录和空的合成缓存，不连接数据库。
+
+用法:
+    python benchmarks/bench_synthesis.py                                  # 默认 10/50/200 节点 × 并发 1/4/16
+    python benchmarks/bench_synthesis.py --nodes 100 --concurrency 1 8 32
+    python benchmarks/bench_synthesis.py --first-chunk-ms 500 --chunk-ms 50
+    python benchmarks/bench_synthesis.py --endpoint http://host:8090/api/v3/tts/unidirectional  # 使用已启动的替身服务
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import queue
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from types import SimpleNamespace
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+TEXT_CHARS = 20  # 每个节点的文本长度
+
+
+class BenchFlow:
+    """代替数据库中的工作流文档"""
+    def __init__(self, flow_id, flow_config):
+        self.id = flow_id
+        self.flow_config = flow_config
+        self.node_fingerprints = {}
+        self.updated_at = 0
+
+    async def set(self, expression):
+        # 与 TTSFlowService.save_node_fingerprints 一致：按 node_fingerprints.<node_id> 逐个节点写入
+        for field, value in expression.items():
+            if field.startswith("node_fingerprints."):
+                self.node_fingerprints[field.split(".", 1)[1]] = value
+            else:
+                setattr(self, field, value)
+
+    async def update(self, expression):
+        for field in expression.get("$unset", {}):
+            if field.startswith("node_fingerprints."):
+                self.node_fingerprints.pop(field.split(".", 1)[1], None)
+
+
+def build_flow(node_count):
+    """构建 开始 -> 文本节点×node_count 的工作流，文本各不相同以避免命中缓存"""
+    nodes = [{"id": "start", "type": "event-node", "properties": {"name": "开始"}}]
+    for i in range(node_count):
+        text = f"第{i}段基准测试文本" + "内容" * TEXT_CHARS
+        nodes.append({
+            "id": f"tts{i}",
+            "type": "common-node",
+            "properties": {
+                "type": "ttsTextChunk",
+                "name": f"文本{i}",
+                "nodeContentData": {"text": text[:TEXT_CHARS], "audioUrl": None},
+            },
+        })
+    edges = [{"sourceNodeId": a["id"], "targetNodeId": b["id"]} for a, b in zip(nodes, nodes[1:])]
+    return BenchFlow(f"bench-{node_count}", {"logicList": [{"nodes": nodes, "edges": edges}]})
+
+
+async def _run_case(node_count, concurrency, endpoint, work_dir):
+    from app.core.constants import AppConstants
+    from app.services import synthesis_cache as cache_module
+    from app.services.workflow_synthesizer import WorkflowSynthesizer
+
+    AppConstants.STATIC_DIR = work_dir
+    cache_module.synthesis_cache = cache_module.SynthesisCache(os.path.join(work_dir, "tts_cache"), 1024 ** 4)
+
+    platform = SimpleNamespace(
+        id=f"bench-{concurrency}", type="volcano",
+        config={"endpoint": endpoint, "max_concurrency": concurrency, "pool_size": max(10, concurrency)}
+    )
+    synthesizer = WorkflowSynthesizer(build_flow(node_count), SimpleNamespace(role_id="bench"), platform)
+
+    start = time.perf_counter()
+    first_event = first_audio = None
+    last = None
+    async for event in synthesizer.synthesize_all():
+        last = json.loads(event[len("data: "):])
+        if last["type"] != "node_task":
+            continue
+        if first_event is None:
+            first_event = time.perf_counter() - start
+        if first_audio is None and str(last["data"].get("status", "")).endswith("生成中..."):
+            first_audio = time.perf_counter() - start
+    total = time.perf_counter() - start
+    if not last or last["type"] != "end" or last["code"] != 0:
+        raise RuntimeError(f"合成失败: {last}")
+    audio_seconds = sum(
+        os.path.getsize(path) - 44 for path in synthesizer.audio_files if isinstance(path, str)
+    ) / 2 / 24000
+    return first_event, first_audio, total, audio_seconds
+
+
+def _measure(node_count, concurrency, endpoint, result_queue):
+    """子进程：执行一个用例，结果或错误信息总是放入队列"""
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            result = asyncio.run(_run_case(node_count, concurrency, endpoint, work_dir))
+            peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        result_queue.put(("ok", result + (base_rss, peak_rss)))
+    except BaseException as e:
+        result_queue.put(("error", f"{type(e).__name__}: {e}"))
+
+
+def measure(node_count, concurrency, endpoint, timeout):
+    ctx = multiprocessing.get_context("spawn")
+    result_queue = ctx.Queue()
+    process = ctx.Process(target=_measure, args=(node_count, concurrency, endpoint, result_queue))
+    process.start()
+    try:
+        status, result = result_queue.get(timeout=timeout)
+    except queue.Empty:
+        status, result = "error", f"超过 {timeout} 秒未完成"
+    finally:
+        if process.is_alive():
+            process.join(5)
+        if process.is_alive():
+            process.terminate()
+            process.join()
+    if status != "ok":
+        raise RuntimeError(f"用例 {node_count} 节点 × 并发 {concurrency} 失败: {result}")
+    return result
+
+
+def start_standin(args):
+    """启动替身服务子进程并等待就绪"""
+    command = [
+        sys.executable, os.path.join(BACKEND_DIR, "benchmarks", "volcano_standin.py"),
+        "--port", str(args.port),
+        "--first-chunk-ms", str(args.first_chunk_ms),
+        "--chunk-ms", str(args.chunk_ms),
+    ]
+    process = subprocess.Popen(command)
+    stats_url = f"http://127.0.0.1:{args.port}/stats"
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(stats_url, timeout=1).read()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("替身服务启动失败")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="工作流合成端到端基准测试")
+    parser.add_argument("--nodes", type=int, nargs="+", default=[10, 50, 200], help="工作流的文本节点数")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="平台并发数")
+    parser.add_argument("--port", type=int, default=8090, help="替身服务端口")
+    parser.add_argument("--first-chunk-ms", type=float, default=200, help="替身服务首包延迟（毫秒）")
+    parser.add_argument("--chunk-ms", type=float, default=20, help="替身服务chunk间隔（毫秒）")
+    parser.add_argument("--endpoint", help="使用已启动的兼容服务，不再启动替身服务")
+    parser.add_argument("--timeout", type=float, default=600, help="单个用例的超时时间（秒）")
+    args = parser.parse_args()
+
+    standin = None
+    endpoint = args.endpoint
+    if not endpoint:
+        standin = start_standin(args)
+        endpoint = f"http://127.0.0.1:{args.port}/api/v3/tts/unidirectional"
+
+    try:
+        print(f"{'节点数':>6} {'并发':>4} {'首事件(ms)':>10} {'首音频(ms)':>10} {'总耗时(s)':>9} {'节点/秒':>8} "
+              f"{'音频秒/秒':>9} {'峰值RSS(MB)':>11} {'增量(MB)':>8}")
+        for node_count in args.nodes:
+            for concurrency in args.concurrency:
+                first_event, first_audio, total, audio_seconds, base_rss, peak_rss = measure(
+                    node_count, concurrency, endpoint, args.timeout
+                )
+                # ru_maxrss 在 Linux 上单位为 KB
+                print(f"{node_count:>6} {concurrency:>4} {first_event * 1000:>10.1f} {first_audio * 1000:>10.1f} "
+                      f"{total:>9.2f} "
+                      f"{node_count / total:>8.1f} {audio_seconds / total:>9.1f} "
+                      f"{peak_rss / 1024:>11.1f} {(peak_rss - base_rss) / 1024:>8.1f}")
+    finally:
+        if standin:
+            standin.terminate()
+            standin.wait()
+
+
+if __name__ == "__main__":
+    main()
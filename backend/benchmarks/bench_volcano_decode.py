@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+火山引擎流式响应解码基准测试
+
+对比旧的逐行解码（aiter_lines + json.loads + b64decode + bytearray.extend）
+与 VolcanoStreamDecoder（字节流分行 + 定位data字段直接解码 + 预分配缓冲）的耗时与吞吐。
+
+默认使用合成的响应流（每行约 0.2 秒 24kHz PCM，和线上返回的粒度相近），
+也可以通过 --file 指定一份录制下来的原始响应体。
+
+用法:
+    python benchmarks/bench_volcano_decode.py                     # 默认 10/60/300 秒音频
+    python benchmarks/bench_volcano_decode.py --seconds 30 600
+    python benchmarks/bench_volcano_decode.py --file recorded_response.txt
+"""
+
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from httpx._decoders import LineDecoder, TextDecoder  # noqa: E402
+
+from app.services.tts_volcano import VolcanoStreamDecoder  # noqa: E402
+
+SAMPLE_RATE = 24000
+LINE_SECONDS = 0.2
+NETWORK_CHUNK = 16 * 1024  # 模拟网络读取的块大小
+
+
+def synthetic_response(seconds: float) -> bytes:
+    """生成与火山引擎格式一致的响应体"""
+    pcm = os.urandom(int(SAMPLE_RATE * 2 * LINE_SECONDS))
+    line = json.dumps({"code": 0, "message": "", "data": base64.b64encode(pcm).decode()})
+    lines = [line] * int(seconds / LINE_SECONDS)
+    lines.append(json.dumps({"code": 20000000, "message": "ok", "data": None}))
+    return "\n".join(lines).encode()
+
+
+def network_chunks(raw: bytes):
+    return [raw[i:i + NETWORK_CHUNK] for i in range(0, len(raw), NETWORK_CHUNK)]
+
+
+def legacy_decode(chunks):
+    """旧实现：httpx aiter_lines 的文本解码与分行，再逐行json解析"""
+    text_decoder = TextDecoder()
+    line_decoder = LineDecoder()
+    audio_data = bytearray()
+    lines = []
+    for chunk in chunks:
+        lines.extend(line_decoder.decode(text_decoder.decode(chunk)))
+    lines.extend(line_decoder.decode(text_decoder.flush()))
+    lines.extend(line_decoder.flush())
+    for line in lines:
+        if not line:
+            continue
+        data = json.loads(line)
+        if data.get("code", 0) == 0 and "data" in data and data["data"]:
+            audio_data.extend(base64.b64decode(data["data"]))
+        if data.get("code", 0) == 20000000:
+            break
+    return len(audio_data)
+
+
+def fast_decode(chunks, size_hint):
+    decoder = VolcanoStreamDecoder(size_hint)
+    for chunk in chunks:
+        for code, _, _ in decoder.feed(chunk):
+            if code == 20000000:
+                return decoder.audio.length
+    decoder.flush()
+    return decoder.audio.length
+
+
+def best_of(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="火山引擎流式响应解码基准测试")
+    parser.add_argument("--seconds", type=float, nargs="+", default=[10, 60, 300], help="合成音频时长（秒）")
+    parser.add_argument("--file", help="录制的原始响应体文件（行分隔JSON）")
+    parser.add_argument("--repeat", type=int, default=5, help="每项重复次数，取最快一次")
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, "rb") as f:
+            cases = [(os.path.basename(args.file), f.read())]
+    else:
+        cases = [(f"{seconds:g}s", synthetic_response(seconds)) for seconds in args.seconds]
+
+    print(f"{'数据':>12} {'响应(MB)':>10} {'实现':>8} {'耗时(ms)':>10} {'吞吐(MB/s)':>11} {'PCM(MB)':>9}")
+    for name, raw in cases:
+        chunks = network_chunks(raw)
+        raw_mb = len(raw) / 1024 / 1024
+        size_hint = len(raw) * 3 // 4
+        for impl_name, impl in (
+            ("legacy", lambda: legacy_decode(chunks)),
+            ("fast", lambda: fast_decode(chunks, size_hint)),
+        ):
+            elapsed, pcm_bytes = best_of(impl, args.repeat)
+            print(f"{name:>12} {raw_mb:>10.1f} {impl_name:>8} {elapsed * 1000:>10.1f} "
+                  f"{raw_mb / elapsed:>11.1f} {pcm_bytes / 1024 / 1024:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+火山引擎流式合成接口的本地替身服务
+
+实现与 tts_volcano_stream 相同的 /api/v3/tts/unidirectional 行分隔JSON协议：
+若干 code=0 的音频行（base64 PCM），最后以 code=20000000 结束；可模拟首包延迟、
+chunk 间隔、随机错误码，以及并发超限时返回的限流错误码。
+
+将平台配置中的 endpoint 指向替身服务即可在不消耗平台额度的情况下压测工作流合成：
+
+    {"endpoint": "http://127.0.0.1:8090/api/v3/tts/unidirectional", "max_concurrency": 8}
+
+用法:
+    python benchmarks/volcano_standin.py --port 8090 --first-chunk-ms 300 --chunk-ms 40
+    python benchmarks/volcano_standin.py --error-rate 0.05 --error-code 55000000
+    python benchmarks/volcano_standin.py --max-active 4     # 超过4个并发请求返回限流错误
+
+GET /stats 返回请求数、错误数、当前/峰值并发数。
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import sys
+from dataclasses import asdict, dataclass
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from starlette.applications import Starlette  # noqa: E402
+from starlette.responses import JSONResponse, StreamingResponse  # noqa: E402
+from starlette.routing import Route  # noqa: E402
+
+from app.services.tts_local import LOCAL_SAMPLE_RATE, render_pcm  # noqa: E402
+
+TTS_PATH = "/api/v3/tts/unidirectional"
+END_CODE = 20000000
+THROTTLE_CODE = 45000292  # 并发/配额超限
+
+
+@dataclass
+class StandinOptions:
+    first_chunk_ms: float = 200.0   # 首包延迟（毫秒）
+    chunk_ms: float = 20.0          # 相邻音频行的间隔（毫秒）
+    chunk_seconds: float = 0.2      # 每行音频时长（秒）
+    char_seconds: float = 0.2       # 每个字符的音频时长（秒）
+    error_rate: float = 0           # 随机返回错误的概率
+    error_code: int = 55000000      # 随机错误使用的错误码
+    max_active: int = 0             # 最大并发请求数，超过返回限流错误；0表示不限制
+    seed: int = 0
+
+
+def create_app(options: StandinOptions) -> Starlette:
+    rng = random.Random(options.seed)
+    stats = {"requests": 0, "errors": 0, "throttled": 0, "active": 0, "peakActive": 0}
+
+    def _line(data) -> bytes:
+        return (json.dumps(data) + "\n").encode()
+
+    async def synthesize(request):
+        body = await request.json()
+        params = body.get("req_params") or {}
+        text = params.get("text") or ""
+        speaker = params.get("speaker") or ""
+        stats["requests"] += 1
+
+        async def lines():
+            stats["active"] += 1
+            stats["peakActive"] = max(stats["peakActive"], stats["active"])
+            try:
+                if options.max_active and stats["active"] > options.max_active:
+                    stats["throttled"] += 1
+                    yield _line({"code": THROTTLE_CODE, "message": "quota exceeded for types: concurrency"})
+                    return
+                await asyncio.sleep(options.first_chunk_ms / 1000)
+                if options.error_rate and rng.random() < options.error_rate:
+                    stats["errors"] += 1
+                    yield _line({"code": options.error_code, "message": "standin injected error"})
+                    return
+                pcm = render_pcm(text, speaker, options.char_seconds)
+                chunk_bytes = max(2, int(LOCAL_SAMPLE_RATE * options.chunk_seconds) * 2)
+                for start in range(0, len(pcm), chunk_bytes):
+                    if start and options.chunk_ms:
+                        await asyncio.sleep(options.chunk_ms / 1000)
+                    data = base64.b64encode(pcm[start:start + chunk_bytes]).decode()
+                    yield _line({"code": 0, "message": "", "data": data})
+                yield _line({"code": END_CODE, "message": "OK", "data": None})
+            finally:
+                stats["active"] -= 1
+
+        return StreamingResponse(lines(), media_type="application/json")
+
+    async def get_stats(request):
+        return JSONResponse({**stats, "options": asdict(options)})
+
+    return Starlette(routes=[
+        Route(TTS_PATH, synthesize, methods=["POST"]),
+        Route("/stats", get_stats, methods=["GET"]),
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="火山引擎流式合成接口本地替身服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    defaults = StandinOptions()
+    for field, value in asdict(defaults).items():
+        parser.add_argument(f"--{field.replace('_', '-')}", type=type(value), default=value)
+    args = parser.parse_args()
+
+    import uvicorn
+    options = StandinOptions(**{field: getattr(args, field) for field in asdict(defaults)})
+    uvicorn.run(create_app(options), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+import os
+
+import pytest
+
+# Settings 要求 SECRET_KEY，测试环境使用固定值
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+
+
+@pytest.fixture(autouse=True)
+def local_artifact_store(monkeypatch, tmp_path):
+    """测试中的合成结果写入临时目录下的制品存储"""
+    from app.services import artifact_store as store_module
+    store = store_module.LocalArtifactStore(str(tmp_path / "artifacts"))
+    monkeypatch.setattr(store_module, "artifact_store", store)
+    return store
@@ -0,0 +1,80 @@
+"""
+S3兼容对象存储替身（MinIO风格，路径风格访问），供制品存储测试使用
+
+只实现 PUT / GET / HEAD / DELETE 单个对象，对象保存在内存中；
+按SigV4规则独立校验请求签名与负载哈希，签名错误返回403。
+"""
+
+import hashlib
+import hmac
+from typing import Dict, Tuple
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+
+def _hmac(key: bytes, message: str) -> bytes:
+    return hmac.new(key, message.encode("utf-8"), hashlib.sha256).digest()
+
+
+def _expected_signature(request: Request, secret_key: str) -> Tuple[str, str]:
+    """根据请求重新计算签名，返回 (期望签名, 请求中的签名)"""
+    authorization = request.headers.get("authorization", "")
+    fields = dict(part.strip().split("=", 1) for part in authorization[len("AWS4-HMAC-SHA256 "):].split(","))
+    credential = fields["Credential"].split("/")
+    date, region = credential[1], credential[2]
+    signed_headers = fields["SignedHeaders"].split(";")
+    canonical_headers = "".join(f"{name}:{request.headers[name].strip()}\n" for name in signed_headers)
+    canonical_request = "\n".join([
+        request.method, request.scope["raw_path"].decode("ascii"), request.url.query,
+        canonical_headers, ";".join(signed_headers), request.headers["x-amz-content-sha256"]
+    ])
+    scope = f"{date}/{region}/s3/aws4_request"
+    string_to_sign = "\n".join([
+        "AWS4-HMAC-SHA256", request.headers["x-amz-date"], scope,
+        hashlib.sha256(canonical_request.encode("utf-8")).hexdigest()
+    ])
+    key = _hmac(("AWS4" + secret_key).encode("utf-8"), date)
+    for part in (region, "s3", "aws4_request"):
+        key = _hmac(key, part)
+    return hmac.new(key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest(), fields["Signature"]
+
+
+def create_app(access_key: str = "test-access", secret_key: str = "test-secret") -> Starlette:
+    objects: Dict[str, Tuple[bytes, str]] = {}
+    stats = {"put": 0, "get": 0, "head": 0, "delete": 0}
+
+    async def handle(request: Request):
+        authorization = request.headers.get("authorization", "")
+        if f"Credential={access_key}/" not in authorization:
+            return Response(status_code=403)
+        expected, actual = _expected_signature(request, secret_key)
+        if expected != actual:
+            return Response(status_code=403)
+        path = request.url.path
+        if request.method == "PUT":
+            body = await request.body()
+            if hashlib.sha256(body).hexdigest() != request.headers["x-amz-content-sha256"]:
+                return Response(status_code=400)
+            objects[path] = (body, request.headers.get("content-type", "application/octet-stream"))
+            stats["put"] += 1
+            return Response(status_code=200)
+        if request.method == "DELETE":
+            objects.pop(path, None)
+            stats["delete"] += 1
+            return Response(status_code=204)
+        if path not in objects:
+            return Response(status_code=404)
+        body, content_type = objects[path]
+        if request.method == "HEAD":
+            stats["head"] += 1
+            return Response(headers={"content-length": str(len(body))}, media_type=content_type)
+        stats["get"] += 1
+        return Response(body, media_type=content_type)
+
+    app = Starlette(routes=[Route("/{path:path}", handle, methods=["GET", "PUT", "HEAD", "DELETE"])])
+    app.state.objects = objects
+    app.state.stats = stats
+    return app
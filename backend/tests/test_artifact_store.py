@@ -0,0 +1,86 @@
+import os
+
+import httpx
+import pytest
+
+from app.services.artifact_store import (
+    LocalArtifactStore, S3ArtifactStore, artifact_url, file_digest, parse_artifact_url
+)
+
+from tests import s3_standin
+
+
+def _write(path, content):
+    with open(path, "wb") as f:
+        f.write(content)
+    return str(path)
+
+
+def _s3_store(app, secret_key="test-secret"):
+    store = S3ArtifactStore("http://s3.local", "tts", "test-access", secret_key, prefix="flows")
+    store._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app))
+    return store
+
+
+def test_parse_artifact_url():
+    key = "ab/cd/" + "abcd" * 16 + ".wav"
+    assert parse_artifact_url(artifact_url(key)) == key
+    assert parse_artifact_url("/static/" + artifact_url(key)) == key
+    assert parse_artifact_url("tts_wav/flow/node.wav") is None
+    assert parse_artifact_url("artifacts/../../etc/passwd") is None
+
+
+@pytest.mark.asyncio
+async def test_local_store_uses_sharded_content_addressed_layout(tmp_path):
+    store = LocalArtifactStore(str(tmp_path / "store"))
+    src = _write(tmp_path / "节点.wav", b"RIFF-data")
+
+    key = await store.put_file(src)
+    digest = file_digest(src)
+    assert key == f"{digest[:2]}/{digest[2:4]}/{digest}.wav"
+    assert await store.put_file(_write(tmp_path / "copy.wav", b"RIFF-data")) == key
+    assert store.stats() == {"type": "local", "puts": 1, "deduplicated": 1}
+
+    dest = tmp_path / "out" / "n.wav"
+    assert await store.get_file(key, str(dest))
+    assert dest.read_bytes() == b"RIFF-data"
+    assert os.listdir(tmp_path / "out") == ["n.wav"]
+    assert await store.size(key) == 9
+
+    await store.delete(key)
+    assert await store.size(key) is None
+    assert not await store.get_file(key, str(tmp_path / "missing.wav"))
+
+
+@pytest.mark.asyncio
+async def test_s3_store_round_trip_against_standin(tmp_path):
+    app = s3_standin.create_app()
+    store = _s3_store(app)
+    src = _write(tmp_path / "n.wav", b"RIFF" + bytes(range(256)) * 10)
+
+    key = await store.put_file(src)
+    assert await store.put_file(src) == key
+    assert app.state.stats["put"] == 1
+    assert f"/tts/flows/{key}" in app.state.objects
+    assert await store.size(key) == os.path.getsize(src)
+
+    dest = tmp_path / "restored.wav"
+    assert await store.get_file(key, str(dest))
+    assert dest.read_bytes() == open(src, "rb").read()
+
+    # 静态访问：/static/artifacts/{key} 由后端代理到对象存储
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=store.asgi_app()), base_url="http://app") as client:
+        response = await client.get(f"/{key}")
+        assert response.status_code == 200 and response.content == dest.read_bytes()
+        assert (await client.get("/ab/cd/missing.wav")).status_code == 404
+
+    await store.delete(key)
+    assert await store.size(key) is None
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_s3_store_rejects_bad_credentials(tmp_path):
+    store = _s3_store(s3_standin.create_app(), secret_key="wrong")
+    with pytest.raises(httpx.HTTPStatusError):
+        await store.put_file(_write(tmp_path / "n.wav", b"RIFF"))
@@ -0,0 +1,37 @@
+import wave
+
+import pytest
+
+from app.utils import audio_encoder
+from app.utils.audio_encoder import available_profiles, encode_audio, normalize_profile
+
+
+def test_normalize_profile():
+    assert normalize_profile(None) == "wav"
+    assert normalize_profile("MP3") == "mp3"
+    with pytest.raises(ValueError):
+        normalize_profile("aac")
+
+
+def test_only_wav_is_available_without_ffmpeg(monkeypatch):
+    monkeypatch.setattr(audio_encoder, "ffmpeg_path", lambda: None)
+    assert available_profiles() == ["wav"]
+    with pytest.raises(Exception, match="ffmpeg"):
+        encode_audio("in.wav", "out.flac", "flac")
+
+
+@pytest.mark.skipif(not audio_encoder.ffmpeg_path(), reason="未安装ffmpeg")
+@pytest.mark.parametrize("profile", ["flac", "opus", "mp3"])
+def test_encode_audio(tmp_path, profile):
+    src = str(tmp_path / "in.wav")
+    with wave.open(src, "wb") as wavfile:
+        wavfile.setnchannels(1)
+        wavfile.setsampwidth(2)
+        wavfile.setframerate(24000)
+        wavfile.writeframes(b"\x00\x01" * 24000)
+    dest = tmp_path / f"out.{audio_encoder.profile_extension(profile)}"
+
+    encode_audio(src, str(dest), profile)
+
+    assert dest.stat().st_size > 0
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(["in.wav", dest.name])
@@ -0,0 +1,41 @@
+import wave
+
+from app.utils.audio_utils import SilenceSegment, concatenate_wav_files
+
+
+def _write_wav(path, frames, sample_rate=24000):
+    with wave.open(str(path), "wb") as wavfile:
+        wavfile.setnchannels(1)
+        wavfile.setsampwidth(2)
+        wavfile.setframerate(sample_rate)
+        wavfile.writeframes(frames)
+    return str(path)
+
+
+def test_concatenate_streams_blocks_in_order_and_skips_mismatched(tmp_path):
+    a = _write_wav(tmp_path / "a.wav", b"\x01\x00" * 1000)
+    b = _write_wav(tmp_path / "b.wav", b"\x02\x00" * 2500)
+    other_rate = _write_wav(tmp_path / "c.wav", b"\x03\x00" * 10, sample_rate=16000)
+    output = tmp_path / "tts_all.wav"
+
+    concatenate_wav_files([a, str(tmp_path / "missing.wav"), other_rate, b], str(output), block_frames=300)
+
+    with wave.open(str(output), "rb") as wavfile:
+        assert wavfile.getframerate() == 24000
+        assert wavfile.getnframes() == 3500
+        assert wavfile.readframes(3500) == b"\x01\x00" * 1000 + b"\x02\x00" * 2500
+
+
+def test_concatenate_writes_virtual_silence_segments(tmp_path):
+    a = _write_wav(tmp_path / "a.wav", b"\x01\x00" * 100)
+    output = tmp_path / "tts_all.wav"
+
+    concatenate_wav_files(
+        [SilenceSegment(50), a, SilenceSegment.from_duration(0.01, sample_rate=12000)],
+        str(output), block_frames=16
+    )
+
+    with wave.open(str(output), "rb") as wavfile:
+        # 12kHz下0.01秒=120帧，按24kHz输出换算为240帧
+        assert wavfile.getnframes() == 50 + 100 + 240
+        assert wavfile.readframes(390) == b"\0\0" * 50 + b"\x01\x00" * 100 + b"\0\0" * 240
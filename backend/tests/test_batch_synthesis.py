@@ -0,0 +1,117 @@
+import asyncio
+import json
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.constants import AppConstants
+from app.services import workflow_plan
+from app.services.batch_synthesis import BatchFlow, BatchSynthesisJob, FairShareScheduler, FlowShare
+from app.services.provider_governor import PlatformGovernor
+from app.services.synthesis_jobs import JobStatus, SynthesisJobManager
+from app.services.workflow_synthesizer import WorkflowSynthesizer
+
+from tests.test_workflow_synthesizer import _build_flow, _use_fresh_cache
+
+
+async def _hold(share, order, name, gate):
+    async with share:
+        order.append(name)
+        await gate.wait()
+
+
+@pytest.mark.asyncio
+async def test_slots_rotate_across_flows():
+    scheduler = FairShareScheduler(1)
+    order = []
+    blocker = asyncio.Event()
+    tasks = [asyncio.create_task(_hold(FlowShare(scheduler, "x", None), order, "x", blocker))]
+    await asyncio.sleep(0)
+
+    gate = asyncio.Event()
+    gate.set()
+    for flow_id, count in (("a", 3), ("b", 2)):
+        tasks += [asyncio.create_task(_hold(FlowShare(scheduler, flow_id, None), order, flow_id, gate)) for _ in range(count)]
+    await asyncio.sleep(0)
+    assert scheduler.stats()["waiting"] == 5 and scheduler.stats()["waitingFlows"] == 2
+
+    blocker.set()
+    await asyncio.gather(*tasks)
+    assert order == ["x", "a", "b", "a", "b", "a"]
+    assert scheduler.stats()["running"] == 0
+
+
+@pytest.mark.asyncio
+async def test_platform_limit_skips_full_platform():
+    scheduler = FairShareScheduler(4)
+    slow, fast = PlatformGovernor(1), PlatformGovernor(4)
+    order = []
+    gate = asyncio.Event()
+    tasks = [
+        asyncio.create_task(_hold(FlowShare(scheduler, flow_id, governor), order, flow_id, gate))
+        for flow_id, governor in (("a", slow), ("b", slow), ("c", fast), ("c", fast))
+    ]
+    await asyncio.sleep(0)
+
+    # 平台slow只有1个名额，b等待时c仍可获得名额
+    assert order == ["a", "c", "c"]
+    assert scheduler.stats()["running"] == 3 and scheduler.stats()["waiting"] == 1
+
+    # 取消等待中的节点不占用名额
+    tasks[1].cancel()
+    await asyncio.sleep(0)
+    assert scheduler.stats()["waiting"] == 0
+
+    gate.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    assert scheduler.stats()["running"] == 0
+
+
+@pytest.mark.asyncio
+async def test_batch_job_reports_progress_and_flow_completion(monkeypatch, tmp_path):
+    monkeypatch.setattr(AppConstants, "STATIC_DIR", str(tmp_path))
+    _use_fresh_cache(monkeypatch, tmp_path / "tts_cache")
+    monkeypatch.setattr(workflow_plan, "_plan_cache", OrderedDict())
+    scheduler = FairShareScheduler(2)
+    manager = SynthesisJobManager()
+    platform = SimpleNamespace(id="local-batch", type="local", config={"latency_ms": 0})
+
+    flows = []
+    for flow_id, texts in (("flowA", ["一", "二", "三"]), ("flowB", ["四"])):
+        flow = _build_flow(texts)
+        flow.id = flow_id
+        synthesizer = WorkflowSynthesizer(flow, SimpleNamespace(role_id="r1"), platform)
+        synthesizer.node_slots = scheduler.share(flow_id, platform, synthesizer.provider)
+        flows.append(BatchFlow(flow_id, job=manager.create(flow_id, synthesizer)))
+    flows.append(BatchFlow("missing", error="工作流不存在"))
+
+    batch = BatchSynthesisJob(flows)
+    batch.start()
+    events = [json.loads(e.split("\n", 1)[1][len("data: "):]) async for e in batch.stream()]
+
+    assert events[0]["type"] == "start"
+    flow_ends = {e["data"]["flowId"]: e["code"] for e in events if e["type"] == "flow_end"}
+    assert flow_ends == {"flowA": 0, "flowB": 0, "missing": 1}
+    end = events[-1]
+    assert end["type"] == "end" and end["code"] == 1 and end["data"]["failedFlowIds"] == ["missing"]
+    assert end["data"]["progress"]["completedFlows"] == 2 and end["data"]["progress"]["percentage"] == 100
+    assert batch.status == JobStatus.FAILED
+    assert scheduler.stats()["granted"] == 4 and scheduler.stats()["running"] == 0
+    assert batch.status_data()["flows"][0]["zipDownloadPath"] == "/static/tts_wav/flowA.zip"
+
+
+@pytest.mark.asyncio
+async def test_split_pieces_take_pool_slots(monkeypatch, tmp_path):
+    monkeypatch.setattr(AppConstants, "STATIC_DIR", str(tmp_path))
+    _use_fresh_cache(monkeypatch, tmp_path / "tts_cache")
+    monkeypatch.setattr(workflow_plan, "_plan_cache", OrderedDict())
+    # 工作池只有1个名额：切分节点的每一段单独排队，节点本身不占名额，不会互相等待
+    scheduler = FairShareScheduler(1)
+    platform = SimpleNamespace(id="local-split", type="local", config={"latency_ms": 0, "split_threshold": 4})
+    synthesizer = WorkflowSynthesizer(_build_flow(["一二三。四五六。七八九。", "十"]), SimpleNamespace(role_id="r1"), platform)
+    synthesizer.node_slots = scheduler.share("flow1", platform, synthesizer.provider)
+
+    events = [json.loads(e[len("data: "):]) async for e in synthesizer.synthesize_all()]
+    assert events[-1]["type"] == "end" and events[-1]["code"] == 0
+    assert scheduler.stats()["granted"] == 4 and scheduler.stats()["running"] == 0
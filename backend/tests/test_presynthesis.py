@@ -0,0 +1,64 @@
+import json
+import os
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.constants import AppConstants
+from app.services import synthesis_cache as cache_module
+from app.services import workflow_plan
+from app.services.presynthesis import Presynthesizer, changed_tts_nodes
+from app.services.workflow_synthesizer import WorkflowSynthesizer
+
+from tests.test_workflow_synthesizer import _build_flow, _use_fresh_cache
+
+
+def test_changed_nodes_ignore_whitespace_and_empty_text():
+    previous = _build_flow(["你好", "世界", "不变"]).flow_config
+    current = _build_flow(["你好 ", "世界。", "不变", "新增", " "]).flow_config
+
+    assert changed_tts_nodes(previous, current) == ["tts1", "tts3"]
+    assert changed_tts_nodes(None, current) == ["tts0", "tts1", "tts2", "tts3"]
+    assert changed_tts_nodes(current, previous) == ["tts1"]
+
+
+def test_saves_are_merged_and_disabled_by_default():
+    flow = _build_flow(["a", "b"])
+    Presynthesizer().flow_saved(flow)
+
+    presynthesizer = Presynthesizer(enabled=True)
+    presynthesizer.flow_saved(flow, _build_flow(["a", "x"]).flow_config)
+    presynthesizer.flow_saved(flow, _build_flow(["x", "b"]).flow_config)
+    assert presynthesizer.stats()["pendingFlows"] == 1 and presynthesizer.stats()["pendingNodes"] == 2
+
+    presynthesizer.discard(flow.id)
+    assert presynthesizer.stats()["pendingNodes"] == 0
+
+
+@pytest.mark.asyncio
+async def test_presynthesized_nodes_are_served_from_cache(monkeypatch, tmp_path, local_artifact_store):
+    monkeypatch.setattr(AppConstants, "STATIC_DIR", str(tmp_path))
+    _use_fresh_cache(monkeypatch, tmp_path / "tts_cache")
+    monkeypatch.setattr(workflow_plan, "_plan_cache", OrderedDict())
+    flow = _build_flow(["你好", "世界。"])
+    platform = SimpleNamespace(id="local-presynthesis", type="local", config={"latency_ms": 0})
+    voice = SimpleNamespace(role_id="r1")
+
+    presynthesizer = Presynthesizer(enabled=True)
+    await presynthesizer.presynthesize_nodes(WorkflowSynthesizer(flow, voice, platform), ["tts1"])
+    assert presynthesizer.stats()["synthesized"] == 1
+    assert os.listdir(tmp_path / "tts_parts" / "flow1") == []
+    assert flow.node_fingerprints == {}
+    # 预合成只写合成缓存，不保存到制品存储
+    assert local_artifact_store.stats()["puts"] == 0
+
+    await presynthesizer.presynthesize_nodes(WorkflowSynthesizer(flow, voice, platform), ["tts1"])
+    assert presynthesizer.stats()["skipped"] == 1
+
+    synthesizer = WorkflowSynthesizer(flow, voice, platform)
+    events = [json.loads(e[len("data: "):]) async for e in synthesizer.synthesize_all()]
+    assert events[-1]["type"] == "end" and events[-1]["code"] == 0
+    cached = [e for e in events if e["type"] == "node_task" and e["data"].get("status") == "使用缓存音频"]
+    assert [e["data"]["progress"]["currentNode"] for e in cached] == ["文本1"]
+    assert cache_module.synthesis_cache.stats()["hits"] == 1
@@ -0,0 +1,104 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import provider_governor as governor_module
+from app.services import tts_provider
+from app.services.provider_governor import PlatformGovernor, TokenBucket
+
+
+def test_token_bucket_spaces_requests():
+    bucket = TokenBucket(rate=10, burst=2)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+    assert bucket.reserve() == pytest.approx(0.2, abs=0.01)
+    assert TokenBucket(rate=0, burst=1).reserve() == 0
+
+
+@pytest.mark.asyncio
+async def test_governor_caps_concurrency_and_adapts():
+    governor = PlatformGovernor(max_concurrency=4)
+
+    async def request():
+        await governor.acquire()
+        await asyncio.sleep(0.01)
+        governor.release()
+
+    await asyncio.gather(*(request() for _ in range(20)))
+    assert governor.peak_inflight == 4
+    assert governor.inflight == 0
+
+    await governor.acquire()
+    governor.release(throttled=True)
+    assert governor.current_limit == 2
+    # 冷却期内的再次限流不会继续减半
+    await governor.acquire()
+    governor.release(throttled=True)
+    assert governor.current_limit == 2
+    for _ in range(10):
+        await governor.acquire()
+        governor.release()
+    assert governor.current_limit == 4
+
+
+class FlakyProvider(tts_provider.TTSProvider):
+    """前 throttles 次请求返回限流错误"""
+    type = "flaky"
+    throttle_codes = frozenset({42})
+
+    def __init__(self, throttles):
+        self.throttles = throttles
+        self.calls = 0
+
+    async def synthesize_stream(self, text, voice, platform, wav_path, relative_path):
+        self.calls += 1
+        if self.calls <= self.throttles:
+            yield {"data": "throttled", "type": "error", "end": True, "code": 42}
+            return
+        yield {"data": "", "type": "pcm", "end": False}
+        yield {"data": relative_path, "type": "wav_path", "end": True}
+
+
+async def _collect(provider, platform):
+    return [chunk async for chunk in provider.stream("text", None, platform, "w.wav", "r.wav")]
+
+
+@pytest.mark.asyncio
+async def test_waiter_cancelled_after_wake_returns_its_slot():
+    governor = PlatformGovernor(max_concurrency=1)
+    await governor.acquire()
+    woken = asyncio.create_task(governor.acquire())
+    queued = asyncio.create_task(governor.acquire())
+    await asyncio.sleep(0)
+
+    # 名额转交给第一个等待者后它立即被取消，名额应继续转交给下一个等待者
+    governor.release()
+    woken.cancel()
+    await asyncio.gather(woken, return_exceptions=True)
+    await asyncio.wait_for(queued, 1)
+    assert governor.inflight == 1
+    governor.release()
+    assert governor.inflight == 0
+
+
+@pytest.mark.asyncio
+async def test_stream_retries_when_throttled(monkeypatch):
+    registry = governor_module.ProviderGovernorRegistry()
+    monkeypatch.setattr(tts_provider, "provider_governor", registry)
+    platform = SimpleNamespace(id="p1", type="flaky", config={"throttle_backoff": 0})
+
+    provider = FlakyProvider(throttles=2)
+    chunks = await _collect(provider, platform)
+    assert [c["type"] for c in chunks] == ["pcm", "wav_path"]
+    assert provider.calls == 3
+    stats = registry.stats()["p1"]
+    assert stats["throttled"] == 2 and stats["inflight"] == 0
+
+    provider = FlakyProvider(throttles=10)
+    chunks = await _collect(provider, SimpleNamespace(
+        id="p2", type="flaky", config={"throttle_backoff": 0, "throttle_retries": 1}
+    ))
+    assert [c["type"] for c in chunks] == ["error"]
+    assert provider.calls == 2
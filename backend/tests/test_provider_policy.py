@@ -0,0 +1,119 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import provider_governor as governor_module
+from app.services import provider_policy as policy_module
+from app.services import tts_provider
+
+
+class ScriptedProvider(tts_provider.TTSProvider):
+    """按调用次数执行预设行为：'slow' 首包前长时间等待，'error500' 返回服务端错误，
+    'raise' 抛出连接异常，'broken' 返回部分音频后出错，'empty' 不返回任何数据，'late' 稍慢后正常返回，'ok' 正常返回"""
+    type = "scripted"
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.calls = 0
+
+    async def synthesize_stream(self, text, voice, platform, wav_path, relative_path):
+        action = self.script[min(self.calls, len(self.script) - 1)]
+        self.calls += 1
+        if action == "slow":
+            await asyncio.sleep(5)
+        if action == "error500":
+            yield {"data": "server error", "type": "error", "end": True, "code": 500}
+            return
+        if action == "raise":
+            raise ConnectionError("connection reset")
+        if action == "empty":
+            return
+        if action == "late":
+            await asyncio.sleep(0.2)
+        yield {"data": "", "type": "pcm", "end": False}
+        if action == "broken":
+            yield {"data": "broken", "type": "error", "end": True, "code": 500}
+            return
+        with open(wav_path, "w") as f:
+            f.write(f"call{self.calls}")
+        yield {"data": relative_path, "type": "wav_path", "end": True}
+
+
+@pytest.fixture(autouse=True)
+def fresh_registries(monkeypatch):
+    monkeypatch.setattr(tts_provider, "provider_governor", governor_module.ProviderGovernorRegistry())
+    registry = policy_module.LatencyRegistry()
+    monkeypatch.setattr(tts_provider, "latency_registry", registry)
+    return registry
+
+
+def _platform(**config):
+    return SimpleNamespace(id="p", type="scripted", config={"retry_backoff": 0, **config})
+
+
+async def _collect(provider, platform, wav_path, **kwargs):
+    return [c async for c in provider.stream("text", None, platform, str(wav_path), "r.wav", **kwargs)]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("script", [["slow", "ok"], ["error500", "ok"], ["raise", "ok"], ["empty", "ok"]])
+async def test_transient_failures_are_retried(tmp_path, script):
+    provider = ScriptedProvider(script)
+    chunks = await _collect(provider, _platform(first_chunk_timeout=0.05), tmp_path / "n.wav")
+    assert [c["type"] for c in chunks] == ["pcm", "wav_path"]
+    assert provider.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_retry_after_audio_requires_replayable(tmp_path):
+    provider = ScriptedProvider(["broken", "ok"])
+    chunks = await _collect(provider, _platform(), tmp_path / "n.wav")
+    assert [c["type"] for c in chunks] == ["pcm", "error"]
+
+    provider = ScriptedProvider(["broken", "ok"])
+    chunks = await _collect(provider, _platform(), tmp_path / "n.wav", replayable=True)
+    assert [c["type"] for c in chunks] == ["pcm", "pcm", "wav_path"]
+
+
+@pytest.mark.asyncio
+async def test_deadline_stops_retries(tmp_path):
+    provider = ScriptedProvider(["slow"])
+    start = time.monotonic()
+    chunks = await _collect(provider, _platform(), tmp_path / "n.wav", deadline=time.monotonic() + 0.1)
+    assert [c["type"] for c in chunks] == ["error"]
+    assert time.monotonic() - start < 1
+
+
+@pytest.mark.asyncio
+async def test_slow_request_is_hedged(tmp_path, fresh_registries):
+    tracker = fresh_registries.get(_platform())
+    for _ in range(policy_module.HEDGE_MIN_SAMPLES):
+        tracker.record(0.01)
+
+    provider = ScriptedProvider(["slow", "ok"])
+    wav_path = tmp_path / "n.wav"
+    start = time.monotonic()
+    chunks = await _collect(provider, _platform(hedge=True, platform_concurrency=2), wav_path)
+
+    assert [c["type"] for c in chunks] == ["pcm", "wav_path"]
+    assert time.monotonic() - start < 1
+    assert tracker.hedged == 1 and tracker.hedge_wins == 1
+    assert wav_path.read_text() == "call2"
+    assert not (tmp_path / "n.wav.hedge").exists()
+
+
+@pytest.mark.asyncio
+async def test_empty_hedge_does_not_win(tmp_path, fresh_registries):
+    tracker = fresh_registries.get(_platform())
+    for _ in range(policy_module.HEDGE_MIN_SAMPLES):
+        tracker.record(0.01)
+
+    provider = ScriptedProvider(["late", "empty"])
+    wav_path = tmp_path / "n.wav"
+    chunks = await _collect(provider, _platform(hedge=True, platform_concurrency=2), wav_path)
+
+    assert [c["type"] for c in chunks] == ["pcm", "wav_path"]
+    assert provider.calls == 2 and tracker.hedged == 1 and tracker.hedge_wins == 0
+    assert wav_path.exists() and not (tmp_path / "n.wav.hedge").exists()
@@ -0,0 +1,68 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.provider_pool import ProviderConnectionPool
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = b'{"code": 20000000}\n'
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_port}/"
+    srv.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_connections_are_reused_per_platform(server):
+    pool = ProviderConnectionPool()
+    platform = SimpleNamespace(id="p1", type="volcano", config={"pool_size": 2})
+
+    client = pool.get_client(platform)
+    for _ in range(3):
+        async with client.stream("POST", server, json={}) as response:
+            [line async for line in response.aiter_lines()]
+
+    assert pool.get_client(platform) is client
+    stats = pool.stats()["p1"]
+    assert (stats["requests"], stats["newConnections"], stats["reusedConnections"]) == (3, 1, 2)
+    assert stats["poolSize"] == 2
+
+    # 连接池配置变化时重建客户端
+    platform.config["pool_size"] = 4
+    assert pool.get_client(platform) is not client
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_replaced_client_stays_open_until_requests_finish(server):
+    pool = ProviderConnectionPool()
+    platform = SimpleNamespace(id="p1", type="volcano", config={"pool_size": 2})
+
+    async with pool.client(platform) as old:
+        platform.config["pool_size"] = 4
+        new = pool.get_client(platform)
+        assert new is not old and not old.is_closed
+        async with old.stream("POST", server, json={}) as response:
+            [line async for line in response.aiter_lines()]
+    await asyncio.gather(*pool._closing)
+    assert old.is_closed and not new.is_closed
+    await pool.close()
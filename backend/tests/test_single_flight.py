@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from app.services.single_flight import PCM_PLACEHOLDER, SingleFlight
+
+
+def _factory(calls, gate):
+    async def stream():
+        calls.append(1)
+        yield {"data": "a", "type": "pcm", "end": False}
+        await gate.wait()
+        yield {"data": "done", "type": "wav_path", "end": True}
+    return stream
+
+
+@pytest.mark.asyncio
+async def test_concurrent_subscribers_share_one_request():
+    flights, calls, gate = SingleFlight(), [], asyncio.Event()
+
+    async def consume():
+        return [chunk async for chunk in flights.stream("k", _factory(calls, gate))]
+
+    first = asyncio.create_task(consume())
+    await asyncio.sleep(0.01)
+    # 后来者从头回放已产生的chunk，已被读过的PCM只剩占位chunk
+    second = asyncio.create_task(consume())
+    await asyncio.sleep(0.01)
+    gate.set()
+
+    end = {"data": "done", "type": "wav_path", "end": True}
+    assert await first == [{"data": "a", "type": "pcm", "end": False}, end]
+    assert await second == [PCM_PLACEHOLDER, end]
+    assert len(calls) == 1
+    assert flights.stats() == {"started": 1, "coalesced": 1, "inflight": 0}
+
+
+@pytest.mark.asyncio
+async def test_request_is_cancelled_when_all_subscribers_leave():
+    flights, calls, gate = SingleFlight(), [], asyncio.Event()
+    stream = flights.stream("k", _factory(calls, gate))
+    assert (await stream.__anext__())["type"] == "pcm"
+    flight = flights._flights["k"]
+
+    await stream.aclose()
+    await asyncio.sleep(0)
+
+    assert flight.task.cancelled()
+    assert flights.inflight() == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_request_is_not_joined():
+    flights, calls, gate = SingleFlight(), [], asyncio.Event()
+    stream = flights.stream("k", _factory(calls, gate))
+    await stream.__anext__()
+    flight = flights._flights["k"]
+    await stream.aclose()
+
+    # 取消尚未生效时加入的订阅者发起新的请求
+    gate.set()
+    chunks = [chunk async for chunk in flights.stream("k", _factory(calls, gate))]
+    with pytest.raises(asyncio.CancelledError):
+        await flight.task
+
+    assert chunks[-1]["type"] == "wav_path"
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_pcm_is_dropped_once_read():
+    flights, calls, gate = SingleFlight(), [], asyncio.Event()
+    reader = flights.stream("k", _factory(calls, gate))
+    observer = flights.stream("k", _factory(calls, gate), keep_pcm=False)
+    assert (await reader.__anext__())["data"] == "a"
+    flight = flights._flights["k"]
+    assert flight.chunks[0]["data"] == "a"  # 读取者尚未读完这一批
+
+    next_chunk = asyncio.create_task(reader.__anext__())
+    await asyncio.sleep(0.01)
+    assert flight.chunks[0] is PCM_PLACEHOLDER
+    assert await observer.__anext__() == PCM_PLACEHOLDER
+
+    gate.set()
+    assert (await next_chunk)["type"] == "wav_path"
+    assert (await observer.__anext__())["type"] == "wav_path"
+
+
+@pytest.mark.asyncio
+async def test_errors_become_error_chunks():
+    flights = SingleFlight()
+
+    async def failing():
+        raise RuntimeError("boom")
+        yield
+
+    assert [chunk async for chunk in flights.stream("k", failing)] == [
+        {"data": "boom", "type": "error", "end": True}
+    ]
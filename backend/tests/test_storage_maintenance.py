@@ -0,0 +1,124 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.constants import AppConstants
+from app.services import synthesis_cache as cache_module
+from app.services.artifact_store import artifact_url
+from app.services.storage_maintenance import StorageMaintainer, remove_flow_files
+
+
+def _write(path, size, mtime=None):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return path
+
+
+def _flow(flow_id, nodes, fingerprints=None):
+    config = {"logicList": [{"nodes": [
+        {"id": node_id, "properties": {"name": name, "nodeContentData": {}}} for node_id, name in nodes
+    ]}]}
+    return SimpleNamespace(id=flow_id, flow_config=config, node_fingerprints=fingerprints or {})
+
+
+@pytest.fixture
+def static_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(AppConstants, "STATIC_DIR", str(tmp_path / "static"))
+    monkeypatch.setattr(
+        cache_module, "synthesis_cache", cache_module.SynthesisCache(str(tmp_path / "static" / "tts_cache"), 10 * 1024 ** 2)
+    )
+    return tmp_path / "static"
+
+
+@pytest.mark.asyncio
+async def test_orphans_are_collected(static_dir, tmp_path, local_artifact_store):
+    wav = static_dir / "tts_wav"
+    kept = [
+        _write(wav / "f1" / "n1.wav", 10),
+        _write(wav / "f1" / "n3_旧版本.wav", 10),
+        _write(wav / "f1" / "tts_all.wav", 10),
+        _write(wav / "f1.zip", 10),
+    ]
+    removed = [
+        _write(wav / "f1" / "n2.wav", 10),
+        _write(wav / "f1" / "n1_开场.wav", 10),
+        _write(wav / "gone" / "n1_a.wav", 10),
+        _write(wav / "gone_flac.zip", 10),
+        _write(static_dir / "tts_parts" / "gone" / "n1_a_0.wav", 10),
+    ]
+    referenced = await local_artifact_store.put_file(_write(tmp_path / "a.wav", 20))
+    unreferenced = await local_artifact_store.put_file(_write(tmp_path / "b.wav", 30))
+    # 旧版本按节点名命名的文件在节点指纹仍引用时保留
+    flows = [_flow("f1", [("n1", "开场"), ("n3", "旧版本")], {
+        "n1": {"audioUrl": artifact_url(referenced)},
+        "n3": {"audioUrl": "tts_wav/f1/n3_旧版本.wav"},
+    })]
+
+    result = StorageMaintainer(grace_seconds=0).run_once(flows)
+
+    assert all(os.path.exists(path) for path in kept)
+    assert not any(os.path.exists(path) for path in removed)
+    assert await local_artifact_store.size(referenced) == 20
+    assert await local_artifact_store.size(unreferenced) is None
+    assert result == {"bytes": 60, "orphanBytes": 80, "evictedBytes": 0}
+
+
+def test_grace_period_protects_recent_files(static_dir):
+    path = _write(static_dir / "tts_wav" / "gone" / "n1_a.wav", 10)
+    StorageMaintainer(grace_seconds=3600).run_once([])
+    assert os.path.exists(path)
+
+
+def test_quota_evicts_least_recently_used_flows(static_dir):
+    wav = static_dir / "tts_wav"
+    flows = [_flow(flow_id, [("n1", "a")]) for flow_id in ("old", "mid", "new", "busy")]
+    _write(wav / "old" / "n1.wav", 100, mtime=1000)
+    _write(wav / "old.zip", 100, mtime=1000)
+    _write(wav / "busy" / "n1.wav", 100, mtime=1500)
+    _write(wav / "mid" / "n1.wav", 100, mtime=2000)
+    _write(wav / "new" / "n1.wav", 100, mtime=3000)
+    maintainer = StorageMaintainer(quota_bytes=250, grace_seconds=0)
+
+    result = maintainer.run_once(flows, running_flow_ids=["busy"])
+
+    assert sorted(os.listdir(wav)) == ["busy", "new"]
+    assert result["evictedBytes"] == 300
+    assert maintainer.stats()["bytes"] == 200
+    assert maintainer.stats()["evictions"] == 2
+
+
+@pytest.mark.asyncio
+async def test_quota_counts_cache_and_keeps_referenced_artifacts(static_dir, tmp_path, local_artifact_store):
+    cache = cache_module.synthesis_cache
+    cache.store("old", _write(tmp_path / "old.wav", 100))
+    cache.store("recent", _write(tmp_path / "recent.wav", 100))
+    os.utime(cache._path("old"), (1000, 1000))
+    work_file = _write(static_dir / "tts_wav" / "f1" / "n1.wav", 100, mtime=500)
+    os.utime(static_dir / "tts_wav" / "f1", (500, 500))
+    referenced = await local_artifact_store.put_file(_write(tmp_path / "a.wav", 100))
+    flows = [_flow("f1", [("n1", "a")], {"n1": {"audioUrl": artifact_url(referenced)}})]
+    maintainer = StorageMaintainer(quota_bytes=250, grace_seconds=60)
+
+    result = maintainer.run_once(flows)
+
+    # 未被引用的缓存条目先于更旧的工作文件淘汰；宽限期内写入的缓存条目与被引用的制品保留
+    assert not cache.contains("old") and cache.contains("recent")
+    assert not os.path.exists(work_file)
+    assert await local_artifact_store.size(referenced) == 100
+    assert result == {"bytes": 200, "orphanBytes": 0, "evictedBytes": 200}
+    assert maintainer.stats()["cache"] == 100 and cache.stats()["bytes"] == 100
+
+
+def test_remove_flow_files(static_dir):
+    _write(static_dir / "tts_wav" / "f1" / "n1_a.wav", 10)
+    _write(static_dir / "tts_wav" / "f1.zip", 10)
+    _write(static_dir / "tts_wav" / "f1_mp3.zip", 10)
+    _write(static_dir / "tts_parts" / "f1" / "n1_a_0.wav", 10)
+    other = _write(static_dir / "tts_wav" / "f2.zip", 10)
+
+    assert remove_flow_files("f1") == 40
+    assert os.listdir(static_dir / "tts_wav") == ["f2.zip"] and os.path.exists(other)
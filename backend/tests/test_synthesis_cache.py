@@ -0,0 +1,127 @@
+import asyncio
+import os
+import wave
+
+import pytest
+
+from app.services import synthesis_cache as cache_module
+from app.services.synthesis_cache import SynthesisCache
+
+
+def _write(path, size):
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    return str(path)
+
+
+def test_key_normalizes_text_and_separates_voices():
+    params = {"format": "pcm", "sample_rate": 24000}
+    key = SynthesisCache.make_key("volcano", "r1", "你好，世界", params)
+
+    assert key == SynthesisCache.make_key("volcano", "r1", "  你好,世界 ", params)
+    assert key != SynthesisCache.make_key("volcano", "r2", "你好，世界", params)
+    assert key != SynthesisCache.make_key("volcano", "r1", "你好，世界", {**params, "sample_rate": 16000})
+
+
+def test_lookup_counts_hits_and_misses(tmp_path):
+    cache = SynthesisCache(str(tmp_path / "cache"), 1000)
+    cache.store("a", _write(tmp_path / "a.wav", 10))
+
+    assert cache.lookup("a")
+    assert cache.lookup("b") is None
+    assert cache.restore("a", str(tmp_path / "out" / "a.wav"))
+    assert os.path.getsize(tmp_path / "out" / "a.wav") == 10
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["bytes"]) == (2, 1, 10)
+
+
+def test_evicts_least_recently_used_when_over_limit(tmp_path):
+    cache = SynthesisCache(str(tmp_path / "cache"), 250)
+    for key in ("a", "b"):
+        cache.store(key, _write(tmp_path / f"{key}.wav", 100))
+    cache.lookup("a")
+    cache.store("c", _write(tmp_path / "c.wav", 100))
+
+    assert cache.lookup("b") is None
+    assert cache.lookup("a") and cache.lookup("c")
+    assert cache.stats()["evictions"] == 1
+
+    # 重启后从磁盘恢复索引
+    reloaded = SynthesisCache(str(tmp_path / "cache"), 250)
+    assert reloaded.stats()["entries"] == 2
+
+
+@pytest.mark.asyncio
+async def test_identical_inflight_requests_are_coalesced(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_module, "synthesis_cache", SynthesisCache(str(tmp_path / "cache"), 10 * 1024 ** 2))
+    calls = []
+
+    def factory(wav_path, relative_path):
+        async def stream():
+            calls.append(wav_path)
+            await asyncio.sleep(0.01)
+            yield {"data": "AAAA", "type": "pcm", "end": False}
+            with wave.open(wav_path, "wb") as wavfile:
+                wavfile.setnchannels(1)
+                wavfile.setsampwidth(2)
+                wavfile.setframerate(24000)
+                wavfile.writeframes(b"\x00\x00" * 100)
+            yield {"data": relative_path, "type": "wav_path", "end": True}
+        return stream
+
+    async def request(name):
+        wav_path = str(tmp_path / f"{name}.wav")
+        return [c async for c in cache_module.cached_tts_stream("k", factory(wav_path, name), wav_path, name)]
+
+    first, second = await asyncio.gather(request("n1"), request("n2"))
+
+    assert len(calls) == 1
+    # 两个节点得到相同内容，指向同一个制品
+    assert first[-1] == second[-1]
+    assert first[-1]["data"].startswith("artifacts/")
+    assert first[0] == second[0]
+    assert (tmp_path / "n1.wav").read_bytes() == (tmp_path / "n2.wav").read_bytes()
+
+
+@pytest.mark.asyncio
+async def test_cache_hits_reuse_published_artifact(tmp_path, monkeypatch, local_artifact_store):
+    monkeypatch.setattr(cache_module, "synthesis_cache", SynthesisCache(str(tmp_path / "cache"), 1024 ** 2))
+    puts = []
+    put_file = local_artifact_store.put_file
+
+    async def counting_put(src_path):
+        puts.append(src_path)
+        return await put_file(src_path)
+    monkeypatch.setattr(local_artifact_store, "put_file", counting_put)
+
+    async def stream():
+        (tmp_path / "n1.wav").write_bytes(b"RIFF-audio")
+        yield {"data": "n1", "type": "wav_path", "end": True}
+
+    async def request(name):
+        wav_path = str(tmp_path / f"{name}.wav")
+        return [c async for c in cache_module.cached_tts_stream("k", stream, wav_path, name)][-1]
+
+    first = await request("n1")
+    # 缓存命中时直接复用已保存的制品，不再计算哈希与上传
+    assert await request("n2") == {**first, "cached": True}
+    assert await request("n3") == {**first, "cached": True}
+    assert len(puts) == 1
+
+    # 制品被删除后重新保存
+    await local_artifact_store.delete(first["data"][len("artifacts/"):])
+    assert await request("n4") == {**first, "cached": True}
+    assert len(puts) == 2
+
+
+def test_restore_treats_concurrently_evicted_entry_as_miss(tmp_path, monkeypatch):
+    cache = SynthesisCache(str(tmp_path / "cache"), 1024 ** 2)
+    src = tmp_path / "a.wav"
+    src.write_bytes(b"RIFF")
+    cache.store("k", str(src))
+
+    def evicted(*args):
+        raise FileNotFoundError(args[0])
+    monkeypatch.setattr(cache_module.shutil, "copyfile", evicted)
+    assert cache.restore("k", str(tmp_path / "out" / "a.wav")) is False
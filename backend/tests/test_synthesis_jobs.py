@@ -0,0 +1,166 @@
+import asyncio
+import json
+import wave
+
+import pytest
+
+from app.services import synthesis_jobs
+from app.services.synthesis_jobs import JobStatus, SynthesisJobManager, parse_last_event_id
+from app.services.workflow_synthesizer import ChunkEvent
+from app.utils.audio_utils import SilenceSegment
+
+
+class FakeSynthesizer:
+    """按顺序产生事件，可用 gate 控制进度"""
+    def __init__(self, count, end_code=0):
+        self.count = count
+        self.end_code = end_code
+        self.gate = asyncio.Event()
+        self.audio_files = []
+
+    def _get_progress_data(self, current_node_name=""):
+        return {"processed": 0, "total": self.count}
+
+    async def synthesize_all(self):
+        for i in range(self.count):
+            if i == 2:
+                await self.gate.wait()
+            yield f"data: {json.dumps({'data': {'i': i}, 'code': 0, 'type': 'node'})}\n\n"
+        yield f"data: {json.dumps({'data': {'error': 'x'} if self.end_code else {}, 'code': self.end_code, 'type': 'end'})}\n\n"
+
+
+def _ids(events):
+    return [int(e.split("\n", 1)[0][len("id: "):]) for e in events]
+
+
+@pytest.mark.asyncio
+async def test_client_can_detach_and_reattach_with_last_event_id():
+    manager = SynthesisJobManager()
+    synthesizer = FakeSynthesizer(4)
+    job = manager.create("flow1", synthesizer)
+
+    # 第一次连接：收到两个事件后断开
+    first = []
+    async for event in job.stream():
+        first.append(event)
+        if len(first) == 2:
+            break
+    assert _ids(first) == [0, 1]
+    assert job.status == JobStatus.RUNNING
+
+    synthesizer.gate.set()
+    resumed = [event async for event in job.stream(last_event_id=1)]
+    assert _ids(resumed) == [2, 3, 4]
+    assert job.status == JobStatus.COMPLETED
+    assert manager.latest_for_flow("flow1") is job
+    assert job.status_data()["eventCount"] == 5
+
+
+@pytest.mark.asyncio
+async def test_failed_end_event_marks_job_failed():
+    synthesizer = FakeSynthesizer(1, end_code=1)
+    job = SynthesisJobManager().create("flow1", synthesizer)
+    [event async for event in job.stream()]
+
+    assert job.status == JobStatus.FAILED
+    assert job.error == "x"
+
+
+@pytest.mark.asyncio
+async def test_cancel_stops_running_job():
+    job = SynthesisJobManager().create("flow1", FakeSynthesizer(4))
+    await asyncio.sleep(0)
+    job.cancel()
+    events = [event async for event in job.stream()]
+
+    assert _ids(events) == [0, 1]
+    assert job.status == JobStatus.CANCELLED
+
+
+class AudioSynthesizer(FakeSynthesizer):
+    """每个事件前追加一个片段：留白、wav文件交替"""
+    def __init__(self, tmp_path, count):
+        super().__init__(count)
+        self.tmp_path = tmp_path
+
+    async def synthesize_all(self):
+        for i in range(self.count):
+            if i == 2:
+                await self.gate.wait()
+            if i % 2:
+                path = str(self.tmp_path / f"{i}.wav")
+                with wave.open(path, "wb") as wavfile:
+                    wavfile.setnchannels(1)
+                    wavfile.setsampwidth(2)
+                    wavfile.setframerate(16000)
+                    wavfile.writeframes(bytes([i]) * 200)
+                self.audio_files.append(path)
+            else:
+                self.audio_files.append(SilenceSegment(50, sample_rate=8000))
+            yield f"data: {json.dumps({'data': {'i': i}, 'code': 0, 'type': 'node'})}\n\n"
+        yield f"data: {json.dumps({'data': {}, 'code': 0, 'type': 'end'})}\n\n"
+
+
+@pytest.mark.asyncio
+async def test_audio_stream_plays_completed_segments_in_order(tmp_path):
+    synthesizer = AudioSynthesizer(tmp_path, 4)
+    job = SynthesisJobManager().create("flow1", synthesizer)
+    stream = job.audio_stream()
+
+    # 前两个片段完成后即可开始播放：头部参数取自第一个wav文件
+    header = await stream.__anext__()
+    assert header[:4] == b"RIFF" and header[36:40] == b"data" and len(header) == 44
+    assert int.from_bytes(header[24:28], "little") == 16000
+    assert await stream.__anext__() == bytes(200)  # 留白按16kHz换算为100帧
+    assert await stream.__anext__() == bytes([1]) * 200
+    assert job.status == JobStatus.RUNNING
+
+    synthesizer.gate.set()
+    rest = b"".join([block async for block in stream])
+    assert rest == bytes(200) + bytes([3]) * 200
+    assert job.status == JobStatus.COMPLETED
+
+
+@pytest.mark.asyncio
+async def test_second_request_attaches_to_running_job():
+    manager = SynthesisJobManager()
+    job = manager.create_or_attach("flow1", FakeSynthesizer(4))
+
+    assert manager.create_or_attach("flow1", FakeSynthesizer(4)) is job
+    assert manager.create_or_attach("flow2", FakeSynthesizer(1)) is not job
+
+    job.synthesizer.gate.set()
+    [event async for event in job.stream()]
+    assert manager.create_or_attach("flow1", FakeSynthesizer(1)) is not job
+
+
+class ChunkingSynthesizer(FakeSynthesizer):
+    """每个节点之后产生大量重复进度事件"""
+    async def synthesize_all(self):
+        for i in range(self.count):
+            yield f"data: {json.dumps({'data': {'i': i}, 'code': 0, 'type': 'node'})}\n\n"
+            for _ in range(10):
+                yield ChunkEvent(f"data: {json.dumps({'data': {'chunk': i}, 'code': 0, 'type': 'node_task'})}\n\n")
+        yield f"data: {json.dumps({'data': {}, 'code': 0, 'type': 'end'})}\n\n"
+
+
+@pytest.mark.asyncio
+async def test_replay_log_keeps_only_recent_chunk_events(monkeypatch):
+    monkeypatch.setattr(synthesis_jobs, "MAX_REPLAY_CHUNK_EVENTS", 5)
+    job = SynthesisJobManager().create("flow1", ChunkingSynthesizer(3))
+    await job._task
+
+    replayed = [event async for event in job.stream()]
+    ids = _ids(replayed)
+    types = [json.loads(e.split("data: ", 1)[1])["type"] for e in replayed]
+    # 节点与结束事件全部保留，重复进度事件只保留最近5个，事件ID保持不变
+    assert types.count("node") == 3 and types.count("node_task") == 5 and types[-1] == "end"
+    assert ids[-1] == len(job.events) - 1 == 33
+    assert ids[:3] == [0, 11, 22]
+    assert sum(event is not None for event in job.events) == 9
+
+
+def test_parse_last_event_id():
+    assert parse_last_event_id("12") == 12
+    assert parse_last_event_id("") is None
+    assert parse_last_event_id("abc") is None
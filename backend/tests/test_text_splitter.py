@@ -0,0 +1,27 @@
+from app.utils.text_splitter import split_text
+
+
+def test_short_text_is_not_split():
+    assert split_text("你好。", 10) == ["你好。"]
+    assert split_text("  ", 10) == []
+    assert split_text("很长的文本" * 10, 0) == ["很长的文本" * 10]
+
+
+def test_split_prefers_sentence_boundaries():
+    text = "第一句话。第二句话！“第三句？”第四句"
+    pieces = split_text(text, 12)
+    assert pieces == ["第一句话。第二句话！", "“第三句？”第四句"]
+    assert "".join(pieces) == text
+
+
+def test_long_sentence_falls_back_to_clauses_and_hard_cut():
+    text = "短句，" + "长" * 25 + "。"
+    pieces = split_text(text, 10)
+    assert all(len(piece) <= 10 for piece in pieces)
+    assert pieces[0] == "短句，"
+    assert "".join(pieces) == text
+
+
+def test_punctuation_only_pieces_are_merged_or_dropped():
+    assert split_text("一二三四五。……", 6) == ["一二三四五。"]
+    assert split_text("一二三。……", 6) == ["一二三。……"]
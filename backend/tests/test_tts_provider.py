@@ -0,0 +1,36 @@
+from types import SimpleNamespace
+
+from app.services import tts_provider
+from app.services.tts_local import render_pcm
+
+
+def test_builtin_providers_are_registered():
+    types = {item["type"] for item in tts_provider.list_providers()}
+    assert {"volcano", "local"} <= types
+    assert tts_provider.get_provider("unknown") is None
+
+
+def test_max_concurrency_is_capped_by_capabilities():
+    provider = tts_provider.get_provider("volcano")
+    platform = SimpleNamespace(config={"max_concurrency": 1000})
+    assert provider.max_concurrency(platform) == provider.capabilities.max_concurrency
+    assert provider.max_concurrency(SimpleNamespace(config={"max_concurrency": "x"})) == 1
+
+
+def test_cache_key_depends_on_platform_and_local_config():
+    local = tts_provider.get_provider("local")
+    volcano = tts_provider.get_provider("volcano")
+    voice = SimpleNamespace(role_id="r1")
+    local_platform = SimpleNamespace(type="local", config={})
+    assert local.cache_key(local_platform, voice, "你好") != volcano.cache_key(
+        SimpleNamespace(type="volcano", config={}), voice, "你好"
+    )
+    assert local.cache_key(local_platform, voice, "你好") != local.cache_key(
+        SimpleNamespace(type="local", config={"char_seconds": 0.5}), voice, "你好"
+    )
+
+
+def test_local_pcm_is_deterministic():
+    assert render_pcm("你好，世界", "r1") == render_pcm("你好，世界", "r1")
+    assert render_pcm("你好，世界", "r1") != render_pcm("你好，世界", "r2")
+    assert len(render_pcm("你好", "r1", char_seconds=0.1)) == 2 * 2400 * 2
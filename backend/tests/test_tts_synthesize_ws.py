@@ -0,0 +1,70 @@
+import json
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1 import tts_synthesize
+from app.core.constants import AppConstants
+from app.services import synthesis_cache as cache_module
+from app.services.tts_flow_service import TTSFlowService
+from app.services.tts_provider import get_provider
+
+
+def _client(monkeypatch, tmp_path):
+    monkeypatch.setattr(AppConstants, "STATIC_DIR", str(tmp_path))
+    monkeypatch.setattr(
+        cache_module, "synthesis_cache", cache_module.SynthesisCache(str(tmp_path / "tts_cache"), 10 * 1024 ** 2)
+    )
+    platform = SimpleNamespace(type="local", config={"latency_ms": 0})
+    context = (SimpleNamespace(id="flow1"), SimpleNamespace(role_id="r1"), platform, get_provider("local"))
+
+    async def load(flow_id):
+        return (context, None) if flow_id == "flow1" else (None, "flow not found")
+
+    async def set_node_fingerprint(*args):
+        pass
+
+    monkeypatch.setattr(tts_synthesize, "_load_synthesis_context", load)
+    monkeypatch.setattr(TTSFlowService, "set_node_fingerprint", set_node_fingerprint)
+    app = FastAPI()
+    app.include_router(tts_synthesize.router)
+    return TestClient(app)
+
+
+def _receive_until_done(ws):
+    frames = []
+    while True:
+        message = ws.receive()
+        if message.get("bytes") is not None:
+            frames.append(message["bytes"])
+            continue
+        frames.append(json.loads(message["text"]))
+        if frames[-1]["type"] in ("end", "error"):
+            return frames
+
+
+def test_websocket_streams_binary_pcm(monkeypatch, tmp_path):
+    request = {"flow_id": "flow1", "text": "你好", "node_id": "n1", "node_name": "节点"}
+    with _client(monkeypatch, tmp_path).websocket_connect("/tts-synthesize/ws") as ws:
+        ws.send_json(request)
+        frames = _receive_until_done(ws)
+        # 同一连接继续请求：命中合成缓存，PCM同样以二进制帧回放
+        ws.send_json(request)
+        replay = _receive_until_done(ws)
+
+    assert frames[0]["type"] == "start" and frames[0]["sampleRate"] == 24000
+    assert frames[-1]["type"] == "end" and frames[-1]["wavPath"].startswith("artifacts/")
+    pcm = b"".join(frames[1:-1])
+    assert len(pcm) == 2 * 2 * 4800
+    with open(tmp_path / "tts_wav" / "flow1" / "n1.wav", "rb") as f:
+        assert f.read()[44:] == pcm
+    assert b"".join(replay[1:-1]) == pcm
+
+
+def test_websocket_reports_errors_and_keeps_connection(monkeypatch, tmp_path):
+    with _client(monkeypatch, tmp_path).websocket_connect("/tts-synthesize/ws") as ws:
+        ws.send_json({"flow_id": "missing", "text": "你好", "node_id": "n1", "node_name": "节点"})
+        assert ws.receive_json() == {"type": "error", "data": "flow not found", "nodeId": "n1"}
+        ws.send_json({"text": "缺少字段"})
+        assert ws.receive_json()["type"] == "error"
@@ -0,0 +1,99 @@
+import base64
+import json
+import wave
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.services import provider_pool as pool_module
+from app.services import tts_volcano
+
+
+def _patch_transport(monkeypatch, handler):
+    client_cls = httpx.AsyncClient
+    monkeypatch.setattr(
+        pool_module.httpx, "AsyncClient",
+        lambda **kwargs: client_cls(transport=httpx.MockTransport(handler), **kwargs)
+    )
+    monkeypatch.setattr(tts_volcano, "provider_pool", pool_module.ProviderConnectionPool())
+
+
+@pytest.mark.asyncio
+async def test_stream_yields_pcm_chunks_and_saves_wav(monkeypatch, tmp_path):
+    pcm = [b"\x01\x00" * 10, b"\x02\x00" * 20]
+
+    def handler(request):
+        assert json.loads(request.content)["req_params"]["speaker"] == "role"
+        lines = [json.dumps({"code": 0, "data": base64.b64encode(p).decode()}) for p in pcm]
+        lines.append(json.dumps({"code": 20000000, "message": "ok"}))
+        return httpx.Response(200, content="\n".join(lines).encode())
+
+    _patch_transport(monkeypatch, handler)
+    wav_path = tmp_path / "n.wav"
+    chunks = [chunk async for chunk in tts_volcano.tts_volcano_stream(
+        text="你好",
+        voice=SimpleNamespace(role_id="role"),
+        platform=SimpleNamespace(config={}),
+        wav_path=str(wav_path),
+        relative_path="tts_wav/f/n.wav",
+    )]
+
+    assert [c["type"] for c in chunks] == ["pcm", "pcm", "wav_path"]
+    assert chunks[-1]["data"] == "tts_wav/f/n.wav"
+    with wave.open(str(wav_path), "rb") as wavfile:
+        assert wavfile.readframes(wavfile.getnframes()) == b"".join(pcm)
+
+
+@pytest.mark.asyncio
+async def test_stream_stops_on_error_code(monkeypatch, tmp_path):
+    _patch_transport(monkeypatch, lambda request: httpx.Response(
+        200, content=json.dumps({"code": 45000000, "message": "bad"}).encode()
+    ))
+    wav_path = tmp_path / "n.wav"
+    chunks = [chunk async for chunk in tts_volcano.tts_volcano_stream(
+        text="你好",
+        voice=SimpleNamespace(role_id="role"),
+        platform=SimpleNamespace(config={}),
+        wav_path=str(wav_path),
+        relative_path="tts_wav/f/n.wav",
+    )]
+
+    assert [c["type"] for c in chunks] == ["error"]
+    assert not wav_path.exists()
+
+
+def _feed_in_pieces(decoder, raw, size):
+    frames = []
+    for start in range(0, len(raw), size):
+        frames.extend(decoder.feed(raw[start:start + size]))
+    return frames + decoder.flush()
+
+
+def test_decoder_handles_arbitrary_chunk_boundaries():
+    pcm = [bytes(range(256)) * 3, b"\x05\x00" * 333]
+    lines = [json.dumps({"code": 0, "message": "", "data": base64.b64encode(p).decode()}) for p in pcm]
+    lines.append(json.dumps({"code": 20000000, "message": "ok", "data": None}))
+    raw = "\n".join(lines).encode()
+
+    for size in (1, 7, 64, len(raw)):
+        decoder = tts_volcano.VolcanoStreamDecoder()
+        frames = _feed_in_pieces(decoder, raw, size)
+        assert [code for code, _, _ in frames] == [0, 0, 20000000]
+        assert [b64 for _, b64, _ in frames[:2]] == [base64.b64encode(p).decode() for p in pcm]
+        assert bytes(decoder.audio.getbuffer()) == b"".join(pcm)
+
+
+def test_decoder_falls_back_to_json_for_escaped_data():
+    b64 = base64.b64encode(b"\xff\xff\xff\x01").decode()
+    line = '{"code": 0, "data": "%s"}' % b64.replace("/", "\\/")
+    decoder = tts_volcano.VolcanoStreamDecoder()
+    frames = decoder.feed(line.encode() + b"\n")
+    assert frames[0][:2] == (0, b64)
+    assert bytes(decoder.audio.getbuffer()) == b"\xff\xff\xff\x01"
+
+
+def test_decoder_returns_error_lines_as_dict():
+    decoder = tts_volcano.VolcanoStreamDecoder()
+    frames = decoder.feed(b'{"code": 45000000, "message": "bad"}\n')
+    assert frames == [(45000000, None, {"code": 45000000, "message": "bad"})]
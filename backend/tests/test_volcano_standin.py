@@ -0,0 +1,60 @@
+import importlib.util
+import os
+import wave
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.services import provider_pool as pool_module
+from app.services import tts_volcano
+from app.services.tts_local import render_pcm
+
+_STANDIN_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "benchmarks", "volcano_standin.py")
+_spec = importlib.util.spec_from_file_location("volcano_standin", _STANDIN_PATH)
+standin = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(standin)
+
+ENDPOINT = "http://standin" + standin.TTS_PATH
+
+
+def _use_standin(monkeypatch, options):
+    app = standin.create_app(options)
+    client_cls = httpx.AsyncClient
+    monkeypatch.setattr(
+        pool_module.httpx, "AsyncClient",
+        lambda **kwargs: client_cls(transport=httpx.ASGITransport(app=app), **kwargs)
+    )
+    monkeypatch.setattr(tts_volcano, "provider_pool", pool_module.ProviderConnectionPool())
+
+
+async def _synthesize(tmp_path):
+    wav_path = tmp_path / "n.wav"
+    chunks = [chunk async for chunk in tts_volcano.tts_volcano_stream(
+        text="你好，世界",
+        voice=SimpleNamespace(role_id="role"),
+        platform=SimpleNamespace(config={"endpoint": ENDPOINT}),
+        wav_path=str(wav_path),
+        relative_path="tts_wav/f/n.wav",
+    )]
+    return chunks, wav_path
+
+
+@pytest.mark.asyncio
+async def test_volcano_stream_against_standin(monkeypatch, tmp_path):
+    _use_standin(monkeypatch, standin.StandinOptions(first_chunk_ms=0, chunk_ms=0, chunk_seconds=0.1))
+    chunks, wav_path = await _synthesize(tmp_path)
+
+    assert [c["type"] for c in chunks] == ["pcm"] * 10 + ["wav_path"]
+    with wave.open(str(wav_path), "rb") as wavfile:
+        assert wavfile.readframes(wavfile.getnframes()) == render_pcm("你好，世界", "role")
+
+
+@pytest.mark.asyncio
+async def test_standin_injected_error(monkeypatch, tmp_path):
+    _use_standin(monkeypatch, standin.StandinOptions(first_chunk_ms=0, error_rate=1, error_code=55000000))
+    chunks, wav_path = await _synthesize(tmp_path)
+
+    assert [c["type"] for c in chunks] == ["error"]
+    assert "55000000" in chunks[0]["data"]
+    assert not wav_path.exists()
@@ -0,0 +1,466 @@
+import asyncio
+import json
+from collections import OrderedDict
+import os
+import shutil
+import wave
+import zipfile
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.constants import AppConstants
+from app.services import synthesis_cache as cache_module
+from app.services import tts_volcano
+from app.services import workflow_plan
+from app.services import workflow_synthesizer as ws
+from app.services.workflow_synthesizer import WorkflowSynthesizer
+
+
+class FakeFlow:
+    """代替数据库中的工作流文档"""
+    def __init__(self, flow_config):
+        self.id = "flow1"
+        self.flow_config = flow_config
+        self.node_fingerprints = {}
+        self.updated_at = 0
+
+    async def set(self, expression):
+        # 记录写入，本地字典由 TTSFlowService 更新
+        self.writes = getattr(self, "writes", []) + [expression]
+
+    async def update(self, expression):
+        self.writes = getattr(self, "writes", []) + [expression]
+
+
+def _build_flow(texts):
+    """构建 开始 -> 文本节点... -> 留白 的工作流"""
+    nodes = [{"id": "start", "type": "event-node", "properties": {"name": "开始"}}]
+    for i, text in enumerate(texts):
+        nodes.append({
+            "id": f"tts{i}",
+            "type": "common-node",
+            "properties": {
+                "type": "ttsTextChunk",
+                "name": f"文本{i}",
+                "nodeContentData": {"text": text, "audioUrl": None},
+            },
+        })
+    nodes.append({
+        "id": "space",
+        "type": "common-node",
+        "properties": {"type": "spaceVoid", "name": "留白", "nodeContentData": {"duration": 0.1}},
+    })
+    edges = [
+        {"sourceNodeId": a["id"], "targetNodeId": b["id"]}
+        for a, b in zip(nodes, nodes[1:])
+    ]
+    return FakeFlow({"logicList": [{"nodes": nodes, "edges": edges}]})
+
+
+def _use_fresh_cache(monkeypatch, cache_dir):
+    monkeypatch.setattr(
+        cache_module, "synthesis_cache", cache_module.SynthesisCache(str(cache_dir), 10 * 1024 ** 2)
+    )
+
+
+@pytest.fixture
+def fake_volcano(monkeypatch, tmp_path):
+    """用本地生成的PCM替换火山引擎流式接口"""
+    monkeypatch.setattr(AppConstants, "STATIC_DIR", str(tmp_path))
+    _use_fresh_cache(monkeypatch, tmp_path / "tts_cache")
+    monkeypatch.setattr(workflow_plan, "_plan_cache", OrderedDict())
+    state = {"active": 0, "peak": 0, "calls": 0}
+
+    async def fake_stream(text, voice, platform, wav_path, relative_path):
+        state["active"] += 1
+        state["calls"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        try:
+            # 文本越短返回越慢，保证并发时完成顺序与流程顺序不同
+            await asyncio.sleep(0.05 / len(text))
+            pcm = text.encode("utf-8") * 100
+            yield {"data": "", "type": "pcm", "end": False}
+            os.makedirs(os.path.dirname(wav_path), exist_ok=True)
+            with wave.open(wav_path, "wb") as wavfile:
+                wavfile.setnchannels(1)
+                wavfile.setsampwidth(2)
+                wavfile.setframerate(24000)
+                wavfile.writeframes(pcm)
+            yield {"data": relative_path, "type": "wav_path", "end": True}
+        finally:
+            state["active"] -= 1
+
+    monkeypatch.setattr(tts_volcano, "tts_volcano_stream", fake_stream)
+    return state
+
+
+async def _run(flow, max_concurrency):
+    platform = SimpleNamespace(type="volcano", config={"max_concurrency": max_concurrency})
+    synthesizer = WorkflowSynthesizer(flow, SimpleNamespace(role_id="r1"), platform)
+    events = [json.loads(e[len("data: "):]) async for e in synthesizer.synthesize_all()]
+    with open(os.path.join(synthesizer.wav_dir, "tts_all.wav"), "rb") as f:
+        combined = f.read()
+    return events, combined, synthesizer
+
+
+@pytest.mark.asyncio
+async def test_concurrent_mode_keeps_flow_order(fake_volcano, monkeypatch, tmp_path):
+    flow = _build_flow(["a", "bb", "ccc", "dddd"])
+
+    seq_events, seq_audio, _ = await _run(flow, 1)
+    assert fake_volcano["peak"] == 1
+
+    # 使用新的工作流记录与合成缓存，确保第二次运行也会并发请求平台
+    _use_fresh_cache(monkeypatch, tmp_path / "tts_cache_2")
+    con_events, con_audio, synthesizer = await _run(_build_flow(["a", "bb", "ccc", "dddd"]), 4)
+    assert fake_volcano["peak"] > 1
+
+    assert con_audio == seq_audio
+    assert [os.path.basename(p) for p in synthesizer.audio_files[:-1]] == [
+        "tts0.wav", "tts1.wav", "tts2.wav", "tts3.wav"
+    ]
+    assert synthesizer.audio_files[-1].frames == 2400
+    assert not os.path.exists(os.path.join(synthesizer.wav_dir, "space_留白.wav"))
+    node_ids = [e["data"]["nodeId"] for e in con_events if e["type"] == "node"]
+    assert node_ids == ["tts0", "tts1", "tts2", "tts3", "space"]
+    assert [(e["type"], e["code"]) for e in con_events] == [(e["type"], e["code"]) for e in seq_events]
+    assert con_events[-1]["type"] == "end" and con_events[-1]["code"] == 0
+
+
+@pytest.mark.asyncio
+async def test_repeated_text_uses_synthesis_cache(fake_volcano):
+    flow = _build_flow(["同一句话", " 同一句话 ", "另一句话"])
+
+    events, _, synthesizer = await _run(flow, 1)
+
+    assert fake_volcano["calls"] == 2
+    statuses = [e["data"].get("status") for e in events if e["type"] == "node_task"]
+    assert statuses.count("使用缓存音频") == 1
+    assert cache_module.synthesis_cache.stats()["hits"] == 1
+    assert len(synthesizer.audio_files) == 4
+
+
+@pytest.mark.asyncio
+async def test_zip_is_not_rebuilt_when_outputs_unchanged(fake_volcano):
+    flow = _build_flow(["第一句", "第二句"])
+
+    first, _, synthesizer = await _run(flow, 1)
+    second, _, _ = await _run(flow, 1)
+
+    def zip_status(events):
+        return [e["data"]["status"] for e in events if e["type"] == "zip_package"][-1]
+
+    assert zip_status(first) == "ZIP压缩包创建完成"
+    assert zip_status(second) == "ZIP压缩包内容未变化"
+    with zipfile.ZipFile(synthesizer.zip_path) as zipf:
+        assert zipf.namelist() == ["tts0_文本0.wav", "tts1_文本1.wav", "tts_all.wav"]
+
+
+@pytest.mark.asyncio
+async def test_only_changed_nodes_are_resynthesized(fake_volcano):
+    flow = _build_flow(["第一句", "第二句", "第三句"])
+    await _run(flow, 1)
+    assert fake_volcano["calls"] == 3
+    assert set(flow.node_fingerprints) == {"tts0", "tts1", "tts2"}
+
+    # 修改一个节点文本：只有该节点重新合成，其余节点复用已有音频
+    nodes = flow.flow_config["logicList"][0]["nodes"]
+    nodes[2]["properties"]["nodeContentData"]["text"] = "第二句改了"
+    flow.updated_at += 1
+    events, _, _ = await _run(flow, 1)
+    assert fake_volcano["calls"] == 4
+    statuses = [e["data"].get("status") for e in events if e["type"] == "node_task"]
+    assert statuses.count("使用已有音频文件") == 2
+
+    # 音频文件丢失但内容未变化：从合成缓存恢复，不调用平台
+    os.remove(os.path.join(AppConstants.STATIC_DIR, flow.node_fingerprints["tts0"]["audioUrl"]))
+    events, _, _ = await _run(flow, 1)
+    assert fake_volcano["calls"] == 4
+    statuses = [e["data"].get("status") for e in events if e["type"] == "node_task"]
+    assert statuses.count("使用缓存音频") == 1
+
+
+@pytest.mark.asyncio
+async def test_voice_change_marks_all_nodes_dirty(fake_volcano):
+    flow = _build_flow(["第一句", "第二句"])
+    await _run(flow, 1)
+
+    platform = SimpleNamespace(type="volcano", config={})
+    synthesizer = WorkflowSynthesizer(flow, SimpleNamespace(role_id="another"), platform)
+    [e async for e in synthesizer.synthesize_all()]
+
+    assert fake_volcano["calls"] == 4
+
+
+def test_plan_is_cached_per_flow_version(monkeypatch):
+    monkeypatch.setattr(workflow_plan, "_plan_cache", OrderedDict())
+    flow = _build_flow(["第一句", "第二句"])
+    voice, platform = SimpleNamespace(role_id="r1"), SimpleNamespace(type="volcano")
+
+    plan = workflow_plan.get_workflow_plan(flow, voice, platform)
+    assert [node.id for node in plan.nodes] == ["start", "tts0", "tts1", "space"]
+    assert plan.total_nodes == 4
+    assert workflow_plan.get_workflow_plan(flow, voice, platform) is plan
+
+    flow.flow_config["logicList"][0]["nodes"][1]["properties"]["nodeContentData"]["text"] = "改了"
+    flow.updated_at += 1
+    updated = workflow_plan.get_workflow_plan(flow, voice, platform)
+    assert updated is not plan and updated.nodes[1].text == "改了"
+
+    summary = updated.summary({"tts1": {"fingerprint": updated.nodes[2].fingerprint}})
+    assert summary["dirtyNodes"] == 1
+    assert [s["nodeId"] for s in summary["segments"]] == ["tts0", "tts1", "space"]
+
+
+@pytest.mark.asyncio
+async def test_local_provider_runs_without_network(monkeypatch, tmp_path):
+    monkeypatch.setattr(AppConstants, "STATIC_DIR", str(tmp_path))
+    _use_fresh_cache(monkeypatch, tmp_path / "tts_cache")
+    monkeypatch.setattr(workflow_plan, "_plan_cache", OrderedDict())
+    platform = SimpleNamespace(type="local", config={"latency_ms": 0, "max_concurrency": 2})
+    synthesizer = WorkflowSynthesizer(_build_flow(["你好", "世界。"]), SimpleNamespace(role_id="r1"), platform)
+    events = [json.loads(e[len("data: "):]) async for e in synthesizer.synthesize_all()]
+
+    assert synthesizer.max_concurrency == 2
+    assert events[-1]["type"] == "end" and events[-1]["code"] == 0
+    with wave.open(os.path.join(synthesizer.wav_dir, "tts0.wav"), "rb") as wavfile:
+        assert wavfile.getnframes() == 2 * 4800
+
+
+@pytest.mark.asyncio
+async def test_unknown_platform_reports_node_error(monkeypatch, tmp_path):
+    monkeypatch.setattr(AppConstants, "STATIC_DIR", str(tmp_path))
+    monkeypatch.setattr(workflow_plan, "_plan_cache", OrderedDict())
+    platform = SimpleNamespace(type="unknown", config={})
+    synthesizer = WorkflowSynthesizer(_build_flow(["你好"]), SimpleNamespace(role_id="r1"), platform)
+    events = [json.loads(e[len("data: "):]) async for e in synthesizer.synthesize_all()]
+
+    errors = [e for e in events if e["type"] == "node_task" and e["code"] == 1]
+    assert errors and "暂不支持" in errors[0]["data"]["error"]
+
+
+@pytest.mark.asyncio
+async def test_stream_without_terminal_chunk_is_a_node_error(fake_volcano, monkeypatch):
+    async def truncated(text, voice, platform, wav_path, relative_path):
+        yield {"data": "", "type": "pcm", "end": False}
+
+    monkeypatch.setattr(tts_volcano, "tts_volcano_stream", truncated)
+    synthesizer = WorkflowSynthesizer(_build_flow(["你好"]), SimpleNamespace(role_id="r1"),
+                                      SimpleNamespace(type="volcano", config={}))
+    events = [json.loads(e[len("data: "):]) async for e in synthesizer.synthesize_all()]
+
+    errors = [e for e in events if e["type"] == "node_task" and e["code"] == 1]
+    assert errors and "未返回音频" in errors[0]["data"]["error"]
+    assert not any(isinstance(f, str) for f in synthesizer.audio_files)
+    assert "tts0" not in synthesizer.node_fingerprints
+
+
+@pytest.mark.asyncio
+async def test_long_text_is_split_and_stitched(monkeypatch, tmp_path):
+    monkeypatch.setattr(AppConstants, "STATIC_DIR", str(tmp_path))
+    _use_fresh_cache(monkeypatch, tmp_path / "tts_cache")
+    monkeypatch.setattr(workflow_plan, "_plan_cache", OrderedDict())
+    platform = SimpleNamespace(type="local", config={"latency_ms": 0, "split_threshold": 4})
+    text = "一二三。四五六。七八九。"
+    synthesizer = WorkflowSynthesizer(_build_flow([text]), SimpleNamespace(role_id="r1"), platform)
+    events = [json.loads(e[len("data: "):]) async for e in synthesizer.synthesize_all()]
+
+    assert events[-1]["type"] == "end" and events[-1]["code"] == 0
+    with wave.open(os.path.join(synthesizer.wav_dir, "tts0.wav"), "rb") as wavfile:
+        assert wavfile.getnframes() == len(text) * 4800
+    assert os.listdir(os.path.join(str(tmp_path), "tts_parts", "flow1")) == []
+
+
+@pytest.mark.asyncio
+async def test_compressed_profile_requires_ffmpeg(fake_volcano, monkeypatch):
+    monkeypatch.setattr(ws, "ffmpeg_path", lambda: None)
+    platform = SimpleNamespace(type="volcano", config={})
+    synthesizer = WorkflowSynthesizer(_build_flow(["你好"]), SimpleNamespace(role_id="r1"), platform,
+                                      output_profile="flac")
+    events = [json.loads(e[len("data: "):]) async for e in synthesizer.synthesize_all()]
+
+    assert events[-1]["type"] == "end" and events[-1]["code"] == 1
+    assert "ffmpeg" in events[-1]["data"]["error"]
+    assert fake_volcano["calls"] == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not ws.ffmpeg_path(), reason="未安装ffmpeg")
+async def test_compressed_profile_packages_encoded_audio(fake_volcano):
+    platform = SimpleNamespace(type="volcano", config={"max_concurrency": 2})
+    synthesizer = WorkflowSynthesizer(_build_flow(["第一句", "第二句"]), SimpleNamespace(role_id="r1"), platform,
+                                      output_profile="flac")
+    events = [json.loads(e[len("data: "):]) async for e in synthesizer.synthesize_all()]
+
+    assert events[-1]["code"] == 0 and events[-1]["data"]["outputProfile"] == "flac"
+    assert events[-1]["data"]["zipDownloadPath"] == "/static/tts_wav/flow1_flac.zip"
+    with zipfile.ZipFile(synthesizer.zip_path) as zipf:
+        assert zipf.namelist() == ["tts0_文本0.flac", "tts1_文本1.flac", "tts_all.flac"]
+
+
+@pytest.mark.asyncio
+async def test_progress_modes_reduce_chunk_events(monkeypatch, tmp_path):
+    monkeypatch.setattr(AppConstants, "STATIC_DIR", str(tmp_path))
+    platform = SimpleNamespace(type="local", config={"latency_ms": 0, "chunk_seconds": 0.01})
+
+    async def run(mode, max_rate=0):
+        _use_fresh_cache(monkeypatch, tmp_path / f"tts_cache_{mode}_{max_rate}")
+        monkeypatch.setattr(workflow_plan, "_plan_cache", OrderedDict())
+        synthesizer = WorkflowSynthesizer(_build_flow(["你好", "世界"]), SimpleNamespace(role_id="r1"), platform,
+                                          progress_mode=mode)
+        synthesizer.progress_max_rate = max_rate
+        events = [json.loads(e[len("data: "):]) async for e in synthesizer.synthesize_all()]
+        chunk_events = [e["data"] for e in events if str(e["data"].get("status", "")).endswith("生成中...")]
+        return chunk_events, events[-1]
+
+    all_events, all_end = await run("all")
+    transitions, transitions_end = await run("transitions")
+    coalesced, coalesced_end = await run("coalesced", max_rate=0.001)
+    unlimited, _ = await run("coalesced")
+
+    per_node = len(all_events) // 2
+    assert per_node > 10
+    assert len(transitions) == 2
+    assert [e["chunks"] for e in coalesced] == [1, 1]
+    assert [e["chunks"] for e in unlimited] == list(range(1, per_node + 1)) * 2
+    assert all_end == transitions_end == coalesced_end
+
+
+@pytest.mark.asyncio
+async def test_node_audio_is_restored_from_artifact_store(fake_volcano):
+    flow = _build_flow(["第一句", "第二句"])
+    _, first_audio, synthesizer = await _run(flow, 1)
+    assert all(entry["audioUrl"].startswith("artifacts/") for entry in flow.node_fingerprints.values())
+
+    # 模拟另一个后端实例：本地节点文件不存在，从制品存储取回而不是重新合成
+    shutil.rmtree(synthesizer.wav_dir)
+    events, second_audio, _ = await _run(flow, 1)
+
+    assert fake_volcano["calls"] == 2
+    statuses = [e["data"].get("status") for e in events if e["type"] == "node_task"]
+    assert statuses.count("使用已有音频文件") == 2
+    assert second_audio == first_audio
+
+    # 本地文件大小相同但内容不同（哈希与制品键不一致）时从制品存储重新取回
+    node_path = os.path.join(synthesizer.wav_dir, "tts0.wav")
+    original = open(node_path, "rb").read()
+    with open(node_path, "wb") as f:
+        f.write(b"\0" * len(original))
+    await _run(flow, 1)
+    assert open(node_path, "rb").read() == original
+
+
+@pytest.mark.asyncio
+async def test_prefetch_is_bounded_and_keeps_pcm_on_disk(monkeypatch, tmp_path):
+    monkeypatch.setattr(AppConstants, "STATIC_DIR", str(tmp_path))
+    _use_fresh_cache(monkeypatch, tmp_path / "tts_cache")
+    monkeypatch.setattr(workflow_plan, "_plan_cache", OrderedDict())
+    flow = _build_flow([f"第{i}句" for i in range(12)])
+    platform = SimpleNamespace(type="local", config={"latency_ms": 0, "max_concurrency": 2})
+    synthesizer = WorkflowSynthesizer(flow, SimpleNamespace(role_id="r1"), platform)
+    synthesizer.plan = workflow_plan.get_workflow_plan(flow, synthesizer.voice, platform)
+    os.makedirs(synthesizer.wav_dir, exist_ok=True)
+    synthesizer._prefetch_tts_nodes()
+    try:
+        assert len(synthesizer._prefetched) == ws.PREFETCH_AHEAD_NODES
+        assert len(synthesizer._prefetch_pending) == 12 - ws.PREFETCH_AHEAD_NODES
+        chunks = [chunk async for chunk in synthesizer._prefetched.pop("tts0")]
+        pcm = [c["data"] for c in chunks if c["type"] == "pcm"]
+        assert pcm and set(pcm) == {""}
+        assert chunks[-1]["type"] == "wav_path"
+        synthesizer._fill_prefetch()
+        assert len(synthesizer._prefetched) == ws.PREFETCH_AHEAD_NODES
+    finally:
+        synthesizer._cancel_prefetch()
+
+
+@pytest.mark.asyncio
+async def test_finished_prefetch_releases_its_slot(monkeypatch, tmp_path):
+    monkeypatch.setattr(AppConstants, "STATIC_DIR", str(tmp_path))
+    _use_fresh_cache(monkeypatch, tmp_path / "tts_cache")
+    monkeypatch.setattr(workflow_plan, "_plan_cache", OrderedDict())
+    monkeypatch.setattr(ws, "PREFETCH_QUEUE_SIZE", 1)
+    flow = _build_flow(["第一句话", "第二句话", "第三句话"])
+    platform = SimpleNamespace(type="local", config={"latency_ms": 0, "max_concurrency": 1})
+    synthesizer = WorkflowSynthesizer(flow, SimpleNamespace(role_id="r1"), platform)
+    synthesizer.plan = workflow_plan.get_workflow_plan(flow, synthesizer.voice, platform)
+    os.makedirs(synthesizer.wav_dir, exist_ok=True)
+    synthesizer._prefetch_tts_nodes()
+    try:
+        # 没有读取任何节点，已完成的节点也不占用唯一的名额
+        _, pending = await asyncio.wait(synthesizer._prefetch_tasks, timeout=2)
+        assert not pending
+    finally:
+        synthesizer._cancel_prefetch()
+
+
+def _legacy_flow():
+    """引入指纹之前合成的工作流：第一个节点有 audioUrl 但没有指纹记录"""
+    flow = _build_flow(["旧音频", "新节点"])
+    legacy = os.path.join(AppConstants.STATIC_DIR, "tts_wav", "legacy", "tts0.wav")
+    os.makedirs(os.path.dirname(legacy))
+    with wave.open(legacy, "wb") as wavfile:
+        wavfile.setnchannels(1)
+        wavfile.setsampwidth(2)
+        wavfile.setframerate(24000)
+        wavfile.writeframes(b"\0\0" * 100)
+    flow.flow_config["logicList"][0]["nodes"][1]["properties"]["nodeContentData"]["audioUrl"] = "/tts_wav/legacy/tts0.wav"
+    return flow, legacy
+
+
+@pytest.mark.asyncio
+async def test_unverified_legacy_audio_is_resynthesized(fake_volcano):
+    flow, _ = _legacy_flow()
+    # 无法确认升级前文本是否修改过，不复用
+    assert workflow_plan.get_workflow_plan(flow, SimpleNamespace(role_id="r1"), SimpleNamespace(type="volcano")) \
+        .summary({}, cache_module.synthesis_cache.contains)["dirtyNodes"] == 2
+
+    events, _, synthesizer = await _run(flow, 1)
+    assert fake_volcano["calls"] == 2
+    statuses = [e["data"].get("status") for e in events if e["type"] == "node_task"]
+    assert "使用已有音频文件" not in statuses
+    assert flow.node_fingerprints["tts0"]["audioUrl"] != "/tts_wav/legacy/tts0.wav"
+
+
+@pytest.mark.asyncio
+async def test_legacy_audio_in_synthesis_cache_is_reused_and_seeded(fake_volcano):
+    flow, legacy = _legacy_flow()
+    platform = SimpleNamespace(type="volcano", config={"max_concurrency": 1})
+    fingerprint = workflow_plan.get_workflow_plan(flow, SimpleNamespace(role_id="r1"), platform).nodes[1].fingerprint
+    cache_module.synthesis_cache.store(fingerprint, legacy)
+
+    events, _, synthesizer = await _run(flow, 1)
+    assert fake_volcano["calls"] == 1
+    statuses = [e["data"].get("status") for e in events if e["type"] == "node_task"]
+    assert statuses.count("使用已有音频文件") == 1
+    assert flow.node_fingerprints["tts0"] == {
+        "fingerprint": synthesizer.plan.nodes[1].fingerprint, "audioUrl": "/tts_wav/legacy/tts0.wav"
+    }
+
+
+@pytest.mark.asyncio
+async def test_fingerprint_save_failure_does_not_fail_the_job(fake_volcano):
+    flow = _build_flow(["第一句"])
+
+    async def failing_set(expression):
+        raise RuntimeError("db down")
+
+    flow.set = failing_set
+    events, _, _ = await _run(flow, 1)
+    assert events[-1]["type"] == "end" and events[-1]["code"] == 0
+
+
+@pytest.mark.asyncio
+async def test_fingerprints_are_merged_per_node(fake_volcano):
+    flow = _build_flow(["第一句"])
+    flow.node_fingerprints = {"preview": {"fingerprint": "p", "audioUrl": "x.wav"}}
+    platform = SimpleNamespace(type="volcano", config={})
+    synthesizer = WorkflowSynthesizer(flow, SimpleNamespace(role_id="r1"), platform)
+    # 合成期间单节点合成写入了另一个节点
+    flow.node_fingerprints["other"] = {"fingerprint": "o", "audioUrl": "o.wav"}
+    [e async for e in synthesizer.synthesize_all()]
+
+    assert set(flow.node_fingerprints) == {"tts0", "other"}
+    assert [set(w) for w in flow.writes] == [{"node_fingerprints.tts0"}, {"$unset"}]
+    assert flow.writes[1]["$unset"] == {"node_fingerprints.preview": ""}
@@ -0,0 +1,100 @@
+import os
+import zipfile
+
+from app.utils.zip_packager import ZipPackager
+
+
+def _write(path, content):
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_packages_incrementally_with_stored_entries(tmp_path):
+    a = _write(tmp_path / "a.wav", b"a" * 100)
+    b = _write(tmp_path / "b.wav", b"b" * 100)
+    zip_path = str(tmp_path / "out" / "flow.zip")
+
+    packager = ZipPackager(zip_path)
+    packager.add(a)
+    packager.add(b)
+    packager.add(a)  # 同名条目只写一次
+    assert os.path.exists(packager.tmp_path)
+    assert packager.close()
+
+    with zipfile.ZipFile(zip_path) as zipf:
+        assert zipf.namelist() == ["a.wav", "b.wav"]
+        assert {i.compress_type for i in zipf.infolist()} == {zipfile.ZIP_STORED}
+    assert not os.path.exists(packager.tmp_path)
+
+
+def test_skips_rebuild_when_contents_unchanged(tmp_path):
+    a = _write(tmp_path / "a.wav", b"a" * 100)
+    b = _write(tmp_path / "b.wav", b"b" * 100)
+    zip_path = str(tmp_path / "flow.zip")
+    packager = ZipPackager(zip_path)
+    packager.add(a)
+    packager.add(b)
+    packager.close()
+    os.utime(zip_path, (0, 0))
+
+    packager = ZipPackager(zip_path)
+    packager.add(a)
+    packager.add(b)
+    assert not packager.close()
+    assert os.path.getmtime(zip_path) == 0
+
+    # 第二个文件内容变化时，补写前面暂存的条目并重建
+    _write(tmp_path / "b.wav", b"c" * 100)
+    packager = ZipPackager(zip_path)
+    packager.add(a)
+    packager.add(b)
+    assert packager.close()
+    with zipfile.ZipFile(zip_path) as zipf:
+        assert zipf.read("a.wav") == b"a" * 100
+        assert zipf.read("b.wav") == b"c" * 100
+
+
+def test_discard_keeps_previous_archive(tmp_path):
+    a = _write(tmp_path / "a.wav", b"a" * 100)
+    zip_path = str(tmp_path / "flow.zip")
+    packager = ZipPackager(zip_path)
+    packager.add(a)
+    packager.close()
+
+    packager = ZipPackager(zip_path)
+    packager.add(_write(tmp_path / "new.wav", b"n"))
+    packager.discard()
+
+    with zipfile.ZipFile(zip_path) as zipf:
+        assert zipf.namelist() == ["a.wav"]
+    assert not os.path.exists(packager.tmp_path)
+
+
+def test_unchanged_files_reuse_stored_crc(tmp_path, monkeypatch):
+    from app.utils import zip_packager
+
+    a = _write(tmp_path / "a.wav", b"a" * 100)
+    zip_path = str(tmp_path / "flow.zip")
+    packager = ZipPackager(zip_path)
+    packager.add(a)
+    packager.close()
+
+    calls = []
+    monkeypatch.setattr(zip_packager, "_file_crc", lambda path: calls.append(path) or 0)
+    packager = ZipPackager(zip_path)
+    packager.add(a)
+    assert not packager.close()
+    assert calls == []
+
+    # 修改时间变化时重新计算CRC
+    mtime_ns = os.stat(a).st_mtime_ns
+    os.utime(a, ns=(mtime_ns, mtime_ns + 1000))
+    packager = ZipPackager(zip_path)
+    packager.add(a)
+    packager.discard()
+    assert calls == [a]
+
+
+def test_concurrent_packagers_use_separate_temp_files(tmp_path):
+    zip_path = str(tmp_path / "flow.zip")
+    assert ZipPackager(zip_path).tmp_path != ZipPackager(zip_path).tmp_path
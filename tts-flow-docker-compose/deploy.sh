@@ -40,8 +40,8 @@ check_docker() {
 # 创建必要目录
 create_directories() {
     print_info "创建数据目录..."
-    mkdir -p data/mongodb data/backend/logs data/backend/uploads data/backend/static/tts_wav
-    chmod 755 data/mongodb data/backend/logs data/backend/uploads data/backend/static/tts_wav
+    mkdir -p data/mongodb data/backend/logs data/backend/uploads data/backend/static/tts_wav data/backend/static/artifacts
+    chmod 755 data/mongodb data/backend/logs data/backend/uploads data/backend/static/tts_wav data/backend/static/artifacts
 }
 
 # 配置环境变量